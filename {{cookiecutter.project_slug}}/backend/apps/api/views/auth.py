@@ -2,6 +2,7 @@
 Authentication views.
 """
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from rest_framework import status
@@ -37,17 +38,22 @@ class RegisterView(CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
         
-        # Try to send verification email, but don't fail registration if it fails
-        try:
-            send_verification_email_to_user(user, request)
-            email_sent = True
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to send verification email: {str(e)}")
-            email_sent = False
+        # The user and its verification email (queued in the outbox) are
+        # committed together
+        with transaction.atomic():
+            user = serializer.save()
+            
+            # Try to send verification email, but don't fail registration if it fails
+            try:
+                with transaction.atomic():
+                    send_verification_email_to_user(user, request)
+                email_sent = True
+            except Exception as e:
+                import logging
+                logger = logging.getLogger(__name__)
+                logger.warning(f"Failed to send verification email: {str(e)}")
+                email_sent = False
         
         # Prepare response message based on email status
         if email_sent:
@@ -207,17 +213,19 @@ class VerifyEmailView(APIView):
             }, status=status.HTTP_200_OK)
         
         if email_verification_token.check_token(user, token):
-            user.is_verified = True
-            user.save()
-            
-            # Try to send welcome email, but don't fail verification if it fails
-            try:
-                from apps.users.tasks import send_email_task
-                send_email_task(user_id=user.id, email_type="welcome")
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Failed to send welcome email: {str(e)}")
+            with transaction.atomic():
+                user.is_verified = True
+                user.save()
+                
+                # Try to send welcome email, but don't fail verification if it fails
+                try:
+                    from apps.users.tasks import queue_user_email
+                    with transaction.atomic():
+                        queue_user_email(user, email_type="welcome")
+                except Exception as e:
+                    import logging
+                    logger = logging.getLogger(__name__)
+                    logger.warning(f"Failed to send welcome email: {str(e)}")
             
             return Response({
                 'message': 'Email verified successfully!',
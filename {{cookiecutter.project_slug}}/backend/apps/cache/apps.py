@@ -5,4 +5,14 @@ from django.apps import AppConfig
 class CacheConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.cache'
-    verbose_name = 'Cache Management'
\ No newline at end of file
+    verbose_name = 'Cache Management'
+    
+    def ready(self):
+        """Import signals and register models listed in CACHE_INVALIDATION_MODELS."""
+        from django.apps import apps
+        from django.conf import settings
+        from . import signals  # noqa
+        from .registry import cache_registry
+        
+        for label in getattr(settings, 'CACHE_INVALIDATION_MODELS', []):
+            cache_registry.register(apps.get_model(label))
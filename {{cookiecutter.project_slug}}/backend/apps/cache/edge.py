@@ -0,0 +1,234 @@
+"""Purge hooks for the nginx micro-cache in front of the API.
+
+nginx (docker/nginx/nginx.prod.conf) only stores responses Django marks
+with ``X-Accel-Expires``, for a few seconds, and only for requests
+without credentials. Open source nginx cannot purge by key, so a purge
+re-fetches each affected URL through an internal nginx server that
+bypasses the cache lookup and overwrites the stored copy.
+"""
+import fnmatch
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Sequence
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .tasks import celery_enabled, purge_edge_cache_urls
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the EDGE_CACHE setting
+EDGE_CACHE_DEFAULTS = {
+    'ENABLED': False,
+    'TTL': 2,  # seconds nginx serves a response without asking Django
+    'WINDOW': 30,  # seconds nginx may hold a copy, the proxy_cache_path inactive time
+    'FLUSH_INTERVAL': 1,  # seconds marked URLs are buffered before reaching Redis
+    'PURGE_URL': 'http://frontend:8080',
+    'PURGE_HOST': '',
+    'TIMEOUT': 2,
+    'MAX_PURGE_URLS': 500,
+}
+
+EDGE_KEY = 'edge'
+
+
+class EdgeCache:
+    """Mark micro-cacheable responses and purge them on invalidation.
+
+    Every marked URL is remembered, with its surrogate keys, for WINDOW
+    seconds: only URLs nginx may still hold are worth purging. Pattern
+    invalidations of ``api_cache:`` keys and tag invalidations of
+    surrogate keys are mapped back to those URLs.
+
+    Marks are buffered in-process and flushed every FLUSH_INTERVAL seconds
+    with one pipelined ZADD, so hot URLs cost one Redis write per interval
+    instead of one per response. A purge from another process can miss
+    URLs marked since the last flush; nginx drops those after TTL seconds.
+    """
+
+    def __init__(self, cache_alias: str = 'default'):
+        """Initialize the edge cache hooks.
+
+        Args:
+            cache_alias: Cache backend whose Redis server remembers URLs
+        """
+        self.cache_alias = cache_alias
+        self._recent = {}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._redis_client = None
+        self._redis_resolved = False
+
+    @property
+    def options(self):
+        return {**EDGE_CACHE_DEFAULTS, **getattr(settings, 'EDGE_CACHE', {})}
+
+    @property
+    def enabled(self) -> bool:
+        return self.options['ENABLED']
+
+    def mark(self, request, response, ttl: int, surrogate_keys: Sequence[str] = ()):
+        """Let nginx store a response that is shared by all anonymous users.
+
+        Args:
+            request: Anonymous HttpRequest
+            response: Its response
+            ttl: Seconds the response stays fresh under its cache policy
+            surrogate_keys: Resolved surrogate keys of the response
+        """
+        options = self.options
+        if not options['ENABLED'] or getattr(response, 'status_code', None) != 200:
+            return
+        cache_control = response.get('Cache-Control', '')
+        if 'no-store' in cache_control or 'no-cache' in cache_control:
+            return
+
+        response['X-Accel-Expires'] = str(max(1, min(options['TTL'], ttl)))
+        with self._lock:
+            self._pending[request.get_full_path()] = (time.time(), tuple(surrogate_keys))
+
+        if time.monotonic() - self._last_flush >= options['FLUSH_INTERVAL']:
+            self.flush()
+
+    def flush(self):
+        """Record the URLs marked since the last flush."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return
+
+        options = self.options
+        now = time.time()
+        redis_client = self._get_redis_client()
+        if redis_client is None:
+            with self._lock:
+                self._recent.update(pending)
+                if len(self._recent) > options['MAX_PURGE_URLS']:
+                    self._recent = {
+                        recent: entry for recent, entry in self._recent.items()
+                        if entry[0] >= now - options['WINDOW']
+                    }
+            return
+
+        key = self._recent_key()
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zadd(key, {
+                f"{url} {' '.join(surrogate_keys)}".rstrip(): at
+                for url, (at, surrogate_keys) in pending.items()
+            })
+            pipe.zremrangebyscore(key, '-inf', now - options['WINDOW'])
+            pipe.expire(key, options['WINDOW'])
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record {len(pending)} edge cached URLs: {str(e)}")
+
+    def purge(self, patterns: Iterable[str] = (), tags: Iterable[str] = ()) -> int:
+        """Schedule a purge of the URLs affected by an invalidation.
+
+        Args:
+            patterns: Invalidated cache key patterns
+            tags: Invalidated tags (surrogate keys)
+
+        Returns:
+            Number of URLs scheduled for purging
+        """
+        if not self.enabled:
+            return 0
+
+        urls = self.matching_urls(patterns, tags)
+        if not urls:
+            return 0
+
+        if celery_enabled():
+            try:
+                purge_edge_cache_urls.delay(urls)
+                return len(urls)
+            except Exception as e:
+                logger.error(f"Failed to queue edge purge, using thread pool: {str(e)}")
+
+        self._get_executor().submit(self.refresh, urls)
+        return len(urls)
+
+    def matching_urls(self, patterns: Iterable[str] = (), tags: Iterable[str] = ()) -> List[str]:
+        """URLs nginx may hold that match cache key patterns or tags."""
+        patterns, tags = list(patterns), set(tags)
+        urls = []
+        for url, surrogate_keys in self._recent_urls():
+            path, _, query = url.partition('?')
+            # Same layout as APICacheMiddleware keys: api_cache:<path>:<query>:<scope>
+            probe = f"api_cache:{path}:{query}:"
+            if tags.intersection(surrogate_keys) or any(
+                fnmatch.fnmatchcase(probe, pattern) for pattern in patterns
+            ):
+                urls.append(url)
+        return urls[:self.options['MAX_PURGE_URLS']]
+
+    def refresh(self, urls: Sequence[str]) -> int:
+        """Re-fetch URLs through the internal nginx refresh server.
+
+        Returns:
+            Number of URLs refreshed
+        """
+        options = self.options
+        refreshed = 0
+        for url in urls:
+            request = Request(f"{options['PURGE_URL'].rstrip('/')}{url}")
+            if options['PURGE_HOST']:
+                request.add_header('Host', options['PURGE_HOST'])
+            try:
+                with urlopen(request, timeout=options['TIMEOUT']) as response:
+                    refreshed += response.status == 200
+            except (URLError, OSError) as e:
+                logger.warning(f"Failed to purge {url} from the edge cache: {str(e)}")
+        return refreshed
+
+    def _recent_urls(self):
+        """(url, surrogate keys) of every URL marked within WINDOW."""
+        self.flush()
+        since = time.time() - self.options['WINDOW']
+        redis_client = self._get_redis_client()
+        if redis_client is None:
+            with self._lock:
+                return [(url, keys) for url, (at, keys) in self._recent.items() if at >= since]
+
+        try:
+            members = redis_client.zrangebyscore(self._recent_key(), since, '+inf')
+        except Exception as e:
+            logger.warning(f"Failed to read edge cached URLs: {str(e)}")
+            return []
+        recent = []
+        for member in members:
+            url, *surrogate_keys = (member.decode() if isinstance(member, bytes) else member).split(' ')
+            recent.append((url, surrogate_keys))
+        return recent
+
+    def _recent_key(self) -> str:
+        return caches[self.cache_alias].make_key(f"{EDGE_KEY}:recent")
+
+    def _get_redis_client(self):
+        if not self._redis_resolved:
+            from .services import CacheService
+
+            self._redis_client = CacheService(self.cache_alias).redis_client
+            self._redis_resolved = True
+        return self._redis_client
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='edge-purge')
+            return self._executor
+
+
+# Process-wide hooks used by APICacheMiddleware and CacheService
+edge_cache = EdgeCache()
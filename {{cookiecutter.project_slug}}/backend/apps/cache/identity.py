@@ -0,0 +1,200 @@
+"""Cheap request identity resolution for the API response cache.
+
+APICacheMiddleware runs before DRF authentication, so ``request.user`` is
+anonymous for token-authenticated API calls. The identity behind an
+Authorization header is resolved here once and then cached, per process
+and in the shared cache, keyed by a hash of the header.
+
+Every hit is checked against a per-user revocation generation kept in the
+shared cache, so deleting a token, blacklisting a refresh token or
+deactivating a user takes effect on the next request instead of after the
+identity TTL.
+"""
+import hashlib
+import logging
+import time
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+{% if cookiecutter.api_authentication == 'jwt' -%}
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+{%- endif %}
+
+from .near_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a resolved identity is trusted before the token is checked again
+IDENTITY_CACHE_TTL = 60
+
+
+class Identity(NamedTuple):
+    """Who a request is made by, as far as caching is concerned.
+
+    Attributes:
+        user_id: Primary key of the user, None when anonymous
+        role: 'anonymous', 'user', 'staff' or 'superuser'
+        expires_at: Unix time after which the identity must be resolved again
+        generation: Revocation generation of the user when it was resolved
+    """
+    user_id: Optional[int]
+    role: str
+    expires_at: Optional[float] = None
+    generation: Optional[int] = None
+
+    @property
+    def is_anonymous(self) -> bool:
+        return self.user_id is None
+
+
+ANONYMOUS = Identity(None, 'anonymous')
+
+
+def role_of(is_staff: bool, is_superuser: bool) -> str:
+    """Role used by the per-role cache scope."""
+    if is_superuser:
+        return 'superuser'
+    if is_staff:
+        return 'staff'
+    return 'user'
+
+
+class IdentityResolver:
+    """Resolve and cache the identity behind Authorization headers."""
+
+    def __init__(self, cache_alias: str = 'default', max_entries: int = 10000):
+        """Initialize the resolver.
+
+        Args:
+            cache_alias: Cache backend shared between processes
+            max_entries: Size of the per-process identity LRU
+        """
+        self.cache_alias = cache_alias
+        self.local = LRUCache(max_entries)
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, 'API_CACHE_IDENTITY_TTL', IDENTITY_CACHE_TTL)
+
+    def resolve(self, request) -> Optional[Identity]:
+        """Resolve the identity of a request.
+
+        Args:
+            request: HttpRequest
+
+        Returns:
+            The Identity, ANONYMOUS without credentials, or None when the
+            credentials are invalid and the response must not be cached
+        """
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return Identity(user.pk, role_of(user.is_staff, user.is_superuser))
+
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not header:
+            return ANONYMOUS
+
+        # Never keep raw credentials as cache keys
+        cache_key = f"auth:{hashlib.blake2b(header.encode(), digest_size=16).hexdigest()}"
+        now = time.time()
+
+        identity = self.local.get(cache_key)
+        if identity is None:
+            identity = caches[self.cache_alias].get(cache_key)
+            if identity is None:
+                identity = self._resolve_fresh(cache_key, header, now)
+                if identity is None:
+                    return None
+            else:
+                self.local.set(cache_key, identity, self._timeout(identity, now))
+
+        if identity.generation != self._generation(identity.user_id):
+            # Revoked since it was cached: check the credentials again
+            self.local.delete(cache_key)
+            identity = self._resolve_fresh(cache_key, header, now)
+            if identity is None:
+                return None
+
+        if identity.expires_at is not None and identity.expires_at <= now:
+            return None
+        return identity
+
+    def revoke(self, user_id: int) -> None:
+        """Stop trusting cached identities of a user.
+
+        Args:
+            user_id: Primary key of the user
+        """
+        # Outlives every identity cached before it, which is all that matters
+        caches[self.cache_alias].set(self._generation_key(user_id), time.time_ns(), timeout=self.ttl)
+
+    def _resolve_fresh(self, cache_key: str, header: str, now: float) -> Optional[Identity]:
+        identity = self._authenticate(header)
+        if identity is None:
+            return None
+        identity = identity._replace(generation=self._generation(identity.user_id))
+        timeout = self._timeout(identity, now)
+        caches[self.cache_alias].set(cache_key, identity, timeout=timeout)
+        self.local.set(cache_key, identity, timeout)
+        return identity
+
+    def _generation(self, user_id: int) -> Optional[int]:
+        return caches[self.cache_alias].get(self._generation_key(user_id))
+
+    @staticmethod
+    def _generation_key(user_id: int) -> str:
+        return f"auth-gen:{user_id}"
+
+    def _timeout(self, identity: Identity, now: float) -> int:
+        if identity.expires_at is None:
+            return self.ttl
+        return max(1, min(self.ttl, int(identity.expires_at - now)))
+
+    def _authenticate(self, header: str) -> Optional[Identity]:
+        """Check credentials the way the API authentication class does."""
+        scheme, _, credential = header.partition(' ')
+        if not credential:
+            return None
+        {%- if cookiecutter.api_authentication == 'jwt' %}
+
+        if scheme not in jwt_settings.AUTH_HEADER_TYPES:
+            return None
+        try:
+            token = AccessToken(credential.strip())
+        except TokenError:
+            return None
+
+        from django.contrib.auth import get_user_model
+
+        user = get_user_model().objects.filter(
+            **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]}
+        ).values_list('pk', 'is_active', 'is_staff', 'is_superuser').first()
+        if user is None or not user[1]:
+            return None
+        return Identity(user[0], role_of(user[2], user[3]), expires_at=token['exp'])
+        {%- elif cookiecutter.api_authentication == 'token' %}
+
+        if scheme != 'Token':
+            return None
+
+        from rest_framework.authtoken.models import Token
+
+        user = Token.objects.filter(key=credential.strip()).values_list(
+            'user_id', 'user__is_active', 'user__is_staff', 'user__is_superuser'
+        ).first()
+        if user is None or not user[1]:
+            return None
+        return Identity(user[0], role_of(user[2], user[3]))
+        {%- else %}
+
+        # Session authentication: other Authorization schemes are unknown
+        return None
+        {%- endif %}
+
+
+# Process-wide resolver used by APICacheMiddleware
+identity_resolver = IdentityResolver()
+
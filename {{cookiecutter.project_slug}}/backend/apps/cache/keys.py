@@ -0,0 +1,214 @@
+"""Cache key derivation.
+
+Arguments are encoded into stable key segments without calling str() on
+arbitrary objects: model instances become ``label.pk``, dates their ISO
+format and iterables the encoding of their items. Long keys are shortened
+with a fast non-cryptographic hash.
+"""
+import datetime
+import hashlib
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+from django.db.models import Model, QuerySet
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# Keys longer than this are hashed to stay within backend key limits
+MAX_KEY_LENGTH = 200
+
+
+def fast_hash(data: str) -> str:
+    """Hash a key string with a fast 128-bit hash.
+
+    Uses xxh3 when the xxhash package is installed, blake2b otherwise.
+    Neither is used for security, only to shorten keys.
+    """
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_hexdigest(data.encode())
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def _encode_iterable(value) -> str:
+    get = _ENCODERS.get
+    return "[" + ",".join([(get(type(item)) or _resolve_encoder(type(item)))(item) for item in value]) + "]"
+
+
+def _encode_set(value) -> str:
+    return "{" + ",".join(sorted([encode_part(item) for item in value])) + "}"
+
+
+def _encode_dict(value) -> str:
+    items = sorted([f"{encode_part(k)}={encode_part(v)}" for k, v in value.items()])
+    return "{" + ",".join(items) + "}"
+
+
+def _model_encoder(model: type) -> Callable[[Any], str]:
+    """Encoder of one model class, with its label and pk attribute looked up once."""
+    prefix = f"{model._meta.label_lower}."
+    pk_attname = model._meta.pk.attname
+
+    def encode_model(value) -> str:
+        return prefix + str(getattr(value, pk_attname))
+
+    return encode_model
+
+
+def _encode_queryset(value) -> str:
+    return f"qs.{queryset_fingerprint(value)}"
+
+
+def _isoformat(value) -> str:
+    return value.isoformat()
+
+
+# Encoders by exact type; subclasses are resolved once through
+# _SUBCLASS_ENCODERS and then cached here
+_ENCODERS: Dict[type, Callable[[Any], str]] = {
+    str: str,
+    int: str,
+    float: repr,
+    bool: str,
+    type(None): str,
+    Decimal: str,
+    UUID: str,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    datetime.time: datetime.time.isoformat,
+    list: _encode_iterable,
+    tuple: _encode_iterable,
+    set: _encode_set,
+    frozenset: _encode_set,
+    dict: _encode_dict,
+}
+
+_SUBCLASS_ENCODERS = (
+    (QuerySet, _encode_queryset),
+    ((datetime.date, datetime.time), _isoformat),
+    ((list, tuple), _encode_iterable),
+    ((set, frozenset), _encode_set),
+    (dict, _encode_dict),
+)
+
+
+def _resolve_encoder(value_type: type) -> Callable[[Any], str]:
+    """Find and remember the encoder of a type."""
+    if issubclass(value_type, Model):
+        encoder = _model_encoder(value_type)
+    else:
+        encoder = next(
+            (encoder for base, encoder in _SUBCLASS_ENCODERS if issubclass(value_type, base)),
+            str,
+        )
+    _ENCODERS[value_type] = encoder
+    return encoder
+
+
+def encode_part(value: Any) -> str:
+    """Encode a value into a stable cache key segment.
+
+    Model instances become ``label.pk`` and querysets a fingerprint of
+    their SQL; other objects fall back to str().
+
+    Args:
+        value: Key argument
+
+    Returns:
+        String that only depends on the value, not on object identity
+    """
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        encoder = _resolve_encoder(type(value))
+    return encoder(value)
+
+
+def finalize_key(key_string: str, namespace: str = "") -> str:
+    """Hash a key that is too long, keeping its namespace readable.
+
+    Args:
+        key_string: Full key
+        namespace: Leading segment kept in front of the hash, so pattern
+            invalidation of the namespace still matches
+
+    Returns:
+        The key, or ``<namespace>:hashed:<hash>`` if it is too long
+    """
+    if len(key_string) <= MAX_KEY_LENGTH:
+        return key_string
+    if namespace:
+        return f"{namespace}:hashed:{fast_hash(key_string)}"
+    return f"hashed:{fast_hash(key_string)}"
+
+
+def build_key(*args, **kwargs) -> str:
+    """Build a cache key from arguments."""
+    key_parts = [encode_part(arg) for arg in args]
+    if kwargs:
+        key_parts.extend(f"{k}:{encode_part(v)}" for k, v in sorted(kwargs.items()))
+    return finalize_key(":".join(key_parts), key_parts[0] if key_parts else "")
+
+
+class KeyTemplate:
+    """Precompiled key builder of one cached function.
+
+    The prefix is encoded once at decoration time, the order and labels of
+    keyword arguments once per set of names, and the encoder of each
+    argument type (for models: label and pk attribute) once per process.
+    A call only looks up and runs the encoders.
+    """
+
+    __slots__ = ('_kwarg_labels', 'prefix')
+
+    def __init__(self, prefix: str):
+        """Initialize the template.
+
+        Args:
+            prefix: Key namespace, usually the function name
+        """
+        self.prefix = prefix
+        # Keyword names in call order -> (name, "name:") in key order
+        self._kwarg_labels: Dict[Tuple[str, ...], Tuple[Tuple[str, str], ...]] = {}
+
+    def __call__(self, args: Tuple = (), kwargs: Optional[Dict[str, Any]] = None, *extra) -> str:
+        """Build the key of one call.
+
+        Args:
+            args: Positional arguments of the call
+            kwargs: Keyword arguments of the call
+            *extra: Additional trailing segments
+
+        Returns:
+            Cache key
+        """
+        get = _ENCODERS.get
+        key_parts = [self.prefix]
+        for arg in args:
+            key_parts.append((get(type(arg)) or _resolve_encoder(type(arg)))(arg))
+        if kwargs:
+            names = tuple(kwargs)
+            labels = self._kwarg_labels.get(names)
+            if labels is None:
+                labels = self._kwarg_labels[names] = tuple((name, f"{name}:") for name in sorted(names))
+            for name, label in labels:
+                value = kwargs[name]
+                key_parts.append(label + (get(type(value)) or _resolve_encoder(type(value)))(value))
+        for part in extra:
+            key_parts.append(encode_part(part))
+        return finalize_key(":".join(key_parts), self.prefix)
+
+
+def queryset_fingerprint(queryset: QuerySet) -> str:
+    """Fingerprint the SQL and parameters of a queryset.
+
+    Args:
+        queryset: QuerySet to fingerprint
+
+    Returns:
+        Hash of the query SQL and parameters
+    """
+    return fast_hash(f"{queryset.db}:{queryset.query}")
@@ -0,0 +1,149 @@
+"""Management command to benchmark cache payload formats and key building."""
+import datetime
+import hashlib
+import pickle
+import time
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from apps.cache.keys import KeyTemplate, queryset_fingerprint
+from apps.cache.responses import build_response, serialize_response
+
+
+def _store(value) -> bytes:
+    """Serialize the way django-redis does with the zlib compressor."""
+    return zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _load(payload: bytes):
+    """Deserialize a payload produced by _store()."""
+    return pickle.loads(zlib.decompress(payload))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cache payload formats and key building'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--suite',
+            choices=['responses', 'keys'],
+            default='responses',
+            help='Benchmark to run',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Iterations per measurement',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20,
+            help='Rows in the sample API payload (one page by default)',
+        )
+
+    def handle(self, *args, **options):
+        suite = options['suite']
+        getattr(self, f'benchmark_{suite}')(options)
+
+    def _time(self, func, iterations: int) -> float:
+        """Average duration of func() in microseconds."""
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) / iterations * 1e6
+    
+    def benchmark_responses(self, options):
+        """Compare pickled HttpResponse objects with CachedResponse payloads."""
+        iterations = options['iterations']
+        data = {
+            'count': options['rows'],
+            'results': [
+                {
+                    'id': i,
+                    'username': f'user{i}',
+                    'email': f'user{i}@example.com',
+                    'first_name': 'Jane',
+                    'last_name': 'Doe',
+                    'is_verified': True,
+                    'created_at': '2024-01-01T00:00:00Z',
+                }
+                for i in range(options['rows'])
+            ],
+        }
+
+        response = Response(data)
+        response.accepted_renderer = JSONRenderer()
+        response.accepted_media_type = 'application/json'
+        response.renderer_context = {}
+        response['Vary'] = 'Accept'
+        response.render()
+
+        formats = {
+            'pickled response': (response, lambda value: value),
+            'compact payload': (serialize_response(response), build_response),
+        }
+
+        self.stdout.write(f'Sample body: {len(response.content)} bytes, {iterations} iterations')
+        results = {}
+        for name, (value, rebuild) in formats.items():
+            payload = _store(value)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                rebuild(_load(payload))
+            hit_us = (time.perf_counter() - started) / iterations * 1e6
+
+            results[name] = (len(payload), hit_us)
+            self.stdout.write(f'  {name:<18} {len(payload):>8} bytes  {hit_us:>8.1f} us/hit')
+
+        old_size, old_hit = results['pickled response']
+        new_size, new_hit = results['compact payload']
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Compact payload is {old_size / new_size:.1f}x smaller '
+                f'and {old_hit / new_hit:.1f}x faster to load'
+            )
+        )
+
+    def benchmark_keys(self, options):
+        """Compare str()/md5 key building with the key builder."""
+        iterations = options['iterations']
+        User = get_user_model()
+        user = User(pk=42, username='jane')
+        args = (user, datetime.date(2024, 1, 1), [1, 2, 3])
+        kwargs = {'page': 2}
+        
+        def legacy_key():
+            key_parts = ['user_report']
+            key_parts.extend([str(arg) for arg in args])
+            key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
+            return ':'.join(key_parts)
+        
+        key_template = KeyTemplate('user_report')
+        queryset = User.objects.filter(is_active=True).order_by('-date_joined')[:20]
+        
+        measurements = {
+            'function key': (
+                legacy_key,
+                lambda: key_template(args, kwargs),
+            ),
+            'queryset key': (
+                lambda: hashlib.md5(str(queryset.query).encode()).hexdigest(),
+                lambda: queryset_fingerprint(queryset),
+            ),
+        }
+        
+        self.stdout.write(f'{iterations} iterations')
+        for name, (legacy, current) in measurements.items():
+            legacy_us = self._time(legacy, iterations)
+            current_us = self._time(current, iterations)
+            self.stdout.write(
+                f'  {name:<14} str()/md5 {legacy_us:>8.2f} us  '
+                f'key builder {current_us:>8.2f} us  ({legacy_us / current_us:.1f}x)'
+            )
@@ -24,6 +24,23 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear all cache entries',
         )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many keys match --pattern',
+        )
+        parser.add_argument(
+            '--key-version',
+            type=str,
+            default=None,
+            help='Cache key version for --pattern ("*" for all versions)',
+        )
+        parser.add_argument(
+            '--scan-count',
+            type=int,
+            default=1000,
+            help='SCAN batch size used for --pattern',
+        )
     
     def handle(self, *args, **options):
         cache_name = options['cache']
@@ -41,10 +58,28 @@ class Command(BaseCommand):
             elif pattern:
                 # Clear by pattern
                 cache_service = CacheService(cache_alias=cache_name)
-                cache_service.invalidate_pattern(pattern)
-                self.stdout.write(
-                    self.style.SUCCESS(f'Cleared entries matching pattern: {pattern}')
+                result = cache_service.invalidate_pattern(
+                    pattern,
+                    version=options['key_version'],
+                    scan_count=options['scan_count'],
+                    dry_run=options['dry_run'],
                 )
+                elapsed_ms = result.elapsed * 1000
+                
+                if options['dry_run']:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f'{result.matched} keys match pattern: {pattern} '
+                            f'(scanned in {elapsed_ms:.1f}ms)'
+                        )
+                    )
+                else:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f'Cleared {result.removed} entries matching pattern: {pattern} '
+                            f'in {elapsed_ms:.1f}ms'
+                        )
+                    )
             else:
                 self.stdout.write(
                     self.style.WARNING('No action specified. Use --all or --pattern')
@@ -52,4 +87,4 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Error clearing cache: {str(e)}')
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,59 @@
+"""Management command to report cache metrics."""
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.cache.services import CacheService
+
+
+class Command(BaseCommand):
+    help = 'Report cache hit ratio, set sizes and latencies per key namespace'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cache',
+            type=str,
+            default='default',
+            help='Cache backend to report on',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the raw snapshot as JSON',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after reporting',
+        )
+
+    def handle(self, *args, **options):
+        cache_service = CacheService(options['cache'])
+        snapshot = cache_service.metrics_snapshot()
+
+        if options['json']:
+            self.stdout.write(json.dumps(snapshot, indent=2))
+        elif not snapshot:
+            self.stdout.write('No cache metrics recorded yet')
+        else:
+            self.stdout.write(
+                f"{'namespace':<24} {'hits':>10} {'misses':>10} {'ratio':>7} "
+                f"{'sets':>8} {'avg bytes':>10} {'get p95':>8} {'set p95':>8}"
+            )
+            for namespace, stats in sorted(snapshot.items()):
+                ratio = stats['hit_ratio']
+                self.stdout.write(
+                    f"{namespace:<24} {stats['hits']:>10} {stats['misses']:>10} "
+                    f"{format(ratio, '.1%') if ratio is not None else '-':>7} "
+                    f"{stats['sets']:>8} {stats['avg_set_bytes'] or '-':>10} "
+                    f"{self._ms(stats['get_latency_ms']['p95']):>8} "
+                    f"{self._ms(stats['set_latency_ms']['p95']):>8}"
+                )
+
+        if options['reset']:
+            cache_service.reset_metrics()
+            self.stdout.write(self.style.SUCCESS('Cache metrics reset'))
+
+    @staticmethod
+    def _ms(value) -> str:
+        return f"{value}ms" if value is not None else '-'
@@ -1,13 +1,33 @@
 """Management command to warm cache."""
-from django.core.management.base import BaseCommand
+import time
+
 from django.apps import apps
-from apps.cache.services import CacheWarmer
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.cache.traffic import traffic_tracker
+from apps.cache.warming import (
+    CacheWarmingEngine,
+    WarmItem,
+    endpoint_items,
+    load_warm_plan,
+    summarize_results,
+)
+
+DEFAULT_ENDPOINTS = [
+    '/api/config/',
+    '/api/users/me/',
+]
 
 
 class Command(BaseCommand):
     help = 'Warm cache with commonly accessed data'
-    
+
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--plan',
+            type=str,
+            help='JSON warm plan of endpoints, querysets and functions',
+        )
         parser.add_argument(
             '--models',
             nargs='+',
@@ -20,50 +40,110 @@ class Command(BaseCommand):
             type=str,
             help='API endpoints to warm',
         )
-    
+        parser.add_argument(
+            '--from-traffic',
+            type=int,
+            metavar='N',
+            help='Warm the N most requested anonymous API paths',
+        )
+        parser.add_argument(
+            '--traffic-days',
+            type=int,
+            default=1,
+            help='Days of traffic to rank --from-traffic paths by',
+        )
+        parser.add_argument(
+            '--as-user',
+            action='append',
+            default=[],
+            dest='users',
+            help='Also warm --endpoints as this user (email, username or pk); repeatable',
+        )
+        parser.add_argument(
+            '--token',
+            action='append',
+            default=[],
+            dest='tokens',
+            help='Also warm --endpoints with this Authorization header; repeatable',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Number of items warmed concurrently (default: plan value or 4)',
+        )
+        parser.add_argument(
+            '--deadline',
+            type=float,
+            help='Skip items not started within this many seconds',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Exit with an error if any item fails',
+        )
+
     def handle(self, *args, **options):
-        models = options.get('models', [])
-        endpoints = options.get('endpoints', [])
-        
-        warmer = CacheWarmer()
-        
-        # Warm model caches
-        if models:
-            for model_path in models:
-                try:
-                    app_label, model_name = model_path.split('.')
-                    model = apps.get_model(app_label, model_name)
-                    
-                    # Define common querysets to cache
-                    querysets = [
-                        model.objects.all()[:100],  # First 100 objects
-                        model.objects.filter(is_active=True) if hasattr(model, 'is_active') else model.objects.all(),
-                    ]
-                    
-                    warmer.warm_queryset_cache(model, querysets)
-                    self.stdout.write(
-                        self.style.SUCCESS(f'Warmed cache for {model_path}')
-                    )
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'Error warming cache for {model_path}: {str(e)}')
-                    )
-        
-        # Warm API endpoints
-        if endpoints:
-            warmer.warm_api_endpoints(endpoints)
-            self.stdout.write(
-                self.style.SUCCESS(f'Warmed cache for {len(endpoints)} endpoints')
-            )
-        
-        if not models and not endpoints:
+        items = []
+        concurrency = options['concurrency']
+
+        if options['plan']:
+            try:
+                plan = load_warm_plan(options['plan'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Invalid warm plan {options['plan']}: {str(e)}")
+            items.extend(plan['items'])
+            concurrency = concurrency or plan['concurrency']
+
+        for model_path in options['models'] or []:
+            model = apps.get_model(model_path)
+            items.append(WarmItem('queryset', model_path, options={'limit': 100}))
+            if any(field.name == 'is_active' for field in model._meta.get_fields()):
+                items.append(WarmItem('queryset', model_path, options={'filter': {'is_active': True}}))
+
+        if options['from_traffic']:
+            hot_paths = traffic_tracker.top(options['from_traffic'], days=options['traffic_days'])
+            self.stdout.write(f'Found {len(hot_paths)} hot paths in recorded traffic')
+            items.extend(WarmItem('endpoint', path) for path, _ in hot_paths)
+
+        endpoints = options['endpoints'] or []
+        if not items and not endpoints and not options['from_traffic']:
             # Default warming strategy
-            default_endpoints = [
-                '/api/config/',
-                '/api/users/me/',
-            ]
-            
-            warmer.warm_api_endpoints(default_endpoints)
-            self.stdout.write(
-                self.style.SUCCESS('Warmed cache with default strategy')
-            )
\ No newline at end of file
+            endpoints = DEFAULT_ENDPOINTS
+        items.extend(endpoint_items(endpoints, options['users'], options['tokens']))
+
+        engine = CacheWarmingEngine(
+            concurrency=concurrency or 4,
+            deadline=options['deadline'],
+            progress=self._report_progress,
+        )
+        self.stdout.write(f'Warming {len(items)} items with {engine.concurrency} workers')
+
+        started = time.monotonic()
+        results = engine.run(items)
+        self._report_summary(results, time.monotonic() - started)
+
+        if options['strict'] and any(not result.ok for result in results):
+            raise CommandError('Cache warming failed for some items')
+
+    def _report_progress(self, result, done: int, total: int):
+        status = self.style.SUCCESS('OK  ') if result.ok else self.style.ERROR('FAIL')
+        self.stdout.write(
+            f'[{done}/{total}] {status} {result.item.kind:<8} {result.item.label} '
+            f'{result.elapsed * 1000:.1f}ms ({result.detail})'
+        )
+
+    def _report_summary(self, results, elapsed: float):
+        summary = summarize_results(results)
+
+        self.stdout.write('Slowest items:')
+        for result in summary['slowest']:
+            self.stdout.write(f'  {result.elapsed * 1000:>8.1f}ms  {result.item.label}')
+
+        message = (
+            f"Warmed {summary['ok']}/{summary['total']} items in {elapsed:.2f}s "
+            f"({summary['busy_seconds']:.2f}s of work)"
+        )
+        if summary['failed']:
+            self.stdout.write(self.style.ERROR(f"{message}, {len(summary['failed'])} failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,332 @@
+"""Per-namespace cache metrics.
+
+Counters are aggregated in-process and flushed to Redis in one pipeline
+every few seconds, so every worker contributes to the same totals without
+a round trip per cache operation.
+"""
+import logging
+import pickle
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, float('inf'))
+
+# Namespaces beyond this limit are counted as "other"
+MAX_NAMESPACES = 100
+
+METRICS_KEY = 'cache_metrics'
+
+
+def key_namespace(key: str) -> str:
+    """Namespace of a cache key: its first segment.
+
+    ``api_cache:...`` is ``api_cache``, ``qs:...`` is ``qs``, ``tag:...``
+    is ``tag`` and cache_result keys are named after their function.
+    """
+    return key.split(':', 1)[0] or 'other'
+
+
+def _bucket_field(operation: str, elapsed_ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if elapsed_ms <= bound:
+            return f'{operation}_le_{bound}'
+
+
+class CacheMetrics:
+    """Process-local cache counters with batched flushes to Redis."""
+
+    def __init__(self):
+        self._pending = defaultdict(Counter)
+        self._totals = defaultdict(Counter)
+        self._namespaces = set()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @property
+    def flush_interval(self) -> float:
+        return getattr(settings, 'CACHE_METRICS', {}).get('FLUSH_INTERVAL', 10)
+
+    @property
+    def size_sample_rate(self) -> float:
+        return getattr(settings, 'CACHE_METRICS', {}).get('SIZE_SAMPLE_RATE', 0.01)
+
+    def _namespace(self, key: str) -> str:
+        namespace = key_namespace(key)
+        if namespace not in self._namespaces:
+            if len(self._namespaces) >= MAX_NAMESPACES:
+                return 'other'
+            self._namespaces.add(namespace)
+        return namespace
+
+    def record_get(self, key: str, hits: int, misses: int, elapsed: float):
+        """Record a get (or get_many) and its latency.
+
+        A get_many is recorded under the namespace of its first key.
+        """
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            counters = self._pending[self._namespace(key)]
+            counters['hits'] += hits
+            counters['misses'] += misses
+            counters['gets'] += 1
+            counters['get_us'] += int(elapsed * 1e6)
+            counters[_bucket_field('get', elapsed_ms)] += 1
+
+    def record_set(self, key: str, size: Optional[int], elapsed: float):
+        """Record a set, its serialized size (None when not sampled) and its latency."""
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            counters = self._pending[self._namespace(key)]
+            counters['sets'] += 1
+            if size is not None:
+                counters['sized_sets'] += 1
+                counters['set_bytes'] += size
+            counters['set_us'] += int(elapsed * 1e6)
+            counters[_bucket_field('set', elapsed_ms)] += 1
+
+    def maybe_flush(self, redis_client=None, backend=None):
+        """Flush pending counters once the flush interval elapsed."""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush(redis_client, backend)
+
+    def flush(self, redis_client=None, backend=None):
+        """Add pending counters to the shared totals.
+
+        With Redis the totals are hashes updated with pipelined HINCRBY;
+        otherwise they are kept in this process.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return
+
+        if redis_client is None:
+            with self._lock:
+                for namespace, counters in pending.items():
+                    self._totals[namespace].update(counters)
+            return
+
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.sadd(self._redis_key(backend, 'namespaces'), *pending)
+            for namespace, counters in pending.items():
+                hash_key = self._redis_key(backend, f'ns:{namespace}')
+                for field, amount in counters.items():
+                    pipe.hincrby(hash_key, field, amount)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to flush cache metrics: {str(e)}")
+
+    def totals(self, redis_client=None, backend=None) -> Dict[str, Counter]:
+        """Flush, then read the totals of every namespace."""
+        self.flush(redis_client, backend)
+
+        if redis_client is None:
+            with self._lock:
+                return {namespace: Counter(counters) for namespace, counters in self._totals.items()}
+
+        namespaces = sorted(
+            member.decode() if isinstance(member, bytes) else member
+            for member in redis_client.smembers(self._redis_key(backend, 'namespaces'))
+        )
+        pipe = redis_client.pipeline(transaction=False)
+        for namespace in namespaces:
+            pipe.hgetall(self._redis_key(backend, f'ns:{namespace}'))
+
+        totals = {}
+        for namespace, counters in zip(namespaces, pipe.execute(), strict=True):
+            totals[namespace] = Counter({
+                (field.decode() if isinstance(field, bytes) else field): int(amount)
+                for field, amount in counters.items()
+            })
+        return totals
+
+    def snapshot(self, redis_client=None, backend=None) -> Dict[str, Any]:
+        """Summarize the totals of every namespace for reporting."""
+        return {
+            namespace: summarize(counters)
+            for namespace, counters in self.totals(redis_client, backend).items()
+        }
+
+    def reset(self, redis_client=None, backend=None):
+        """Drop pending and flushed counters."""
+        with self._lock:
+            self._pending.clear()
+            self._totals.clear()
+            self._namespaces.clear()
+
+        if redis_client is None:
+            return
+
+        namespaces_key = self._redis_key(backend, 'namespaces')
+        namespaces = redis_client.smembers(namespaces_key)
+        keys = [namespaces_key]
+        keys += [
+            self._redis_key(backend, f"ns:{member.decode() if isinstance(member, bytes) else member}")
+            for member in namespaces
+        ]
+        redis_client.delete(*keys)
+
+    @staticmethod
+    def _redis_key(backend, suffix: str) -> str:
+        key = f'{METRICS_KEY}:{suffix}'
+        return backend.make_key(key) if backend is not None else key
+
+
+def _percentile(counters: Counter, operation: str, count: int, quantile: float) -> Optional[float]:
+    """Upper bound of the bucket holding a quantile, in milliseconds."""
+    if not count:
+        return None
+
+    threshold = count * quantile
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += counters.get(f'{operation}_le_{bound}', 0)
+        if seen >= threshold:
+            return bound if bound != float('inf') else None
+    return None
+
+
+def summarize(counters: Counter) -> Dict[str, Any]:
+    """Turn raw counters into hit ratio, sizes and latency percentiles."""
+    hits = counters.get('hits', 0)
+    misses = counters.get('misses', 0)
+    gets = counters.get('gets', 0)
+    sets = counters.get('sets', 0)
+    sized_sets = counters.get('sized_sets', 0)
+    avg_set_bytes = counters.get('set_bytes', 0) // sized_sets if sized_sets else None
+
+    summary = {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        'sets': sets,
+        # Sizes are sampled: the total is extrapolated from the sampled sets
+        'set_bytes': avg_set_bytes * sets if avg_set_bytes is not None else 0,
+        'sized_sets': sized_sets,
+        'avg_set_bytes': avg_set_bytes,
+    }
+    for operation, count in (('get', gets), ('set', sets)):
+        summary[f'{operation}_latency_ms'] = {
+            'count': count,
+            'avg': round(counters.get(f'{operation}_us', 0) / count / 1000, 3) if count else None,
+            'p50': _percentile(counters, operation, count, 0.5),
+            'p95': _percentile(counters, operation, count, 0.95),
+            'p99': _percentile(counters, operation, count, 0.99),
+        }
+    return summary
+
+
+def metrics_enabled() -> bool:
+    """Check whether CacheService backends are instrumented."""
+    return getattr(settings, 'CACHE_METRICS', {}).get('ENABLED', False)
+
+
+class InstrumentedCache:
+    """Cache backend proxy recording per-namespace metrics.
+
+    Reads and writes (get, get_many, set, set_many) are measured; every
+    other attribute is passed through to the wrapped backend. Set sizes
+    are those of the pickled value, before backend compression; since
+    measuring means pickling the value a second time, only a
+    CACHE_METRICS['SIZE_SAMPLE_RATE'] fraction of the sets of values
+    that are not already bytes is measured.
+    """
+
+    def __init__(self, backend, metrics: CacheMetrics, redis_client=None):
+        """Initialize the proxy.
+
+        Args:
+            backend: Django cache backend
+            metrics: Recorder the measurements go to
+            redis_client: Redis client counters are flushed to
+        """
+        self.backend = backend
+        self.metrics = metrics
+        self.redis_client = redis_client
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def get(self, key, default=None, version=None):
+        started = time.perf_counter()
+        value = self.backend.get(key, _MISSING, version=version)
+        elapsed = time.perf_counter() - started
+
+        hit = value is not _MISSING
+        self.metrics.record_get(key, int(hit), int(not hit), elapsed)
+        self.metrics.maybe_flush(self.redis_client, self.backend)
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        started = time.perf_counter()
+        found = self.backend.get_many(keys, version=version)
+        elapsed = time.perf_counter() - started
+
+        self.metrics.record_get(keys[0], len(found), len(keys) - len(found), elapsed)
+        self.metrics.maybe_flush(self.redis_client, self.backend)
+        return found
+
+    def set(self, key, value, timeout=_MISSING, version=None):
+        started = time.perf_counter()
+        if timeout is _MISSING:
+            self.backend.set(key, value, version=version)
+        else:
+            self.backend.set(key, value, timeout=timeout, version=version)
+        elapsed = time.perf_counter() - started
+
+        self.metrics.record_set(key, self._sampled_size(value), elapsed)
+        self.metrics.maybe_flush(self.redis_client, self.backend)
+
+    def set_many(self, data, timeout=_MISSING, version=None):
+        if not data:
+            return []
+
+        started = time.perf_counter()
+        if timeout is _MISSING:
+            failed = self.backend.set_many(data, version=version)
+        else:
+            failed = self.backend.set_many(data, timeout=timeout, version=version)
+        elapsed = time.perf_counter() - started
+
+        # Latency of the whole batch is spread over its keys
+        for key, value in data.items():
+            self.metrics.record_set(key, self._sampled_size(value), elapsed / len(data))
+        self.metrics.maybe_flush(self.redis_client, self.backend)
+        return failed
+
+    def _sampled_size(self, value) -> Optional[int]:
+        if isinstance(value, bytes):
+            return len(value)
+        if random.random() >= self.metrics.size_sample_rate:
+            return None
+        return _size(value)
+
+
+def _size(value) -> int:
+    if isinstance(value, bytes):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+# Process-wide recorder shared by every instrumented backend
+cache_metrics = CacheMetrics()
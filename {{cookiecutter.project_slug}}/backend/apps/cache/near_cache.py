@@ -0,0 +1,249 @@
+"""Per-process near cache in front of the shared Redis cache."""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Defaults for the NEAR_CACHE setting
+NEAR_CACHE_DEFAULTS = {
+    'MAX_ENTRIES': 1024,
+    'TTL': 30,  # seconds; bounds staleness if an invalidation is missed
+    'CHANNEL': 'near-cache:invalidate',
+}
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU with a TTL per entry.
+
+    Values are stored as-is (not pickled), so callers must treat them
+    as read-only.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """Initialize the LRU.
+
+        Args:
+            max_entries: Maximum number of entries before evicting
+        """
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a live entry, marking it as recently used."""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store an entry, evicting the least recently used if full."""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """Remove an entry if present."""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters of this process."""
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class NearCache:
+    """Two-level cache: a per-process LRU in front of a shared backend.
+
+    Writes and deletes made through the near cache are published on a
+    Redis pub/sub channel; every process subscribed to it drops its local
+    copy of the key. Entries also expire locally after a short TTL, which
+    bounds staleness when a message is missed or the value was written
+    directly to the backend.
+    """
+
+    # One near cache per cache alias and process
+    _instances: Dict[str, 'NearCache'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, cache_alias: str = DEFAULT_CACHE_ALIAS, redis_client=None):
+        """Initialize the near cache.
+
+        Args:
+            cache_alias: Name of the shared cache backend
+            redis_client: Redis client used for pub/sub invalidation
+        """
+        options = {**NEAR_CACHE_DEFAULTS, **getattr(settings, 'NEAR_CACHE', {})}
+        self.cache_alias = cache_alias
+        self.backend = caches[cache_alias]
+        self.local = LRUCache(options['MAX_ENTRIES'])
+        self.ttl = options['TTL']
+        # Pub/sub channels are global to the Redis server, so the channel
+        # carries the backend's KEY_PREFIX like any other key
+        self.channel = self.backend.make_key(f"{options['CHANNEL']}:{cache_alias}")
+        self.redis_client = redis_client
+        self.node_id = uuid.uuid4().hex
+        self.invalidations = 0
+        self._subscriber = None
+        self._subscribe_lock = threading.Lock()
+
+    @classmethod
+    def for_alias(cls, cache_alias: str = DEFAULT_CACHE_ALIAS, redis_client=None) -> 'NearCache':
+        """Get the process-wide near cache of a cache alias."""
+        with cls._instances_lock:
+            near_cache = cls._instances.get(cache_alias)
+            if near_cache is None:
+                near_cache = cls(cache_alias, redis_client)
+                cls._instances[cache_alias] = near_cache
+            return near_cache
+
+    def get(self, key: str, default: Any = None, version: Optional[int] = None) -> Any:
+        """Get a value, from the local LRU when possible."""
+        self._ensure_subscribed()
+        local_key = self.backend.make_key(key, version=version)
+
+        value = self.local.get(local_key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self.backend.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+
+        self.local.set(local_key, value, self.ttl)
+        return value
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None, version: Optional[int] = None):
+        """Write through to the backend and invalidate other processes."""
+        self.backend.set(key, value, timeout=timeout, version=version)
+
+        local_key = self.backend.make_key(key, version=version)
+        self.local.set(local_key, value, self.ttl if timeout is None else min(self.ttl, timeout))
+        self._publish('del', local_key)
+
+    def delete(self, key: str, version: Optional[int] = None) -> bool:
+        """Delete from the backend and from every process."""
+        deleted = self.backend.delete(key, version=version)
+
+        local_key = self.backend.make_key(key, version=version)
+        self.local.delete(local_key)
+        self._publish('del', local_key)
+        return deleted
+
+    def invalidate_local(self, key: str, version: Optional[int] = None):
+        """Drop a key from every process without touching the backend."""
+        local_key = self.backend.make_key(key, version=version)
+        self.local.delete(local_key)
+        self._publish('del', local_key)
+
+    def flush(self):
+        """Drop every local entry in every process."""
+        self.local.clear()
+        self._publish('flush', '')
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-process near cache statistics."""
+        stats = self.local.stats()
+        stats['invalidations'] = self.invalidations
+        stats['subscribed'] = self._subscriber is not None and self._subscriber.is_alive()
+        return stats
+
+    def _publish(self, op: str, local_key: str):
+        """Broadcast an invalidation message."""
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.publish(self.channel, f"{self.node_id}:{op}:{local_key}")
+        except Exception as e:
+            logger.warning(f"Failed to publish near cache invalidation: {str(e)}")
+
+    def _handle_message(self, message):
+        """Apply an invalidation published by another process."""
+        data = message.get('data')
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        node_id, op, local_key = data.split(':', 2)
+        if node_id == self.node_id:
+            return
+
+        self.invalidations += 1
+        if op == 'flush':
+            self.local.clear()
+        else:
+            self.local.delete(local_key)
+
+    def _handle_subscriber_error(self, error, pubsub, thread):
+        """Stop the subscriber; it is restarted on the next read."""
+        logger.warning(f"Near cache subscriber stopped: {str(error)}")
+        thread.stop()
+        pubsub.close()
+
+    def _ensure_subscribed(self):
+        """Start (or restart) the invalidation subscriber thread."""
+        if not self.redis_client:
+            return
+        if self._subscriber is not None and self._subscriber.is_alive():
+            return
+
+        with self._subscribe_lock:
+            if self._subscriber is not None and self._subscriber.is_alive():
+                return
+
+            # Messages may have been missed while unsubscribed
+            self.local.clear()
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._handle_message})
+                self._subscriber = pubsub.run_in_thread(
+                    sleep_time=1.0,
+                    daemon=True,
+                    exception_handler=self._handle_subscriber_error,
+                )
+            except Exception as e:
+                logger.warning(f"Near cache running without invalidation messages: {str(e)}")
+                self._subscriber = None
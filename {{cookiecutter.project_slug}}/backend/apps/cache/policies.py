@@ -0,0 +1,210 @@
+"""Declarative cache policies for API endpoints.
+
+The API_CACHE_POLICIES setting is the single table that decides, per
+URL prefix or viewset action, how long APICacheMiddleware keeps a
+response, who shares it, and which Cache-Control and Surrogate-Key
+headers let nginx, a CDN and browsers cache it as well.
+"""
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import Resolver404, resolve
+
+from .near_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ('public', 'role', 'user')
+
+# Seconds a path's resolved policy is remembered in-process
+MATCH_CACHE_TTL = 3600
+
+
+class CachePolicy(NamedTuple):
+    """How the responses of an endpoint are cached.
+
+    Attributes:
+        ttl: Seconds a response is fresh, in the server cache and in shared
+            caches (s-maxage); 0 disables caching
+        stale: Seconds a stale response may still be served while it is
+            refreshed (stale-while-revalidate)
+        scope: 'public' (shared by everyone), 'role' (per user role) or
+            'user' (per user)
+        max_age: Seconds browsers may reuse a response without revalidating
+        surrogate_keys: Purge tags, may refer to URL kwargs such as '{pk}'
+        name: The path or action the policy was declared for
+    """
+    ttl: int = 60
+    stale: int = 30
+    scope: str = 'user'
+    max_age: int = 0
+    surrogate_keys: Tuple[str, ...] = ()
+    name: str = 'default'
+
+    @property
+    def cacheable(self) -> bool:
+        return self.ttl > 0
+
+    def cache_control(self) -> str:
+        """Cache-Control header value for responses under this policy."""
+        if self.scope != 'public':
+            # Never stored by shared caches, browsers revalidate with the ETag
+            return f"private, max-age={self.max_age}"
+        return (
+            f"public, max-age={self.max_age}, s-maxage={self.ttl}, "
+            f"stale-while-revalidate={self.stale}"
+        )
+
+    def resolve_surrogate_keys(self, url_kwargs: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Surrogate keys with URL kwargs filled in.
+
+        Keys referring to a kwarg the URL does not have are skipped.
+        """
+        keys = []
+        for key in self.surrogate_keys:
+            try:
+                keys.append(key.format_map(url_kwargs or {}))
+            except (KeyError, IndexError):
+                continue
+        return keys
+
+
+def _build_policy(entry: Dict[str, Any]) -> CachePolicy:
+    """Build a CachePolicy from an API_CACHE_POLICIES entry."""
+    options = dict(entry)
+    name = options.pop('action', None) or options.pop('path', None)
+    if not name:
+        raise ImproperlyConfigured(f"API_CACHE_POLICIES entry needs a path or an action: {entry}")
+
+    scope = options.get('scope', 'user')
+    if scope not in SCOPES:
+        raise ImproperlyConfigured(f"Unknown cache scope {scope!r} in API_CACHE_POLICIES entry {name}")
+
+    options['surrogate_keys'] = tuple(options.get('surrogate_keys', ()))
+    try:
+        return CachePolicy(name=name, **options)
+    except TypeError as e:
+        raise ImproperlyConfigured(f"Invalid API_CACHE_POLICIES entry {name}: {str(e)}")
+
+
+class CachePolicyTable:
+    """Match request paths against the policy table.
+
+    Viewset actions (``'<basename>.<action>'`` or ``'<basename>.*'``) take
+    precedence over paths, and among paths the longest matching prefix
+    wins. Paths matching no entry get the default CachePolicy.
+    """
+
+    def __init__(self, entries: Sequence[Dict[str, Any]], max_paths: int = 4096):
+        """Compile the table.
+
+        Args:
+            entries: API_CACHE_POLICIES entries
+            max_paths: Number of resolved paths remembered
+
+        Raises:
+            ImproperlyConfigured: If an entry is invalid
+        """
+        self.default = CachePolicy()
+        self.by_action = {}
+        self.by_path = []
+        for entry in entries:
+            policy = _build_policy(entry)
+            if 'action' in entry:
+                self.by_action[entry['action']] = policy
+            else:
+                self.by_path.append((entry['path'], policy))
+        self.by_path.sort(key=lambda item: len(item[0]), reverse=True)
+        self._matches = LRUCache(max_paths)
+
+    def match(self, path: str) -> Tuple[CachePolicy, Dict[str, Any]]:
+        """Get the policy of a path.
+
+        Returns:
+            Tuple of (CachePolicy, URL kwargs of the resolved view)
+        """
+        matched = self._matches.get(path)
+        if matched is None:
+            matched = self._match(path)
+            self._matches.set(path, matched, MATCH_CACHE_TTL)
+        return matched
+
+    def _match(self, path: str) -> Tuple[CachePolicy, Dict[str, Any]]:
+        action, url_kwargs = self._resolve(path)
+        if action is not None:
+            basename = action.split('.', 1)[0]
+            policy = self.by_action.get(action) or self.by_action.get(f"{basename}.*")
+            if policy is not None:
+                return policy, url_kwargs
+
+        for prefix, policy in self.by_path:
+            if path.startswith(prefix):
+                return policy, url_kwargs
+        return self.default, url_kwargs
+
+    @staticmethod
+    def _resolve(path: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Resolve a path to its viewset action name and URL kwargs."""
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return None, {}
+
+        actions = getattr(match.func, 'actions', None)
+        basename = getattr(match.func, 'initkwargs', {}).get('basename')
+        if not actions or not basename or 'get' not in actions:
+            return None, match.kwargs
+        return f"{basename}.{actions['get']}", match.kwargs
+
+
+_table = None
+_table_entries = None
+
+
+def get_policy_table() -> CachePolicyTable:
+    """Get the table compiled from the current API_CACHE_POLICIES."""
+    global _table, _table_entries
+
+    entries = getattr(settings, 'API_CACHE_POLICIES', [])
+    if _table is None or entries is not _table_entries:
+        _table, _table_entries = CachePolicyTable(entries), entries
+    return _table
+
+
+def get_cache_policy(path: str) -> Tuple[CachePolicy, Dict[str, Any]]:
+    """Get the cache policy and URL kwargs of a request path."""
+    return get_policy_table().match(path)
+
+
+def apply_cache_headers(
+    response,
+    policy: CachePolicy,
+    url_kwargs: Optional[Dict[str, Any]] = None,
+    age: Optional[int] = None,
+):
+    """Add the policy's HTTP caching headers to a response.
+
+    Headers set by the view itself are kept, and only successful or
+    Not Modified responses are marked as cacheable.
+
+    Args:
+        response: HttpResponse
+        policy: Policy of the request path
+        url_kwargs: URL kwargs for the surrogate keys
+        age: Seconds since a cached response was rendered
+    """
+    if not policy.cacheable or getattr(response, 'status_code', None) not in (200, 304):
+        return
+
+    if not response.has_header('Cache-Control'):
+        response['Cache-Control'] = policy.cache_control()
+
+    surrogate_keys = policy.resolve_surrogate_keys(url_kwargs)
+    if surrogate_keys and not response.has_header('Surrogate-Key'):
+        response['Surrogate-Key'] = ' '.join(surrogate_keys)
+
+    # Lets shared caches subtract the time the response spent in ours
+    if age is not None and policy.scope == 'public':
+        response['Age'] = str(max(0, age))
@@ -0,0 +1,192 @@
+"""Model-change driven cache invalidation through generation counters."""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Set, Type
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+M2M_CHANGE_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+
+class ModelInvalidationRegistry:
+    """Opt-in registry bumping a per-model generation on every change.
+
+    Cache keys that embed the generation of the models they depend on
+    (see QuerySetCache) are invalidated in O(1) by bumping the counter,
+    without scanning the keyspace. Writes inside a transaction only bump
+    the counter once the transaction commits.
+    """
+
+    def __init__(self, cache_alias: str = 'default'):
+        """Initialize the registry.
+
+        Args:
+            cache_alias: Name of the cache backend holding the counters
+        """
+        self.cache_alias = cache_alias
+        self._models: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def register(self, model: Type[Model]) -> Type[Model]:
+        """Invalidate cached data of model whenever it changes.
+
+        Wires post_save, post_delete and m2m_changed (for many-to-many
+        relations in both directions). Can be used as a class decorator.
+
+        Args:
+            model: Django model class
+
+        Returns:
+            The model, unchanged
+        """
+        label = model._meta.label_lower
+        with self._lock:
+            if label in self._models:
+                return model
+            self._models.add(label)
+
+        post_save.connect(
+            self._handle_change, sender=model, weak=False, dispatch_uid=self._uid(model, "save")
+        )
+        post_delete.connect(
+            self._handle_change, sender=model, weak=False, dispatch_uid=self._uid(model, "delete")
+        )
+        for through in self._through_models(model):
+            m2m_changed.connect(
+                self._handle_m2m_change,
+                sender=through,
+                weak=False,
+                dispatch_uid=self._uid(through, "m2m"),
+            )
+
+        logger.debug(f"Registered {label} for cache invalidation")
+        return model
+
+    def unregister(self, model: Type[Model]):
+        """Stop invalidating cached data of model on changes."""
+        with self._lock:
+            self._models.discard(model._meta.label_lower)
+
+        post_save.disconnect(sender=model, dispatch_uid=self._uid(model, "save"))
+        post_delete.disconnect(sender=model, dispatch_uid=self._uid(model, "delete"))
+        for through in self._through_models(model):
+            # The relation may still matter to the model on its other side
+            related = [field.related_model for field in through._meta.get_fields() if field.is_relation]
+            if not any(self.is_registered(model) for model in related):
+                m2m_changed.disconnect(sender=through, dispatch_uid=self._uid(through, "m2m"))
+
+    def _uid(self, model: Type[Model], signal: str) -> str:
+        """Dispatch UID unique per registry, model and signal."""
+        return f"cache_registry:{id(self)}:{model._meta.label_lower}:{signal}"
+
+    @staticmethod
+    def _through_models(model: Type[Model]) -> List[Type[Model]]:
+        """Through models of many-to-many relations in both directions."""
+        through_models = [field.remote_field.through for field in model._meta.many_to_many]
+        through_models += [
+            rel.through for rel in model._meta.related_objects if rel.many_to_many
+        ]
+        return through_models
+
+    def is_registered(self, model: Type[Model]) -> bool:
+        """Check whether model changes bump a generation."""
+        return model._meta.label_lower in self._models
+
+    def generation_key(self, model: Type[Model]) -> str:
+        """Cache key of a model's generation counter."""
+        return f"gen:{model._meta.label_lower}"
+
+    def get_generation(self, model: Type[Model]) -> int:
+        """Get the current generation of a model."""
+        return self.get_generations([model])[model._meta.label_lower]
+
+    def get_generations(self, models: Iterable[Type[Model]]) -> Dict[str, int]:
+        """Get the current generations of several models in one round trip.
+
+        Args:
+            models: Django model classes
+
+        Returns:
+            Dictionary mapping model label to generation
+        """
+        keys = {self.generation_key(model): model for model in models}
+        found = self.cache.get_many(list(keys))
+
+        generations = {}
+        for key, model in keys.items():
+            generation = found.get(key)
+            if generation is None:
+                generation = self._seed(key)
+            generations[model._meta.label_lower] = generation
+        return generations
+
+    def bump(self, model: Type[Model]) -> int:
+        """Invalidate every cache key built on the current generation.
+
+        Args:
+            model: Django model class
+
+        Returns:
+            The new generation
+        """
+        key = self.generation_key(model)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Counter missing (first use, eviction or flush)
+            self._seed(key)
+            return self.cache.incr(key)
+
+    def _bump_quietly(self, model: Type[Model]):
+        """Bump a generation from a commit hook without ever raising.
+
+        An unavailable cache must not turn a committed write into an error;
+        the affected entries simply live until their TTL.
+        """
+        try:
+            self.bump(model)
+        except Exception as e:
+            logger.error(f"Failed to invalidate cache for {model._meta.label_lower}: {str(e)}")
+
+    def _seed(self, key: str) -> int:
+        """Create a missing counter.
+
+        Counters start from the current time in milliseconds rather than
+        zero, so an evicted counter can never roll back to a generation
+        whose cache entries are still alive.
+        """
+        seed = int(time.time() * 1000)
+        self.cache.add(key, seed, timeout=None)
+        return self.cache.get(key) or seed
+
+    def _handle_change(self, sender, using=None, **kwargs):
+        """Bump the generation of a saved or deleted model."""
+        transaction.on_commit(lambda: self._bump_quietly(sender), using=using)
+
+    def _handle_m2m_change(self, sender, instance, action, model, using=None, **kwargs):
+        """Bump the generations of both sides of a changed relation."""
+        if action not in M2M_CHANGE_ACTIONS:
+            return
+
+        for changed in {type(instance), model}:
+            if self.is_registered(changed):
+                transaction.on_commit(lambda changed=changed: self._bump_quietly(changed), using=using)
+
+
+# Default registry used by QuerySetCache
+cache_registry = ModelInvalidationRegistry()
+
+
+def register_model(model: Type[Model]) -> Type[Model]:
+    """Register a model with the default registry, usable as a decorator."""
+    return cache_registry.register(model)
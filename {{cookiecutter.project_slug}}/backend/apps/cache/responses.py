@@ -0,0 +1,129 @@
+"""Compact cached representation of HTTP responses."""
+import hashlib
+from typing import NamedTuple, Optional, Tuple
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+# Headers worth replaying on a cache hit; everything else (cookies, CSRF,
+# per-request tracing headers) is produced fresh by the middleware stack
+CACHED_HEADERS = (
+    'Content-Type',
+    'Content-Language',
+    'Content-Disposition',
+    'Allow',
+    'Vary',
+    'Cache-Control',
+    'ETag',
+    'Last-Modified',
+    'Expires',
+    'X-Frame-Options',
+)
+
+
+class CachedResponse(NamedTuple):
+    """Status, whitelisted headers and rendered body of a response.
+
+    Attributes:
+        status: HTTP status code
+        headers: Tuple of (name, value) pairs from CACHED_HEADERS
+        body: Rendered response body
+        etag: Strong ETag of the body, quoted
+    """
+    status: int
+    headers: Tuple[Tuple[str, str], ...]
+    body: bytes
+    etag: str = ''
+
+
+def compute_etag(body: bytes) -> str:
+    """Compute a strong ETag for a response body.
+
+    Args:
+        body: Rendered response body
+
+    Returns:
+        Quoted content hash suitable for the ETag header
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Check an ETag against an If-None-Match header.
+
+    If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+
+    Args:
+        etag: Quoted ETag of the current representation
+        if_none_match: Raw If-None-Match header value
+
+    Returns:
+        True if the client already has this representation
+    """
+    if not etag or not if_none_match:
+        return False
+
+    candidates = parse_etags(if_none_match)
+    if '*' in candidates:
+        return True
+
+    etag = etag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
+
+def not_modified(etag: str) -> HttpResponseNotModified:
+    """Build a 304 response for a successful revalidation.
+
+    Args:
+        etag: Quoted ETag the client revalidated
+
+    Returns:
+        HttpResponseNotModified carrying the ETag
+    """
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def serialize_response(response) -> Optional[CachedResponse]:
+    """Convert a response into its compact cached form.
+
+    Template and DRF responses that have not been rendered yet are
+    rendered first, so the cached payload never contains renderer state.
+    Responses without an ETag get a strong one computed from the body,
+    set on the live response as well.
+
+    Args:
+        response: HttpResponse, TemplateResponse or DRF Response
+
+    Returns:
+        CachedResponse, or None for streaming responses
+    """
+    if getattr(response, 'streaming', False):
+        return None
+
+    if getattr(response, 'is_rendered', True) is False:
+        response.render()
+
+    if not response.has_header('ETag'):
+        response['ETag'] = compute_etag(response.content)
+
+    headers = tuple(
+        (name, response[name]) for name in CACHED_HEADERS if response.has_header(name)
+    )
+    return CachedResponse(response.status_code, headers, response.content, response['ETag'])
+
+
+def build_response(cached: CachedResponse) -> HttpResponse:
+    """Rebuild a response from its cached form without re-rendering.
+
+    Args:
+        cached: CachedResponse produced by serialize_response()
+
+    Returns:
+        HttpResponse with the cached status, headers and body
+    """
+    response = HttpResponse(cached.body, status=cached.status)
+    for name, value in cached.headers:
+        response[name] = value
+    return response
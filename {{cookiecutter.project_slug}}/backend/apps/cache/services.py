@@ -1,59 +1,203 @@
 """Advanced caching services and utilities."""
-import hashlib
+import copy
 import json
 import logging
-from typing import Any, Callable, Dict, List, Optional, Union
-from functools import wraps
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+from functools import lru_cache, wraps
 from django.core.cache import cache, caches
 from django.conf import settings
+from django.db import connections
 from django.utils import timezone
 from django.db.models import Model, QuerySet
 from django.http import HttpRequest
+from django.utils.cache import cc_delim_re
 import redis
 
+from .edge import edge_cache
+from .identity import ANONYMOUS, Identity, identity_resolver
+from .keys import KeyTemplate, build_key, fast_hash, queryset_fingerprint
+from .metrics import InstrumentedCache, cache_metrics, metrics_enabled
+from .near_cache import LRUCache, NearCache
+from .policies import CachePolicy, apply_cache_headers, get_cache_policy
+from .registry import cache_registry
+from .responses import (
+    CachedResponse,
+    build_response,
+    etag_matches,
+    not_modified,
+    serialize_response,
+)
+from .tasks import REFRESH_META_KEY, celery_enabled, refresh_api_cache_entry
+
 logger = logging.getLogger(__name__)
 
+# Compare-and-delete so a worker never releases a lock it no longer owns
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Add keys to every tag set, extending (never shortening) the set TTL
+TAG_ADD_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+for _, tag_key in ipairs(KEYS) do
+    redis.call('sadd', tag_key, unpack(ARGV, 2))
+    if redis.call('ttl', tag_key) < ttl then
+        redis.call('expire', tag_key, ttl)
+    end
+end
+return 1
+"""
+
+# Atomically unlink every member of the given tag sets and the sets
+# themselves; members are unpacked in chunks to stay below Lua's stack limit
+TAG_INVALIDATE_SCRIPT = """
+local removed = 0
+for _, tag_key in ipairs(KEYS) do
+    local members = redis.call('smembers', tag_key)
+    for i = 1, #members, 1000 do
+        removed = removed + redis.call('unlink', unpack(members, i, math.min(i + 999, #members)))
+    end
+    redis.call('unlink', tag_key)
+end
+return removed
+"""
+
+# Minimum lifetime of a tag index
+TAG_INDEX_TIMEOUT = 86400  # 24 hours
+
+_MISSING = object()
+
+
+class CacheEntry(NamedTuple):
+    """Cached value stored by single-flight get_or_set.
+
+    Attributes:
+        value: The cached value
+        delta: Seconds it took to compute the value
+        expires_at: Unix timestamp of the logical expiry
+    """
+    value: Any
+    delta: float
+    expires_at: Optional[float]
+
+
+class InvalidationResult(NamedTuple):
+    """Outcome of a pattern invalidation.
+    
+    Attributes:
+        matched: Number of keys matching the pattern
+        removed: Number of keys actually removed
+        elapsed: Seconds spent scanning and deleting
+    """
+    matched: int
+    removed: int
+    elapsed: float
+
 
 class CacheService:
     """Advanced cache service with multiple strategies."""
     
-    def __init__(self, cache_alias: str = 'default'):
+    # Process-wide single-flight counters, see single_flight_stats()
+    _stats = Counter()
+    _stats_lock = threading.Lock()
+    
+    # Serializes tag index updates on non-Redis backends
+    _tag_lock = threading.Lock()
+    
+    def __init__(self, cache_alias: str = 'default', near_cache: Optional[bool] = None):
         """Initialize cache service.
         
         Args:
             cache_alias: Name of the cache backend to use
+            near_cache: Read through the per-process near cache, defaults
+                to NEAR_CACHE['ENABLED']
         """
+        self.cache_alias = cache_alias
         self.cache = caches[cache_alias]
         self.redis_client = self._get_redis_client()
+        
+        if metrics_enabled():
+            self.cache = InstrumentedCache(self.cache, cache_metrics, self.redis_client)
+        
+        if near_cache is None:
+            near_cache = getattr(settings, 'NEAR_CACHE', {}).get('ENABLED', False)
+        self.near_cache = NearCache.for_alias(cache_alias, self.redis_client) if near_cache else None
     
     def _get_redis_client(self) -> Optional[redis.Redis]:
-        """Get Redis client if available."""
+        """Get Redis client if available.
+        
+        Supports both django-redis and Django's built-in RedisCache.
+        """
         try:
             from django_redis import get_redis_connection
-            return get_redis_connection("default")
+            return get_redis_connection(self.cache_alias)
         except Exception:
-            return None
+            pass
+        
+        try:
+            from django.core.cache.backends.redis import RedisCache
+            if isinstance(self.cache, RedisCache):
+                return self.cache._cache.get_client(write=True)
+        except Exception:
+            pass
+        
+        return None
     
     def make_key(self, *args, **kwargs) -> str:
         """Generate a cache key from arguments.
         
+        Arguments are encoded with apps.cache.keys.encode_part(), so model
+        instances, dates and iterables produce stable keys.
+        
         Args:
             *args: Positional arguments to include in key
             **kwargs: Keyword arguments to include in key
         
         Returns:
-            Hashed cache key
+            Cache key, hashed if longer than 200 characters
         """
-        key_parts = [str(arg) for arg in args]
-        key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
-        key_string = ":".join(key_parts)
-        
-        # Hash long keys to avoid key length limits
-        if len(key_string) > 200:
-            key_hash = hashlib.md5(key_string.encode()).hexdigest()
-            return f"hashed:{key_hash}"
+        return build_key(*args, **kwargs)
+    
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Hit ratio, set sizes and latencies per key namespace.
         
-        return key_string
+        Pending counters of this process are flushed first; with Redis the
+        totals cover every process.
+        """
+        return cache_metrics.snapshot(self.redis_client, caches[self.cache_alias])
+    
+    def reset_metrics(self):
+        """Drop the recorded cache metrics."""
+        cache_metrics.reset(self.redis_client, caches[self.cache_alias])
+    
+    def get(self, key: str, default: Any = None, version: Optional[int] = None) -> Any:
+        """Get a value, from the near cache when enabled."""
+        if self.near_cache:
+            return self.near_cache.get(key, default, version=version)
+        return self.cache.get(key, default, version=version)
+    
+    def set(self, key: str, value: Any, timeout: Optional[int] = None, version: Optional[int] = None):
+        """Set a value, invalidating near caches of other processes."""
+        if self.near_cache:
+            self.near_cache.set(key, value, timeout=timeout, version=version)
+        else:
+            self.cache.set(key, value, timeout=timeout, version=version)
+    
+    def delete(self, key: str, version: Optional[int] = None) -> bool:
+        """Delete a value, invalidating near caches of other processes."""
+        if self.near_cache:
+            return self.near_cache.delete(key, version=version)
+        return self.cache.delete(key, version=version)
     
     def get_or_set(
         self,
@@ -61,19 +205,49 @@ class CacheService:
         callable_or_value: Union[Callable, Any],
         timeout: Optional[int] = None,
         version: Optional[int] = None,
+        single_flight: bool = False,
+        lock_timeout: int = 10,
+        wait_timeout: float = 2.0,
+        stale_ttl: int = 60,
+        beta: float = 1.0,
     ) -> Any:
         """Get from cache or set if not exists.
         
+        With ``single_flight`` enabled only one process recomputes an
+        expired key while the others serve the stale value (or briefly
+        poll for the fresh one on a cold miss). Hot keys are refreshed
+        ahead of their expiry using probabilistic early expiration
+        (XFetch), scaled by ``beta``.
+        
         Args:
             key: Cache key
             callable_or_value: Value or callable to generate value
             timeout: Cache timeout in seconds
             version: Cache key version
+            single_flight: Guard recomputation with a short lock
+            lock_timeout: Lifetime of the recompute lock in seconds
+            wait_timeout: Seconds a waiter polls on a cold miss
+            stale_ttl: Seconds an expired value is kept to serve waiters
+            beta: XFetch aggressiveness, 0 disables early expiration
         
         Returns:
             Cached or computed value
         """
-        value = self.cache.get(key, version=version)
+        if single_flight:
+            return self._get_or_set_single_flight(
+                key,
+                callable_or_value,
+                timeout=timeout,
+                version=version,
+                lock_timeout=lock_timeout,
+                wait_timeout=wait_timeout,
+                stale_ttl=stale_ttl,
+                beta=beta,
+            )
+        
+        value = self.get(key, version=version)
+        if isinstance(value, CacheEntry):
+            value = value.value
         
         if value is None:
             if callable(callable_or_value):
@@ -82,44 +256,393 @@ class CacheService:
                 value = callable_or_value
             
             if value is not None:
-                self.cache.set(key, value, timeout=timeout, version=version)
+                self.set(key, value, timeout=timeout, version=version)
         
         return value
     
-    def invalidate_pattern(self, pattern: str):
+    def get_or_set_many(
+        self,
+        keys: Sequence[str],
+        loader: Callable[[List[str]], Dict[str, Any]],
+        timeout: Optional[Union[int, Callable[[str, Any], Optional[int]]]] = None,
+        version: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Get several keys in one round trip, loading the missing ones.
+        
+        Cached keys are fetched with a single MGET; ``loader`` is called
+        once with every missing key and must return a dictionary of the
+        values it found. Loaded values are written back with pipelined
+        SETs, one pipeline per distinct TTL. As with get_or_set(), None
+        values are not cached.
+        
+        Args:
+            keys: Cache keys
+            loader: Callable receiving the missing keys
+            timeout: Cache timeout in seconds, or a callable returning the
+                timeout of a (key, value) pair
+            version: Cache key version
+        
+        Returns:
+            Dictionary of the found values, in the order of keys
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        
+        found = self.cache.get_many(keys, version=version)
+        results = {}
+        for key, value in found.items():
+            if isinstance(value, CacheEntry):
+                value = value.value
+            if value is not None:
+                results[key] = value
+        
+        missing = [key for key in keys if key not in results]
+        if missing:
+            loaded = loader(missing) or {}
+            values = {key: loaded[key] for key in missing if loaded.get(key) is not None}
+            self.set_many(values, timeout=timeout, version=version)
+            results.update(values)
+        
+        return {key: results[key] for key in keys if key in results}
+    
+    def set_many(
+        self,
+        values: Dict[str, Any],
+        timeout: Optional[Union[int, Callable[[str, Any], Optional[int]]]] = None,
+        version: Optional[int] = None,
+    ):
+        """Set several values with per-key timeouts.
+        
+        Keys sharing a timeout are written in one set_many() call, which
+        both Redis backends send as a single pipeline.
+        
+        Args:
+            values: Dictionary of cache key to value
+            timeout: Cache timeout in seconds, or a callable returning the
+                timeout of a (key, value) pair
+            version: Cache key version
+        """
+        groups = defaultdict(dict)
+        for key, value in values.items():
+            key_timeout = timeout(key, value) if callable(timeout) else timeout
+            groups[key_timeout][key] = value
+        
+        for key_timeout, group in groups.items():
+            self.cache.set_many(group, timeout=key_timeout, version=version)
+        
+        if self.near_cache:
+            for key in values:
+                self.near_cache.invalidate_local(key, version=version)
+    
+    def _get_or_set_single_flight(
+        self,
+        key: str,
+        callable_or_value: Union[Callable, Any],
+        timeout: Optional[int],
+        version: Optional[int],
+        lock_timeout: int,
+        wait_timeout: float,
+        stale_ttl: int,
+        beta: float,
+    ) -> Any:
+        """Lock-guarded get_or_set, see get_or_set()."""
+        entry = self.cache.get(key, version=version)
+        if entry is not None and not isinstance(entry, CacheEntry):
+            # Written by a plain set(), nothing to expire early
+            return entry
+        
+        now = time.time()
+        if entry is not None and not self._should_recompute(entry, now, beta):
+            return entry.value
+        
+        lock_key = f"lock:{key}"
+        token = self._acquire_lock(lock_key, lock_timeout, version=version)
+        
+        if token is None:
+            if entry is not None:
+                # Another process is already refreshing this key
+                self._record_stat("recomputes_avoided")
+                self._record_stat("stale_served")
+                return entry.value
+            
+            fresh = self._wait_for_entry(key, version, wait_timeout)
+            if fresh is not _MISSING:
+                self._record_stat("recomputes_avoided")
+                return fresh.value if isinstance(fresh, CacheEntry) else fresh
+            
+            # The lock holder is too slow, compute without the lock
+            self._record_stat("lock_wait_timeouts")
+        
+        try:
+            if entry is not None and entry.expires_at and entry.expires_at > now:
+                self._record_stat("early_recomputes")
+            self._record_stat("recomputes")
+            
+            started = time.monotonic()
+            if callable(callable_or_value):
+                value = callable_or_value()
+            else:
+                value = callable_or_value
+            delta = time.monotonic() - started
+            
+            if value is not None:
+                if timeout is None:
+                    expires_at, physical_timeout = None, None
+                else:
+                    expires_at = time.time() + timeout
+                    physical_timeout = timeout + stale_ttl
+                # Through set(), so near caches drop their copy of the key
+                self.set(
+                    key,
+                    CacheEntry(value, delta, expires_at),
+                    timeout=physical_timeout,
+                    version=version,
+                )
+            return value
+        finally:
+            if token is not None:
+                self._release_lock(lock_key, token, version=version)
+    
+    @staticmethod
+    def _should_recompute(entry: CacheEntry, now: float, beta: float) -> bool:
+        """Decide whether an entry should be recomputed (XFetch).
+        
+        The probability of an early recompute grows as the expiry
+        approaches and with the time the value took to compute.
+        """
+        if entry.expires_at is None:
+            return False
+        if beta <= 0:
+            return now >= entry.expires_at
+        
+        # 1 - random() is in (0, 1] so log() is always defined
+        jitter = entry.delta * beta * -math.log(1.0 - random.random())
+        return now + jitter >= entry.expires_at
+    
+    def _acquire_lock(
+        self,
+        lock_key: str,
+        lock_timeout: int,
+        version: Optional[int] = None,
+    ) -> Optional[str]:
+        """Try to take a recompute lock.
+        
+        Returns:
+            Lock token if acquired, None if another process holds it
+        """
+        token = uuid.uuid4().hex
+        
+        if self.redis_client:
+            try:
+                acquired = self.redis_client.set(
+                    self.cache.make_key(lock_key, version=version),
+                    token,
+                    nx=True,
+                    ex=lock_timeout,
+                )
+                return token if acquired else None
+            except redis.RedisError as e:
+                logger.warning(f"Single-flight lock unavailable, recomputing: {str(e)}")
+                return token
+        
+        # cache.add() is atomic on every backend that supports expiry
+        if self.cache.add(lock_key, token, timeout=lock_timeout, version=version):
+            return token
+        return None
+    
+    def _release_lock(
+        self,
+        lock_key: str,
+        token: str,
+        version: Optional[int] = None,
+    ):
+        """Release a recompute lock if it is still owned by token."""
+        if self.redis_client:
+            try:
+                self.redis_client.eval(
+                    RELEASE_LOCK_SCRIPT,
+                    1,
+                    self.cache.make_key(lock_key, version=version),
+                    token,
+                )
+            except redis.RedisError as e:
+                logger.warning(f"Failed to release single-flight lock: {str(e)}")
+            return
+        
+        if self.cache.get(lock_key, version=version) == token:
+            self.cache.delete(lock_key, version=version)
+    
+    def _wait_for_entry(
+        self,
+        key: str,
+        version: Optional[int],
+        wait_timeout: float,
+        poll_interval: float = 0.05,
+    ) -> Any:
+        """Poll for a value being computed by another process.
+        
+        Returns:
+            The cached entry, or _MISSING if it did not appear in time
+        """
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            entry = self.cache.get(key, version=version)
+            if entry is not None:
+                return entry
+        return _MISSING
+    
+    @classmethod
+    def _record_stat(cls, name: str, amount: int = 1):
+        """Increment a process-local single-flight counter."""
+        with cls._stats_lock:
+            cls._stats[name] += amount
+    
+    @classmethod
+    def single_flight_stats(cls) -> Dict[str, int]:
+        """Return single-flight counters for this process.
+        
+        Returns:
+            Dictionary with recomputes, recomputes_avoided, stale_served,
+            early_recomputes and lock_wait_timeouts counts
+        """
+        with cls._stats_lock:
+            stats = dict.fromkeys(
+                [
+                    "recomputes",
+                    "recomputes_avoided",
+                    "stale_served",
+                    "early_recomputes",
+                    "lock_wait_timeouts",
+                ],
+                0,
+            )
+            stats.update(cls._stats)
+            return stats
+    
+    @classmethod
+    def reset_single_flight_stats(cls):
+        """Reset single-flight counters for this process."""
+        with cls._stats_lock:
+            cls._stats.clear()
+    
+    def invalidate_pattern(
+        self,
+        pattern: str,
+        version: Optional[Union[int, str]] = None,
+        scan_count: int = 1000,
+        pipeline_size: int = 10,
+        dry_run: bool = False,
+        raw: bool = False,
+    ) -> "InvalidationResult":
         """Invalidate all cache keys matching pattern.
         
+        The pattern is expanded with the backend's KEY_PREFIX and version,
+        so ``qs:app_model:*`` matches the keys the cache actually wrote.
+        Matches are removed with UNLINK (memory is reclaimed in the
+        background) and the deletes are pipelined, so other clients are
+        not stalled on large keyspaces.
+        
         Args:
             pattern: Pattern to match (supports * wildcard)
+            version: Cache key version, ``"*"`` matches every version
+            scan_count: SCAN batch size hint
+            pipeline_size: Number of UNLINK batches sent per round trip
+            dry_run: Only count the matching keys
+            raw: Match pattern against raw Redis keys, without prefixing
+        
+        Returns:
+            InvalidationResult with matched/removed counts and elapsed time
         """
-        if self.redis_client:
-            # Use Redis SCAN for efficient pattern matching
+        started = time.monotonic()
+        
+        if not self.redis_client:
+            # Fallback for non-Redis backends
+            logger.warning(f"Pattern invalidation not supported for non-Redis backend")
+            return InvalidationResult(0, 0, time.monotonic() - started)
+        
+        match = pattern if raw else self.cache.make_key(pattern, version=version)
+        matched = removed = pending = 0
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
             cursor = 0
             while True:
-                cursor, keys = self.redis_client.scan(
-                    cursor, match=pattern, count=100
-                )
-                if keys:
-                    self.redis_client.delete(*keys)
+                cursor, keys = self.redis_client.scan(cursor, match=match, count=scan_count)
+                matched += len(keys)
+                
+                if keys and not dry_run:
+                    pipe.unlink(*keys)
+                    pending += 1
+                    if pending >= pipeline_size:
+                        removed += sum(pipe.execute())
+                        pending = 0
+                
                 if cursor == 0:
                     break
-        else:
-            # Fallback for non-Redis backends
-            logger.warning(f"Pattern invalidation not supported for non-Redis backend")
+            
+            if pending:
+                removed += sum(pipe.execute())
+        except redis.RedisError as e:
+            logger.error(f"Error invalidating pattern {match}: {str(e)}")
+        
+        if removed and self.near_cache:
+            self.near_cache.flush()
+        
+        if not dry_run and not raw:
+            edge_cache.purge(patterns=[pattern])
+        
+        result = InvalidationResult(matched, removed, time.monotonic() - started)
+        logger.info(
+            f"Pattern {match}: matched {result.matched}, removed {result.removed} "
+            f"in {result.elapsed * 1000:.1f}ms"
+        )
+        return result
     
-    def invalidate_tags(self, tags: List[str]):
+    def invalidate_tags(self, tags: List[str]) -> int:
         """Invalidate cache entries by tags.
         
+        On Redis every tag is a set of cache keys; all tagged entries and
+        the tag sets are unlinked atomically in a single script call.
+        
         Args:
             tags: List of tags to invalidate
+        
+        Returns:
+            Number of cache entries removed
         """
-        for tag in tags:
-            tag_key = f"tag:{tag}"
-            keys = self.cache.get(tag_key, [])
-            
-            if keys:
-                self.cache.delete_many(keys)
+        if not tags:
+            return 0
+        
+        removed = self._invalidate_tag_index(tags)
+        if self.near_cache:
+            self.near_cache.flush()
+        edge_cache.purge(tags=tags)
+        return removed
+    
+    def _invalidate_tag_index(self, tags: List[str]) -> int:
+        """Remove tagged entries and their tag sets from the backend."""
+        if self.redis_client:
+            try:
+                invalidate = self.redis_client.register_script(TAG_INVALIDATE_SCRIPT)
+                return invalidate(keys=[self._tag_key(tag) for tag in tags])
+            except redis.RedisError as e:
+                logger.error(f"Error invalidating tags {tags}: {str(e)}")
+                return 0
+        
+        removed = 0
+        with self._tag_lock:
+            for tag in tags:
+                tag_key = f"tag:{tag}"
+                keys = self.cache.get(tag_key)
+                
+                if keys:
+                    self.cache.delete_many(list(keys))
+                    removed += len(keys)
                 self.cache.delete(tag_key)
+        
+        return removed
     
     def set_with_tags(
         self,
@@ -136,62 +659,183 @@ class CacheService:
             tags: List of tags for this entry
             timeout: Cache timeout in seconds
         """
-        self.cache.set(key, value, timeout=timeout)
+        self.set(key, value, timeout=timeout)
+        self.add_tags([key], tags, timeout=timeout)
+    
+    def add_tags(self, keys: List[str], tags: List[str], timeout: Optional[int] = None):
+        """Add already cached keys to tag indexes.
+        
+        Args:
+            keys: Cache keys
+            tags: Tags to file the keys under
+            timeout: Cache timeout of the keys in seconds
+        """
+        if not keys or not tags:
+            return
+        
+        # Keep the index at least as long as the entries it points to
+        index_timeout = max(TAG_INDEX_TIMEOUT, timeout or 0)
         
-        # Store key under each tag
-        for tag in tags:
-            tag_key = f"tag:{tag}"
-            tagged_keys = self.cache.get(tag_key, [])
-            if key not in tagged_keys:
-                tagged_keys.append(key)
-                self.cache.set(tag_key, tagged_keys, timeout=86400)  # 24 hours
+        if self.redis_client:
+            try:
+                add = self.redis_client.register_script(TAG_ADD_SCRIPT)
+                add(
+                    keys=[self._tag_key(tag) for tag in tags],
+                    args=[index_timeout] + [self.cache.make_key(key) for key in keys],
+                )
+            except redis.RedisError as e:
+                logger.error(f"Error tagging {keys} with {tags}: {str(e)}")
+            return
+        
+        # Store keys under each tag
+        with self._tag_lock:
+            for tag in tags:
+                tag_key = f"tag:{tag}"
+                tagged_keys = set(self.cache.get(tag_key) or ())
+                if not tagged_keys.issuperset(keys):
+                    tagged_keys.update(keys)
+                    self.cache.set(tag_key, tagged_keys, timeout=index_timeout)
+    
+    def _tag_key(self, tag: str) -> str:
+        """Full Redis key of a tag set, including KEY_PREFIX and version."""
+        return self.cache.make_key(f"tag:{tag}")
+
+
+# Fields that must never be written to the cache in value-row mode
+DEFAULT_SENSITIVE_FIELDS = frozenset([
+    'password',
+    'token',
+    'secret',
+    'key',
+    'api_key',
+    'private_key',
+    'otp_secret',
+])
+
+
+def check_cacheable_fields(fields: Sequence[str]):
+    """Refuse to cache sensitive fields.
+    
+    Every part of a lookup is checked, so ``user__password`` is refused
+    as well. Extend the list with the CACHE_SENSITIVE_FIELDS setting.
+    
+    Args:
+        fields: Field names or lookups
+    
+    Raises:
+        ValueError: If a sensitive field is requested
+    """
+    sensitive = DEFAULT_SENSITIVE_FIELDS | set(getattr(settings, 'CACHE_SENSITIVE_FIELDS', ()))
+    for field in fields:
+        if sensitive.intersection(field.split('__')):
+            raise ValueError(f"Refusing to cache sensitive field '{field}'")
+
+
+@lru_cache(maxsize=256)
+def make_row_class(fields: Tuple[str, ...]):
+    """Build (once) the named tuple type used for cached value rows.
+    
+    Args:
+        fields: Field names or lookups, in values_list() order
+    
+    Returns:
+        namedtuple class with one attribute per field
+    """
+    return namedtuple('Row', fields, rename=True)
 
 
 class QuerySetCache:
-    """Cache for Django QuerySets with automatic invalidation."""
+    """Cache for Django QuerySets with automatic invalidation.
     
-    def __init__(self, model: Model, cache_service: Optional[CacheService] = None):
+    When the model (or any model in ``depends_on``) is registered with
+    ``apps.cache.registry``, cache keys embed the models' generations and
+    any save, delete or many-to-many change invalidates them in O(1).
+    """
+    
+    def __init__(
+        self,
+        model: Model,
+        cache_service: Optional[CacheService] = None,
+        depends_on: Optional[List[Model]] = None,
+    ):
         """Initialize QuerySet cache.
         
         Args:
             model: Django model class
             cache_service: CacheService instance
+            depends_on: Other models whose changes invalidate the cache,
+                e.g. those pulled in with select_related
         """
         self.model = model
         self.cache_service = cache_service or CacheService()
         self.model_name = model._meta.label_lower.replace('.', '_')
+        self.depends_on = [model, *(depends_on or [])]
     
     def get_or_set(
         self,
         queryset: QuerySet,
         key_suffix: str = "",
         timeout: int = 300,
-    ) -> List[Model]:
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
         """Cache QuerySet results.
         
+        By default full model instances are pickled. Passing ``fields``
+        caches plain ``values_list()`` tuples for just those fields and
+        returns lightweight named rows instead, which is several times
+        smaller and faster to load. Sensitive fields (see
+        CACHE_SENSITIVE_FIELDS) are refused in that mode.
+        
         Args:
             queryset: QuerySet to cache
             key_suffix: Additional key suffix
             timeout: Cache timeout in seconds
+            fields: Field names (lookups allowed) to cache as value rows
         
         Returns:
-            List of model instances
+            List of model instances, or of named rows when fields are given
         """
+        if fields:
+            check_cacheable_fields(fields)
+            queryset = queryset.values_list(*fields)
+        
         # Generate cache key from query SQL
-        query_hash = hashlib.md5(str(queryset.query).encode()).hexdigest()
-        cache_key = f"qs:{self.model_name}:{query_hash}:{key_suffix}"
+        query_hash = queryset_fingerprint(queryset)
+        generation = self._generation()
+        if generation:
+            cache_key = f"qs:{self.model_name}:{generation}:{query_hash}:{key_suffix}"
+        else:
+            cache_key = f"qs:{self.model_name}:{query_hash}:{key_suffix}"
         
         def fetch_data():
             return list(queryset)
         
-        return self.cache_service.get_or_set(
+        result = self.cache_service.get_or_set(
             cache_key,
             fetch_data,
             timeout=timeout
         )
+        
+        if fields and result is not None:
+            row_class = make_row_class(tuple(fields))
+            return [row_class._make(row) for row in result]
+        return result
+    
+    def _generation(self) -> str:
+        """Key segment combining the generations of registered models."""
+        registered = [model for model in self.depends_on if cache_registry.is_registered(model)]
+        if not registered:
+            return ""
+        
+        generations = cache_registry.get_generations(registered)
+        return "g" + ".".join(str(generations[model._meta.label_lower]) for model in registered)
     
     def invalidate_model(self):
         """Invalidate all cache entries for this model."""
+        if cache_registry.is_registered(self.model):
+            cache_registry.bump(self.model)
+            return
+        
         pattern = f"qs:{self.model_name}:*"
         self.cache_service.invalidate_pattern(pattern)
 
@@ -239,16 +883,20 @@ class ViewCache:
                 cache_key = cache_service.make_key(*key_parts)
                 
                 # Try to get from cache
-                response = cache.get(cache_key)
-                if response is not None:
-                    return response
+                cached = cache_service.cache.get(cache_key)
+                if isinstance(cached, CachedResponse):
+                    return build_response(cached)
+                if cached is not None:
+                    return cached
                 
                 # Generate response
                 response = func(request, *args, **kwargs)
                 
                 # Cache successful responses only
                 if hasattr(response, 'status_code') and response.status_code == 200:
-                    cache.set(cache_key, response, timeout=timeout)
+                    cached = serialize_response(response)
+                    if cached is not None:
+                        cache_service.cache.set(cache_key, cached, timeout=timeout)
                 
                 return response
             
@@ -310,10 +958,64 @@ class ViewCache:
             
             return wrapper
         return decorator
+    
+    @staticmethod
+    def cache_policy(func):
+        """Set Cache-Control and Surrogate-Key headers from API_CACHE_POLICIES.
+        
+        APICacheMiddleware does this for every API response; use it on
+        views the middleware does not handle.
+        """
+        @wraps(func)
+        def wrapper(request: HttpRequest, *args, **kwargs):
+            response = func(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                policy, url_kwargs = get_cache_policy(request.path)
+                apply_cache_headers(response, policy, url_kwargs)
+            return response
+        
+        return wrapper
 
 
 class APICacheMiddleware:
-    """Middleware for automatic API response caching."""
+    """Middleware for automatic API response caching.
+    
+    Each entry has a soft TTL and a hard TTL (soft TTL plus a stale
+    window). Between the two the cached response is served immediately
+    and a single background refresh is scheduled, so clients never wait
+    on an entry turning over.
+    
+    Cached responses carry a strong ETag inside the cached entry, so a
+    matching If-None-Match is answered with 304 Not Modified without
+    calling the view, and only while the entry itself is cached: an
+    invalidated entry can never be revalidated.
+    
+    TTLs, stale windows and scopes come from the API_CACHE_POLICIES
+    table (see apps.cache.policies), which also sets the Cache-Control
+    and Surrogate-Key headers for nginx, CDNs and browsers. Keys follow
+    the scope of the endpoint: ``public`` responses are shared by
+    everyone, ``role`` responses per user role and ``user`` responses
+    (the default) per user. Token and JWT identities are
+    resolved from the Authorization header, since DRF authenticates only
+    after the middleware ran. Headers listed in the Vary header of a
+    view's responses are learned per path and become part of the key.
+    """
+    
+    # Seconds a scheduled refresh blocks further refreshes of the same key
+    REFRESH_LOCK_TIMEOUT = 30
+    
+    # Who is asking is expressed by the scope part of the key, never by raw
+    # credentials; SessionMiddleware adds Vary: Cookie to any response
+    # whose session was accessed, including public ones
+    IDENTITY_VARY_HEADERS = frozenset(["authorization", "cookie"])
+    
+    # Seconds a learned Vary header list is kept in-process
+    VARY_LOCAL_TTL = 300
+    
+    _vary_local = LRUCache(1024)
+    
+    _executor = None
+    _executor_lock = threading.Lock()
     
     def __init__(self, get_response):
         self.get_response = get_response
@@ -321,44 +1023,278 @@ class APICacheMiddleware:
     
     def __call__(self, request):
         # Only cache GET requests to API endpoints
-        if request.method == "GET" and request.path.startswith("/api/"):
-            cache_key = self._make_cache_key(request)
-            
-            # Try to get from cache
-            cached_response = cache.get(cache_key)
-            if cached_response is not None:
-                logger.debug(f"Cache hit for {request.path}")
-                return cached_response
+        if not (request.method == "GET" and request.path.startswith("/api/")):
+            return self.get_response(request)
         
+        policy, url_kwargs = get_cache_policy(request.path)
+        if not policy.cacheable:
+            return self.get_response(request)
+        
+        identity = identity_resolver.resolve(request)
+        if identity is None:
+            # Invalid credentials: leave the answer to the authentication
+            return self.get_response(request)
+        
+        vary_headers = self._get_vary_headers(request.path)
+        cache_key = self._make_cache_key(request, identity, vary_headers)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        
+        # Internal refresh requests always bypass the cached copy
+        if not request.META.get(REFRESH_META_KEY):
+            entry = self.cache_service.cache.get(cache_key)
+            if entry is not None:
+                if not isinstance(entry, CacheEntry):
+                    logger.debug(f"Cache hit for {request.path}")
+                    return entry
+                
+                if entry.expires_at is not None and time.time() >= entry.expires_at:
+                    logger.debug(f"Stale cache hit for {request.path}")
+                    self._schedule_refresh(request, cache_key, identity, vary_headers)
+                else:
+                    logger.debug(f"Cache hit for {request.path}")
+                
+                if not isinstance(entry.value, CachedResponse):
+                    return entry.value
+                if etag_matches(entry.value.etag, if_none_match):
+                    logger.debug(f"Cache revalidated for {request.path}")
+                    response = not_modified(entry.value.etag)
+                else:
+                    response = build_response(entry.value)
+                return self._finish(
+                    request, response, policy, url_kwargs, identity, self._age(policy, entry.expires_at)
+                )
+        
+        started = time.monotonic()
         response = self.get_response(request)
+        delta = time.monotonic() - started
+        
+        learned = self._learn_vary_headers(request.path, response, vary_headers)
+        if learned is None:
+            return response
+        if learned != vary_headers:
+            cache_key = self._make_cache_key(request, identity, learned)
         
-        # Cache successful GET API responses
-        if (
-            request.method == "GET"
-            and request.path.startswith("/api/")
-            and hasattr(response, 'status_code')
-            and response.status_code == 200
-        ):
-            timeout = self._get_cache_timeout(request.path)
-            cache.set(cache_key, response, timeout=timeout)
-            logger.debug(f"Cached response for {request.path}")
+        cached = self._store_response(request, cache_key, response, delta)
         
+        if cached is None:
+            apply_cache_headers(response, policy, url_kwargs)
+            return response
+        if etag_matches(cached.etag, if_none_match):
+            response = not_modified(cached.etag)
+        return self._finish(request, response, policy, url_kwargs, identity)
+    
+    @staticmethod
+    def _finish(
+        request,
+        response,
+        policy: CachePolicy,
+        url_kwargs: Dict[str, Any],
+        identity: Identity,
+        age: Optional[int] = None,
+    ):
+        """Add the HTTP caching headers of a cached response.
+        
+        Responses shared by all anonymous users may also be stored by the
+        nginx micro-cache, see apps.cache.edge.
+        """
+        apply_cache_headers(response, policy, url_kwargs, age)
+        if identity.is_anonymous:
+            edge_cache.mark(request, response, policy.ttl, policy.resolve_surrogate_keys(url_kwargs))
         return response
     
-    def _make_cache_key(self, request):
-        """Generate cache key for request."""
+    @staticmethod
+    def _age(policy: CachePolicy, expires_at: Optional[float]) -> Optional[int]:
+        """Seconds since a cached entry expiring at expires_at was rendered."""
+        if expires_at is None:
+            return None
+        return int(time.time() - (expires_at - policy.ttl))
+    
+    def _store_response(
+        self,
+        request,
+        cache_key: str,
+        response,
+        delta: float = 0.0,
+    ) -> Optional[CachedResponse]:
+        """Cache a successful GET API response with its soft expiry.
+        
+        Returns:
+            The stored CachedResponse, or None if it was not cacheable
+        """
+        if getattr(response, 'status_code', None) != 200:
+            return None
+        
+        # Respect views opting out, e.g. with @never_cache
+        if 'no-store' in response.get('Cache-Control', ''):
+            return None
+        
+        cached = serialize_response(response)
+        if cached is None:
+            return None
+        
+        policy, url_kwargs = get_cache_policy(request.path)
+        expires_at = time.time() + policy.ttl
+        self.cache_service.cache.set(
+            cache_key, CacheEntry(cached, delta, expires_at), timeout=policy.ttl + policy.stale
+        )
+        
+        # Purging a surrogate key also drops the server side copies
+        surrogate_keys = policy.resolve_surrogate_keys(url_kwargs)
+        if surrogate_keys:
+            self.cache_service.add_tags([cache_key], surrogate_keys, timeout=policy.ttl + policy.stale)
+        logger.debug(f"Cached response for {request.path}")
+        return cached
+    
+    def _schedule_refresh(
+        self,
+        request,
+        cache_key: str,
+        identity: Identity = ANONYMOUS,
+        vary_headers: Tuple[str, ...] = (),
+    ):
+        """Schedule one background refresh of a stale entry.
+        
+        Shared entries are refreshed on Celery when it is enabled,
+        per-user entries are re-rendered on a local thread pool because
+        the worker cannot act as the requesting user.
+        """
+        # The refresh lock is left to expire so a failing endpoint is
+        # retried at most once per REFRESH_LOCK_TIMEOUT
+        if not cache.add(f"refresh:{cache_key}", 1, timeout=self.REFRESH_LOCK_TIMEOUT):
+            return
+        
+        is_shared = identity.is_anonymous or self._get_cache_policy(request.path).scope == "public"
+        if is_shared and celery_enabled():
+            try:
+                refresh_api_cache_entry.delay(
+                    request.path,
+                    request.META.get('QUERY_STRING', ''),
+                    request.get_host(),
+                    {
+                        self._meta_name(header): request.META.get(self._meta_name(header), '')
+                        for header in vary_headers
+                        if header not in self.IDENTITY_VARY_HEADERS
+                    },
+                )
+                return
+            except Exception as e:
+                logger.error(f"Failed to queue cache refresh, using thread pool: {str(e)}")
+        
+        refresh_request = copy.copy(request)
+        refresh_request.META = request.META.copy()
+        self._get_executor().submit(self._refresh, refresh_request, cache_key)
+    
+    def _refresh(self, request, cache_key: str):
+        """Re-render a stale entry outside the request thread."""
+        try:
+            started = time.monotonic()
+            response = self.get_response(request)
+            self._store_response(request, cache_key, response, time.monotonic() - started)
+        except Exception as e:
+            logger.error(f"Error refreshing cache for {request.path}: {str(e)}")
+        finally:
+            # Connections are per thread, don't leak them from the pool
+            connections.close_all()
+    
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Get the process-wide refresh thread pool."""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'API_CACHE_REFRESH_WORKERS', 4),
+                    thread_name_prefix='api-cache-refresh',
+                )
+            return cls._executor
+    
+    def _make_cache_key(
+        self,
+        request,
+        identity: Optional[Identity] = None,
+        vary_headers: Tuple[str, ...] = (),
+    ):
+        """Generate cache key for request.
+        
+        Args:
+            request: HttpRequest
+            identity: Resolved identity, resolved from the request if omitted
+            vary_headers: Lowercased header names the response varies on
+        """
+        if identity is None:
+            identity = identity_resolver.resolve(request) or ANONYMOUS
+        
+        scope = self._get_cache_policy(request.path).scope
+        
         key_parts = [
             "api_cache",
             request.path,
             request.GET.urlencode(),
         ]
         
-        # Include user ID for authenticated requests
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            key_parts.append(f"user:{request.user.id}")
+        if scope == "public":
+            key_parts.append("public")
+        elif identity.is_anonymous:
+            key_parts.append("anon")
+        elif scope == "role":
+            key_parts.append(f"role:{identity.role}")
+        else:
+            key_parts.append(f"user:{identity.user_id}")
+        
+        values = [
+            request.META.get(self._meta_name(header), '')
+            for header in vary_headers
+            if header not in self.IDENTITY_VARY_HEADERS
+        ]
+        if any(values):
+            key_parts.append(f"vary:{fast_hash(chr(0).join(values))}")
         
         return self.cache_service.make_key(*key_parts)
     
+    @staticmethod
+    def _meta_name(header: str) -> str:
+        """request.META name of an HTTP header."""
+        return "HTTP_" + header.upper().replace("-", "_")
+    
+    def _vary_key(self, path: str) -> str:
+        return f"api_cache:vary:{path}"
+    
+    def _get_vary_headers(self, path: str) -> Tuple[str, ...]:
+        """Header names the responses of a path were seen to vary on."""
+        vary_key = self._vary_key(path)
+        headers = self._vary_local.get(vary_key)
+        if headers is None:
+            headers = self.cache_service.cache.get(vary_key) or ()
+            self._vary_local.set(vary_key, headers, self.VARY_LOCAL_TTL)
+        return headers
+    
+    def _learn_vary_headers(self, path: str, response, known: Tuple[str, ...]) -> Optional[Tuple[str, ...]]:
+        """Remember the Vary header of a response for its path.
+        
+        Returns:
+            Lowercased, sorted header names, or None for ``Vary: *``
+        """
+        vary = [header.strip().lower() for header in cc_delim_re.split(response.get('Vary', ''))]
+        if '*' in vary:
+            return None
+        
+        headers = tuple(sorted({header for header in vary if header}))
+        if headers != known:
+            vary_key = self._vary_key(path)
+            self.cache_service.cache.set(vary_key, headers, timeout=TAG_INDEX_TIMEOUT)
+            self._vary_local.set(vary_key, headers, self.VARY_LOCAL_TTL)
+        return headers
+    
+    def _get_cache_policy(self, path: str) -> CachePolicy:
+        """Get the cache policy of an endpoint from API_CACHE_POLICIES.
+        
+        Args:
+            path: Request path
+        
+        Returns:
+            CachePolicy with the soft TTL, stale window and scope
+        """
+        return get_cache_policy(path)[0]
+    
     def _get_cache_timeout(self, path: str) -> int:
         """Get cache timeout based on endpoint.
         
@@ -368,50 +1304,67 @@ class APICacheMiddleware:
         Returns:
             Timeout in seconds
         """
-        # Define custom timeouts for specific endpoints
-        timeout_map = {
-            "/api/config/": 3600,  # 1 hour for config
-            "/api/products/": 300,  # 5 minutes for products
-            "/api/users/me/": 60,  # 1 minute for user profile
-        }
-        
-        for pattern, timeout in timeout_map.items():
-            if path.startswith(pattern):
-                return timeout
-        
-        return 60  # Default 1 minute
+        return self._get_cache_policy(path).ttl
 
 
 # Convenience decorators
-def cache_result(timeout: int = 300, key_prefix: str = ""):
+def cache_result(
+    timeout: int = 300,
+    key_prefix: str = "",
+    single_flight: bool = False,
+    batch: bool = False,
+):
     """Cache function results decorator.
     
+    With ``batch`` enabled the decorated function takes a list of ids as
+    its first argument and returns a dictionary mapping id to result.
+    Every id is cached under its own key: cached ids are fetched in one
+    round trip and the function is only called with the missing ones.
+    
+        @cache_result(timeout=300, batch=True)
+        def load_profiles(user_ids):
+            return {user.id: build_profile(user) for user in User.objects.filter(id__in=user_ids)}
+    
     Args:
         timeout: Cache timeout in seconds
         key_prefix: Prefix for cache key
+        single_flight: Let only one process recompute an expired result
+        batch: Cache a function of an id list per id
     
     Returns:
         Decorated function
     """
+    if batch and single_flight:
+        raise ValueError("single_flight is not supported with batch=True")
+    
     def decorator(func):
+        key_template = KeyTemplate(key_prefix or func.__name__)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             cache_service = CacheService()
-            
-            # Build cache key from function name and arguments
-            key_parts = [key_prefix or func.__name__]
-            key_parts.extend([str(arg) for arg in args])
-            key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
-            
-            cache_key = cache_service.make_key(*key_parts)
+            cache_key = key_template(args, kwargs)
             
             return cache_service.get_or_set(
                 cache_key,
                 lambda: func(*args, **kwargs),
-                timeout=timeout
+                timeout=timeout,
+                single_flight=single_flight,
             )
         
-        return wrapper
+        @wraps(func)
+        def batch_wrapper(ids, *args, **kwargs):
+            cache_service = CacheService()
+            keys = {key_template(args, kwargs, id_): id_ for id_ in ids}
+            
+            def load(missing_keys):
+                loaded = func([keys[key] for key in missing_keys], *args, **kwargs) or {}
+                return {key: loaded.get(keys[key]) for key in missing_keys}
+            
+            found = cache_service.get_or_set_many(list(keys), load, timeout=timeout)
+            return {keys[key]: value for key, value in found.items()}
+        
+        return batch_wrapper if batch else wrapper
     return decorator
 
 
@@ -434,7 +1387,10 @@ def invalidate_cache(patterns: List[str] = None, tags: List[str] = None):
 
 # Cache warming utilities
 class CacheWarmer:
-    """Utilities for warming cache."""
+    """Utilities for warming cache.
+    
+    Thin wrappers around apps.cache.warming.CacheWarmingEngine.
+    """
     
     @staticmethod
     def warm_queryset_cache(model: Model, querysets: List[QuerySet]):
@@ -451,22 +1407,29 @@ class CacheWarmer:
             logger.info(f"Warmed cache for {model.__name__} queryset")
     
     @staticmethod
-    def warm_api_endpoints(endpoints: List[str]):
+    def warm_api_endpoints(
+        endpoints: List[str],
+        users: Sequence[str] = (),
+        tokens: Sequence[str] = (),
+        concurrency: int = 4,
+    ) -> list:
         """Pre-populate cache for API endpoints.
         
         Args:
             endpoints: List of endpoint URLs to warm
-        """
-        from django.test import Client
+            users: Users (email, username or pk) to also warm as
+            tokens: Authorization header values to also warm with
+            concurrency: Number of concurrent requests
         
-        client = Client()
+        Returns:
+            List of WarmResult
+        """
+        from .warming import CacheWarmingEngine, endpoint_items
         
-        for endpoint in endpoints:
-            try:
-                response = client.get(endpoint)
-                if response.status_code == 200:
-                    logger.info(f"Warmed cache for {endpoint}")
-                else:
-                    logger.warning(f"Failed to warm cache for {endpoint}: {response.status_code}")
-            except Exception as e:
-                logger.error(f"Error warming cache for {endpoint}: {str(e)}")
\ No newline at end of file
+        results = CacheWarmingEngine(concurrency).run(endpoint_items(endpoints, users, tokens))
+        for result in results:
+            if result.ok:
+                logger.info(f"Warmed cache for {result.item.label}")
+            else:
+                logger.warning(f"Failed to warm cache for {result.item.label}: {result.detail}")
+        return results
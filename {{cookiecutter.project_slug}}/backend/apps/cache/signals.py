@@ -0,0 +1,40 @@
+"""Signals for the cache app."""
+from django.contrib.auth import get_user_model
+{% if cookiecutter.api_authentication == 'token' -%}
+from django.db.models.signals import post_delete, post_save
+{%- else -%}
+from django.db.models.signals import post_save
+{%- endif %}
+from django.dispatch import receiver
+{%- if cookiecutter.api_authentication == 'jwt' %}
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+{%- elif cookiecutter.api_authentication == 'token' %}
+from rest_framework.authtoken.models import Token
+{%- endif %}
+
+from .identity import identity_resolver
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def revoke_inactive_user(sender, instance, **kwargs):
+    """Stop serving cached responses to a deactivated user."""
+    if not instance.is_active:
+        identity_resolver.revoke(instance.pk)
+{%- if cookiecutter.api_authentication == 'jwt' %}
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def revoke_blacklisted_token(sender, instance, **kwargs):
+    """Re-check the identities of a user whose refresh token was blacklisted."""
+    if instance.token.user_id is not None:
+        identity_resolver.revoke(instance.token.user_id)
+{%- elif cookiecutter.api_authentication == 'token' %}
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    """Stop serving cached responses to a deleted token."""
+    identity_resolver.revoke(instance.user_id)
+{%- endif %}
@@ -0,0 +1,104 @@
+"""
+Async tasks for the cache app.
+Gracefully handles both Celery and synchronous execution.
+"""
+import logging
+
+from django.conf import settings
+
+{% if cookiecutter.use_celery == 'y' -%}
+try:
+    from celery import shared_task
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+{% else -%}
+CELERY_AVAILABLE = False
+{%- endif %}
+
+logger = logging.getLogger(__name__)
+
+# META key marking an internal refresh request; it cannot be set over HTTP
+# because client headers always arrive prefixed with HTTP_
+REFRESH_META_KEY = "api_cache.refresh"
+
+
+def task_decorator(func):
+    """
+    Decorator that makes a function a Celery task if available,
+    otherwise returns the function as-is for synchronous execution.
+    """
+    {% if cookiecutter.use_celery == 'y' -%}
+    if CELERY_AVAILABLE:
+        return shared_task(ignore_result=True)(func)
+    {%- endif %}
+    return func
+
+
+def celery_enabled() -> bool:
+    """
+    Check whether work should be queued on Celery instead of run in-process.
+    """
+    return (
+        CELERY_AVAILABLE
+        and getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False) is False
+        and getattr(settings, "USE_CELERY", True)
+    )
+
+
+@task_decorator
+def refresh_api_cache_entry(
+    path: str,
+    query_string: str = "",
+    host: str = "",
+    headers: dict = None,
+) -> bool:
+    """
+    Re-render a shared (anonymous) API response and store it in the cache.
+
+    The request goes through the full middleware stack flagged as an
+    internal refresh, so APICacheMiddleware skips the cached copy and
+    overwrites it with the fresh response.
+
+    Args:
+        path: Request path of the cached entry
+        query_string: Raw query string of the cached entry
+        host: Host header of the original request
+        headers: request.META values of the headers the response varies on
+
+    Returns:
+        bool: True if the endpoint returned 200, False otherwise
+    """
+    from django.test import Client
+
+    extra = {REFRESH_META_KEY: True, **(headers or {})}
+    if host:
+        extra["HTTP_HOST"] = host
+    url = f"{path}?{query_string}" if query_string else path
+
+    try:
+        response = Client().get(url, **extra)
+    except Exception as e:
+        logger.error(f"Error refreshing cache for {path}: {str(e)}")
+        return False
+
+    if response.status_code != 200:
+        logger.warning(f"Failed to refresh cache for {path}: {response.status_code}")
+        return False
+    return True
+
+
+@task_decorator
+def purge_edge_cache_urls(urls: list) -> int:
+    """
+    Purge URLs from the nginx micro-cache by re-fetching them.
+
+    Args:
+        urls: Paths with query strings, as marked by EdgeCache
+
+    Returns:
+        int: Number of URLs refreshed
+    """
+    from .edge import edge_cache
+
+    return edge_cache.refresh(urls)
@@ -0,0 +1,1115 @@
+"""
+Tests for cache services.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+import datetime
+import json
+import pickle
+import time
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import engines
+from django.template.response import SimpleTemplateResponse
+from django.test import override_settings
+
+from apps.cache.edge import EdgeCache
+from apps.cache.identity import Identity, identity_resolver
+from apps.cache.keys import KeyTemplate, encode_part, queryset_fingerprint
+from apps.cache.metrics import CacheMetrics, InstrumentedCache
+from apps.cache.near_cache import LRUCache, NearCache
+from apps.cache.policies import CachePolicy, CachePolicyTable
+from apps.cache.registry import cache_registry
+from apps.cache.responses import build_response, serialize_response
+from apps.cache.services import (
+    APICacheMiddleware,
+    TAG_INDEX_TIMEOUT,
+    CacheEntry,
+    CacheService,
+    QuerySetCache,
+    cache_result,
+)
+from apps.cache.traffic import TrafficTracker
+from apps.cache.warming import CacheWarmingEngine, WarmItem, load_warm_plan
+from apps.core.views.health import CacheStatsView
+
+User = get_user_model()
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cache-tests",
+    }
+}
+
+
+@pytest.fixture
+def cache_service():
+    """CacheService backed by a clean local memory cache."""
+    with override_settings(CACHES=LOCMEM_CACHES):
+        cache.clear()
+        CacheService.reset_single_flight_stats()
+        yield CacheService()
+        cache.clear()
+
+
+@pytest.fixture
+def redis_service():
+    """CacheService backed by an in-memory fake Redis server."""
+    fakeredis = pytest.importorskip("fakeredis")
+    redis_caches = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://fakeredis:6379/0",
+            "KEY_PREFIX": "test",
+            "OPTIONS": {"connection_class": fakeredis.FakeRedisConnection},
+        }
+    }
+    with override_settings(CACHES=redis_caches):
+        service = CacheService()
+        service.redis_client.flushdb()
+        yield service
+        service.redis_client.flushdb()
+
+
+class TestSingleFlightGetOrSet:
+    """Test lock-based single-flight recomputation."""
+    
+    def test_miss_computes_and_stores_entry(self, cache_service):
+        """Test a cold miss computes once and stores a CacheEntry."""
+        value = cache_service.get_or_set(
+            "sf:key", lambda: "fresh", timeout=60, single_flight=True
+        )
+        
+        assert value == "fresh"
+        assert isinstance(cache.get("sf:key"), CacheEntry)
+        assert CacheService.single_flight_stats()["recomputes"] == 1
+    
+    def test_hit_does_not_recompute(self, cache_service):
+        """Test a fresh entry is served without calling the callable."""
+        cache_service.get_or_set("sf:key", lambda: "fresh", timeout=60, single_flight=True)
+        
+        value = cache_service.get_or_set(
+            "sf:key", lambda: pytest.fail("recomputed"), timeout=60, single_flight=True
+        )
+        
+        assert value == "fresh"
+    
+    def test_waiter_serves_stale_value_while_locked(self, cache_service):
+        """Test expired entries are served stale while another process holds the lock."""
+        cache.set("sf:key", CacheEntry("stale", 0.1, time.time() - 1), 60)
+        cache.add("lock:sf:key", "other-process", 10)
+        
+        value = cache_service.get_or_set(
+            "sf:key", lambda: pytest.fail("recomputed"), timeout=60, single_flight=True
+        )
+        
+        assert value == "stale"
+        stats = CacheService.single_flight_stats()
+        assert stats["recomputes_avoided"] == 1
+        assert stats["stale_served"] == 1
+    
+    def test_expired_entry_is_recomputed_by_lock_holder(self, cache_service):
+        """Test the lock holder refreshes an expired entry and releases the lock."""
+        cache.set("sf:key", CacheEntry("stale", 0.1, time.time() - 1), 60)
+        
+        value = cache_service.get_or_set(
+            "sf:key", lambda: "fresh", timeout=60, single_flight=True
+        )
+        
+        assert value == "fresh"
+        assert cache.get("lock:sf:key") is None
+    
+    def test_xfetch_recomputes_before_expiry(self, cache_service):
+        """Test slow-to-compute entries close to expiry are refreshed early."""
+        cache.set("sf:key", CacheEntry("old", 1000.0, time.time() + 1), 60)
+        
+        value = cache_service.get_or_set(
+            "sf:key", lambda: "new", timeout=60, single_flight=True, beta=10.0
+        )
+        
+        assert value == "new"
+        assert CacheService.single_flight_stats()["early_recomputes"] == 1
+    
+    def test_plain_get_or_set_unwraps_entries(self, cache_service):
+        """Test the default mode reads values written in single-flight mode."""
+        cache_service.get_or_set("sf:key", lambda: "fresh", timeout=60, single_flight=True)
+        
+        assert cache_service.get_or_set("sf:key", lambda: "other", timeout=60) == "fresh"
+    
+    def test_recompute_invalidates_near_caches(self, cache_service, monkeypatch):
+        """Test a recomputed entry drops the near cache copies of every process."""
+        cache.set("sf:key", CacheEntry("stale", 0.1, time.time() - 1), 60)
+        with override_settings(NEAR_CACHE={"ENABLED": True}):
+            service = CacheService()
+        service.near_cache.local.clear()
+        published = []
+        monkeypatch.setattr(service.near_cache, "_publish", lambda op, local_key: published.append(op))
+        assert service.get("sf:key").value == "stale"
+        
+        value = service.get_or_set("sf:key", lambda: "fresh", timeout=60, single_flight=True)
+        
+        assert value == "fresh"
+        assert service.get("sf:key").value == "fresh"
+        assert published == ["del"]
+        NearCache._instances.clear()
+
+
+
+class TestGetOrSetMany:
+    """Test batched lookups."""
+    
+    def test_loader_called_once_with_missing_keys(self, cache_service):
+        """Test cached keys are not reloaded and missing ones load together."""
+        cache.set("many:1", "cached")
+        calls = []
+        
+        def loader(keys):
+            calls.append(keys)
+            return {key: f"loaded-{key}" for key in keys if key != "many:3"}
+        
+        values = cache_service.get_or_set_many(["many:1", "many:2", "many:3"], loader, timeout=60)
+        
+        assert values == {"many:1": "cached", "many:2": "loaded-many:2"}
+        assert calls == [["many:2", "many:3"]]
+        assert cache.get("many:2") == "loaded-many:2"
+        assert cache.get("many:3") is None
+    
+    def test_per_key_timeouts(self, cache_service):
+        """Test a timeout callable sets the TTL of each key."""
+        cache_service.get_or_set_many(
+            ["many:short", "many:long"],
+            lambda keys: {key: key for key in keys},
+            timeout=lambda key, value: 0 if key == "many:short" else 60,
+        )
+        
+        assert cache.get("many:short") is None
+        assert cache.get("many:long") == "many:long"
+    
+    def test_cache_result_batch(self, cache_service):
+        """Test batch functions are only called with uncached ids."""
+        calls = []
+        
+        @cache_result(timeout=60, batch=True)
+        def load_names(ids):
+            calls.append(list(ids))
+            return {id_: f"name-{id_}" for id_ in ids}
+        
+        assert load_names([1, 2]) == {1: "name-1", 2: "name-2"}
+        assert load_names([2, 3]) == {2: "name-2", 3: "name-3"}
+        assert calls == [[1, 2], [3]]
+
+
+class TestKeyBuilder:
+    """Test stable cache key derivation."""
+    
+    def test_encodes_models_dates_and_iterables(self):
+        """Test values are encoded by content, not by identity."""
+        assert encode_part(User(pk=7, username="jane")) == "users.user.7"
+        assert encode_part(datetime.date(2024, 1, 2)) == "2024-01-02"
+        assert encode_part([1, "a", None]) == "[1,a,None]"
+        assert encode_part({"b", "a"}) == "{a,b}"
+        assert encode_part({"b": 1, "a": 2}) == "{a=2,b=1}"
+    
+    def test_key_template(self):
+        """Test function keys sort kwargs and hash long keys under their prefix."""
+        key_template = KeyTemplate("report")
+        
+        assert key_template((User(pk=1),), {"b": 2, "a": 1}) == "report:users.user.1:a:1:b:2"
+        assert key_template(("x" * 300,)).startswith("report:hashed:")
+    
+    def test_queryset_fingerprint(self):
+        """Test a queryset's fingerprint only depends on its SQL and parameters."""
+        fingerprint = queryset_fingerprint(User.objects.filter(is_active=True))
+        
+        assert queryset_fingerprint(User.objects.filter(is_active=True)) == fingerprint
+        assert queryset_fingerprint(User.objects.filter(is_active=False)) != fingerprint
+
+
+class TestCacheMetrics:
+    """Test per-namespace cache instrumentation."""
+    
+    def test_records_hits_misses_and_set_sizes_per_namespace(self, cache_service):
+        """Test operations are counted under the first key segment."""
+        metrics = CacheMetrics()
+        instrumented = InstrumentedCache(cache, metrics)
+        
+        with override_settings(CACHE_METRICS={"SIZE_SAMPLE_RATE": 1}):
+            instrumented.set("qs:users_user:abc", [1, 2, 3])
+        instrumented.get("qs:users_user:abc")
+        instrumented.get("qs:users_user:missing")
+        instrumented.get_many(["api_cache:/api/config/"])
+        
+        snapshot = metrics.snapshot()
+        
+        assert snapshot["qs"]["hits"] == 1
+        assert snapshot["qs"]["misses"] == 1
+        assert snapshot["qs"]["hit_ratio"] == 0.5
+        assert snapshot["qs"]["set_bytes"] > 0
+        assert snapshot["qs"]["get_latency_ms"]["count"] == 2
+        assert snapshot["api_cache"]["misses"] == 1
+    
+    def test_set_sizes_are_sampled(self, cache_service, monkeypatch):
+        """Test unsampled sets are counted without pickling their value again."""
+        metrics = CacheMetrics()
+        instrumented = InstrumentedCache(cache, metrics)
+        measured = []
+        monkeypatch.setattr("apps.cache.metrics._size", lambda value: measured.append(value) or 0)
+        
+        with override_settings(CACHE_METRICS={"SIZE_SAMPLE_RATE": 0}):
+            instrumented.set_many({"qs:a": [1, 2, 3], "qs:b": {"x": 1}})
+            instrumented.set("qs:c", b"12345678")
+        
+        summary = metrics.snapshot()["qs"]
+        assert measured == []
+        assert (summary["sets"], summary["sized_sets"], summary["avg_set_bytes"]) == (3, 1, 8)
+        assert summary["set_bytes"] == 24
+    
+    def test_pending_counters_flush_in_batches(self, cache_service):
+        """Test counters stay local until the flush interval elapsed."""
+        metrics = CacheMetrics()
+        
+        with override_settings(CACHE_METRICS={"FLUSH_INTERVAL": 3600}):
+            metrics.record_set("report:1", 10, 0.001)
+            metrics.maybe_flush()
+        
+        assert metrics._totals == {}
+        assert metrics.totals()["report"]["sets"] == 1
+    
+    def test_stats_endpoint_is_staff_only(self, rf):
+        """Test the stats endpoint refuses non-staff users."""
+        request = rf.get("/api/health/cache/")
+        request.user = User(email="member@example.com")
+        
+        assert CacheStatsView.as_view()(request).status_code == 403
+        
+        request.user.is_staff = True
+        response = CacheStatsView.as_view()(request)
+        
+        assert response.status_code == 200
+        assert "namespaces" in json.loads(response.content)
+
+
+WARM_CALLS = []
+
+
+def record_warm_call(name):
+    """Function target for warm plan tests."""
+    WARM_CALLS.append(name)
+
+
+class TestCacheWarming:
+    """Test the cache warming engine."""
+    
+    def test_plan_expands_users_and_tokens(self, tmp_path, monkeypatch):
+        """Test plan entries expand to one item per user and token."""
+        monkeypatch.setenv("WARM_TOKEN", "Bearer secret")
+        plan_file = tmp_path / "plan.json"
+        plan_file.write_text(json.dumps({
+            "concurrency": 8,
+            "items": [
+                {"endpoint": "/api/config/", "priority": 10},
+                {"endpoint": "/api/users/me/", "as_users": ["a@example.com"], "tokens": ["$WARM_TOKEN"]},
+                {"queryset": "users.User", "filter": {"is_active": True}, "limit": 50},
+            ],
+        }))
+        
+        plan = load_warm_plan(str(plan_file))
+        
+        assert plan["concurrency"] == 8
+        assert [(item.target, item.as_user, item.token) for item in plan["items"]] == [
+            ("/api/config/", None, None),
+            ("/api/users/me/", "a@example.com", None),
+            ("/api/users/me/", None, "Bearer secret"),
+            ("users.User", None, None),
+        ]
+        assert plan["items"][3].options == {"filter": {"is_active": True}, "limit": 50}
+    
+    def test_priority_tiers_run_in_order(self):
+        """Test higher priority tiers complete before lower ones start."""
+        WARM_CALLS.clear()
+        target = "apps.cache.tests.test_services.record_warm_call"
+        items = [
+            WarmItem("function", target, priority=0, options={"args": ["low"]}),
+            WarmItem("function", target, priority=5, options={"args": ["high"]}),
+            WarmItem("function", "apps.cache.tests.test_services.missing", priority=1),
+        ]
+        progress = []
+        
+        results = CacheWarmingEngine(
+            concurrency=2, progress=lambda result, done, total: progress.append(done)
+        ).run(items)
+        
+        assert WARM_CALLS == ["high", "low"]
+        assert [result.ok for result in results] == [True, False, True]
+        assert progress == [1, 2, 3]
+    
+    def test_deadline_skips_remaining_items(self):
+        """Test items not started before the deadline are skipped."""
+        item = WarmItem("function", "apps.cache.tests.test_services.record_warm_call")
+        
+        results = CacheWarmingEngine(deadline=-1).run([item])
+        
+        assert not results[0].ok
+        assert results[0].detail.startswith("skipped")
+
+
+class TestTrafficTracker:
+    """Test the sampled hot path tracker."""
+    
+    def test_counts_anonymous_successful_gets(self, cache_service, rf):
+        """Test only warmable requests are counted, hottest first."""
+        tracker = TrafficTracker()
+        ok = HttpResponse(status=200)
+        
+        with override_settings(TRAFFIC_TRACKER={"SAMPLE_RATE": 1.0}):
+            for _ in range(3):
+                tracker.record(rf.get("/api/products/", {"page": "2"}), ok)
+            tracker.record(rf.get("/api/config/"), ok)
+            tracker.record(rf.get("/api/config/"), HttpResponse(status=500))
+            tracker.record(rf.post("/api/config/"), ok)
+            tracker.record(rf.get("/api/health/"), ok)
+            
+            authenticated = rf.get("/api/users/me/")
+            authenticated.user = User(pk=1)
+            tracker.record(authenticated, ok)
+            
+            assert tracker.top(10) == [("/api/products/?page=2", 3), ("/api/config/", 1)]
+    
+    def test_unsampled_requests_are_ignored(self, cache_service, rf):
+        """Test a zero sample rate records nothing."""
+        tracker = TrafficTracker()
+        
+        with override_settings(TRAFFIC_TRACKER={"SAMPLE_RATE": 0.0}):
+            tracker.record(rf.get("/api/config/"), HttpResponse())
+            
+            assert tracker.top(10) == []
+
+
+class TestTagIndex:
+    """Test tag-based invalidation on the local memory fallback."""
+    
+    def test_invalidate_tags_removes_tagged_entries(self, cache_service):
+        """Test every entry under a tag is removed and counted."""
+        cache_service.set_with_tags("product:1", "a", ["products"], timeout=60)
+        cache_service.set_with_tags("product:2", "b", ["products", "inventory"], timeout=60)
+        cache_service.set_with_tags("order:1", "c", ["orders"], timeout=60)
+        
+        removed = cache_service.invalidate_tags(["products"])
+        
+        assert removed == 2
+        assert cache.get("product:1") is None
+        assert cache.get("product:2") is None
+        assert cache.get("order:1") == "c"
+        assert cache.get("tag:products") is None
+    
+    def test_tag_index_is_a_set(self, cache_service):
+        """Test re-tagging a key does not duplicate it in the index."""
+        cache_service.set_with_tags("product:1", "a", ["products"], timeout=60)
+        cache_service.set_with_tags("product:1", "b", ["products"], timeout=60)
+        
+        assert cache.get("tag:products") == {"product:1"}
+
+
+class TestRedisTagIndex:
+    """Test the tag index Lua scripts on Redis."""
+    
+    @pytest.fixture
+    def tags(self, redis_service):
+        """Redis client of a service able to run the tag scripts."""
+        pytest.importorskip("lupa")
+        return redis_service.redis_client
+    
+    def test_add_tags_fills_tag_sets(self, redis_service, tags):
+        """Test tagged keys are stored with their full Redis key, once per set."""
+        redis_service.set_with_tags("product:1", "a", ["products"], timeout=60)
+        redis_service.set_with_tags("product:1", "b", ["products", "inventory"], timeout=60)
+        
+        assert tags.smembers("test:1:tag:products") == {b"test:1:product:1"}
+        assert tags.smembers("test:1:tag:inventory") == {b"test:1:product:1"}
+        assert tags.ttl("test:1:tag:products") > TAG_INDEX_TIMEOUT - 5
+    
+    def test_add_tags_never_shortens_the_index(self, redis_service, tags):
+        """Test a long-lived entry keeps its tag set alive past shorter ones."""
+        redis_service.set_with_tags("report:1", "a", ["reports"], timeout=TAG_INDEX_TIMEOUT * 2)
+        redis_service.set_with_tags("report:2", "b", ["reports"], timeout=60)
+        
+        assert tags.ttl("test:1:tag:reports") > TAG_INDEX_TIMEOUT
+    
+    def test_invalidate_tags_removes_entries_and_tag_sets(self, redis_service, tags):
+        """Test every tagged entry and the tag sets are removed in one call."""
+        redis_service.set_with_tags("product:1", "a", ["products"], timeout=60)
+        redis_service.set_with_tags("product:2", "b", ["products", "inventory"], timeout=60)
+        redis_service.set_with_tags("order:1", "c", ["orders"], timeout=60)
+        
+        removed = redis_service.invalidate_tags(["products", "inventory"])
+        
+        assert removed == 2
+        assert cache.get("product:1") is None
+        assert cache.get("product:2") is None
+        assert cache.get("order:1") == "c"
+        assert not tags.exists("test:1:tag:products", "test:1:tag:inventory")
+        assert tags.exists("test:1:tag:orders")
+    
+    def test_invalidate_large_tag(self, redis_service, tags):
+        """Test tag sets larger than one UNLINK chunk are removed completely."""
+        keys = [f"item:{number}" for number in range(2500)]
+        cache.set_many(dict.fromkeys(keys, "x"), timeout=60)
+        redis_service.add_tags(keys, ["items"], timeout=60)
+        
+        assert redis_service.invalidate_tags(["items"]) == 2500
+        assert tags.keys("*") == []
+
+
+class TestPatternInvalidation:
+    """Test SCAN/UNLINK pattern invalidation and the cache_clear command on Redis."""
+    
+    @pytest.fixture
+    def keys(self, redis_service):
+        """Two version 1 keys, one version 2 key and an unrelated key."""
+        cache.set("qs:users:1", "a")
+        cache.set("qs:users:2", "b")
+        cache.set("qs:users:3", "c", version=2)
+        cache.set("other:1", "d")
+        return redis_service.redis_client
+    
+    @pytest.fixture
+    def scans(self, keys, monkeypatch):
+        """COUNT hints of the SCAN calls made."""
+        counts = []
+        scan = type(keys).scan
+        
+        def spy(client, cursor, **kwargs):
+            counts.append(kwargs["count"])
+            return scan(client, cursor, **kwargs)
+        
+        # On the class: cache_clear builds its own client
+        monkeypatch.setattr(type(keys), "scan", spy)
+        return counts
+    
+    def test_pattern_is_prefixed_and_versioned(self, redis_service, keys):
+        """Test patterns match the keys as written, in the current version only."""
+        result = redis_service.invalidate_pattern("qs:users:*")
+        
+        assert (result.matched, result.removed) == (2, 2)
+        assert sorted(keys.keys("*")) == [b"test:1:other:1", b"test:2:qs:users:3"]
+        
+        result = redis_service.invalidate_pattern("qs:users:*", version="*")
+        
+        assert (result.matched, result.removed) == (1, 1)
+        assert keys.keys("*") == [b"test:1:other:1"]
+    
+    def test_raw_pattern_is_not_prefixed(self, redis_service, keys):
+        """Test raw patterns match Redis keys directly."""
+        assert redis_service.invalidate_pattern("qs:users:*", raw=True).matched == 0
+        assert redis_service.invalidate_pattern("test:2:*", raw=True).removed == 1
+    
+    def test_dry_run_deletes_nothing(self, redis_service, keys):
+        """Test a dry run counts matches without removing them."""
+        result = redis_service.invalidate_pattern("qs:users:*", version="*", dry_run=True)
+        
+        assert (result.matched, result.removed) == (3, 0)
+        assert len(keys.keys("*")) == 4
+    
+    def test_unlinks_in_pipelined_batches(self, redis_service, keys, scans, monkeypatch):
+        """Test SCAN uses the count hint and UNLINKs are sent a few batches at a time."""
+        for number in range(10):
+            cache.set(f"qs:batch:{number}", number)
+        batches = []
+        pipeline = keys.pipeline
+        
+        def spy_pipeline(**kwargs):
+            pipe = pipeline(**kwargs)
+            execute = pipe.execute
+            
+            def spy_execute():
+                batches.append([command[0][0] for command in pipe.command_stack])
+                return execute()
+            
+            pipe.execute = spy_execute
+            return pipe
+        
+        monkeypatch.setattr(keys, "pipeline", spy_pipeline)
+        
+        result = redis_service.invalidate_pattern("qs:batch:*", scan_count=2, pipeline_size=2)
+        
+        assert (result.matched, result.removed) == (10, 10)
+        assert set(scans) == {2}
+        assert len(batches) > 1
+        assert all(batch and len(batch) <= 2 and set(batch) == {"UNLINK"} for batch in batches)
+        assert keys.keys("*qs:batch:*") == []
+    
+    def test_cache_clear_dry_run(self, keys):
+        """Test --dry-run reports the matches and deletes nothing."""
+        out = StringIO()
+        call_command("cache_clear", "--pattern", "qs:users:*", "--dry-run", stdout=out)
+        
+        assert "2 keys match pattern: qs:users:*" in out.getvalue()
+        assert len(keys.keys("*")) == 4
+    
+    def test_cache_clear_key_version_and_scan_count(self, keys, scans):
+        """Test --key-version and --scan-count are passed to the invalidation."""
+        out = StringIO()
+        call_command(
+            "cache_clear", "--pattern", "qs:users:*", "--key-version", "2", "--scan-count", "5",
+            stdout=out,
+        )
+        
+        assert "Cleared 1 entries matching pattern: qs:users:*" in out.getvalue()
+        assert b"test:2:qs:users:3" not in keys.keys("*")
+        assert set(scans) == {5}
+
+
+
+@pytest.mark.django_db
+class TestModelInvalidation:
+    """Test generation-based QuerySetCache invalidation."""
+    
+    @pytest.fixture
+    def registered_user(self, cache_service):
+        """Register the User model for the duration of a test."""
+        cache_registry.register(User)
+        yield User
+        cache_registry.unregister(User)
+    
+    def test_save_bumps_generation_on_commit(self, registered_user, django_capture_on_commit_callbacks):
+        """Test the generation only changes once the transaction commits."""
+        generation = cache_registry.get_generation(User)
+        
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            User.objects.create_user(email="gen@example.com", password="testpass123")
+        assert cache_registry.get_generation(User) == generation
+        
+        for callback in callbacks:
+            callback()
+        assert cache_registry.get_generation(User) > generation
+    
+    def test_queryset_cache_is_invalidated_by_writes(self, registered_user, django_capture_on_commit_callbacks):
+        """Test cached querysets are refetched after a registered model changes."""
+        qs_cache = QuerySetCache(User)
+        assert qs_cache.get_or_set(User.objects.all()) == []
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            user = User.objects.create_user(email="gen@example.com", password="testpass123")
+        
+        assert qs_cache.get_or_set(User.objects.all()) == [user]
+    
+    def test_invalidate_model_bumps_generation(self, registered_user):
+        """Test manual invalidation is O(1) for registered models."""
+        generation = cache_registry.get_generation(User)
+        
+        QuerySetCache(User).invalidate_model()
+        
+        assert cache_registry.get_generation(User) == generation + 1
+
+
+
+@pytest.mark.django_db
+class TestQuerySetValueRows:
+    """Test caching querysets as value rows."""
+    
+    def test_value_rows_are_cached_as_tuples(self, cache_service, django_assert_num_queries):
+        """Test only the declared fields are stored and rows are rebuilt on read."""
+        User.objects.create_user(email="rows@example.com", username="rows", password="testpass123")
+        qs_cache = QuerySetCache(User, cache_service=cache_service)
+        rows = qs_cache.get_or_set(User.objects.all(), fields=["id", "email"])
+        
+        with django_assert_num_queries(0):
+            cached_rows = qs_cache.get_or_set(User.objects.all(), fields=["id", "email"])
+        
+        assert rows == cached_rows
+        assert cached_rows[0].email == "rows@example.com"
+        assert not hasattr(cached_rows[0], "password")
+    
+    def test_sensitive_fields_are_refused(self, cache_service):
+        """Test password hashes can never be cached."""
+        qs_cache = QuerySetCache(User, cache_service=cache_service)
+        
+        with pytest.raises(ValueError, match="password"):
+            qs_cache.get_or_set(User.objects.all(), fields=["email", "password"])
+
+
+class ImmediateExecutor:
+    """Executor running submitted work inline."""
+    
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+class TestAPICacheMiddleware:
+    """Test stale-while-revalidate API caching."""
+    
+    @pytest.fixture
+    def middleware(self, cache_service, monkeypatch):
+        """Middleware around a view counting its calls."""
+        calls = []
+        
+        def view(request):
+            calls.append(request)
+            return HttpResponse(f"body-{len(calls)}")
+        
+        monkeypatch.setattr(APICacheMiddleware, "_get_executor", classmethod(lambda cls: ImmediateExecutor()))
+        APICacheMiddleware._vary_local.clear()
+        identity_resolver.local.clear()
+        middleware = APICacheMiddleware(view)
+        middleware.calls = calls
+        return middleware
+    
+    @pytest.fixture
+    def tokens(self, monkeypatch):
+        """Authorization headers resolving to users 1 and 2, counting lookups."""
+        lookups = []
+        identities = {"Token one": Identity(1, "user"), "Token two": Identity(2, "staff")}
+        
+        def authenticate(header):
+            lookups.append(header)
+            return identities.get(header)
+        
+        monkeypatch.setattr(identity_resolver, "_authenticate", authenticate)
+        return lookups
+    
+    def test_fresh_entry_is_served_from_cache(self, middleware, rf):
+        """Test a second request within the soft TTL skips the view."""
+        first = middleware(rf.get("/api/config/"))
+        second = middleware(rf.get("/api/config/"))
+        
+        assert len(middleware.calls) == 1
+        assert second.content == first.content
+    
+    def test_stale_entry_is_served_and_refreshed(self, middleware, rf):
+        """Test a stale entry is returned immediately and refreshed once."""
+        request = rf.get("/api/config/")
+        middleware(request)
+        cache_key = middleware._make_cache_key(request)
+        entry = cache.get(cache_key)
+        cache.set(cache_key, entry._replace(expires_at=time.time() - 1), 60)
+        
+        response = middleware(rf.get("/api/config/"))
+        
+        assert response.content == b"body-1"
+        assert len(middleware.calls) == 2
+        assert cache.get(cache_key).value.body == b"body-2"
+        
+        # The refresh lock prevents a second refresh of the same key
+        cache.set(cache_key, cache.get(cache_key)._replace(expires_at=time.time() - 1), 60)
+        middleware(rf.get("/api/config/"))
+        assert len(middleware.calls) == 2
+    
+    def test_responses_carry_strong_etag(self, middleware, rf):
+        """Test fresh and cached responses have the same ETag."""
+        first = middleware(rf.get("/api/config/"))
+        second = middleware(rf.get("/api/config/"))
+        
+        assert first["ETag"].startswith('"')
+        assert second["ETag"] == first["ETag"]
+    
+    def test_matching_if_none_match_returns_304(self, middleware, rf):
+        """Test revalidation of a cached entry is answered without calling the view."""
+        etag = middleware(rf.get("/api/config/"))["ETag"]
+        
+        response = middleware(rf.get("/api/config/", HTTP_IF_NONE_MATCH=f'W/{etag}'))
+        
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert len(middleware.calls) == 1
+    
+    def test_invalidated_entry_is_not_revalidated(self, middleware, rf):
+        """Test If-None-Match after an invalidation gets the view's fresh response."""
+        request = rf.get("/api/config/")
+        etag = middleware(request)["ETag"]
+        cache.delete(middleware._make_cache_key(request))
+        
+        response = middleware(rf.get("/api/config/", HTTP_IF_NONE_MATCH=etag))
+        
+        assert response.status_code == 200
+        assert response.content == b"body-2"
+        assert len(middleware.calls) == 2
+    
+    def test_stale_etag_does_not_match(self, middleware, rf):
+        """Test a different ETag gets the full cached body."""
+        middleware(rf.get("/api/config/"))
+        
+        response = middleware(rf.get("/api/config/", HTTP_IF_NONE_MATCH='"outdated"'))
+        
+        assert response.status_code == 200
+        assert response.content == b"body-1"
+    
+    def test_token_identities_get_separate_entries(self, middleware, rf, tokens):
+        """Test per-user endpoints are keyed by the token's user, resolved once."""
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token one"))
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token two"))
+        response = middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token one"))
+        
+        assert response.content == b"body-1"
+        assert len(middleware.calls) == 2
+        assert tokens == ["Token one", "Token two"]
+    
+    def test_invalid_credentials_bypass_the_cache(self, middleware, rf, tokens):
+        """Test unknown tokens never read or write cached responses."""
+        middleware(rf.get("/api/users/me/"))
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token bogus"))
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token bogus"))
+        
+        assert len(middleware.calls) == 3
+    
+    def test_revoked_identity_is_authenticated_again(self, middleware, rf, tokens):
+        """Test a revocation is noticed on the next hit, not after the identity TTL."""
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token one"))
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token one"))
+        assert tokens == ["Token one"]
+    
+        identity_resolver.revoke(1)
+        response = middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token one"))
+    
+        assert response.content == b"body-1"
+        assert tokens == ["Token one", "Token one"]
+    
+    def test_revoked_credentials_bypass_the_cache(self, middleware, rf, monkeypatch):
+        """Test a token revoked after its identity was cached gets no cached response."""
+        monkeypatch.setattr(identity_resolver, "_authenticate", lambda header: Identity(1, "user"))
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token one"))
+    
+        monkeypatch.setattr(identity_resolver, "_authenticate", lambda header: None)
+        identity_resolver.revoke(1)
+        middleware(rf.get("/api/users/me/", HTTP_AUTHORIZATION="Token one"))
+    
+        assert len(middleware.calls) == 2
+    
+    @pytest.mark.django_db
+    def test_deactivating_a_user_revokes_cached_identities(self, cache_service):
+        """Test saving an inactive user bumps its revocation generation."""
+        user = User.objects.create_user(email="revoked@example.com", password="testpass123")
+        assert identity_resolver._generation(user.pk) is None
+    
+        user.is_active = False
+        user.save()
+    
+        assert identity_resolver._generation(user.pk) is not None
+    
+    def test_public_scope_is_shared_and_role_scope_per_role(self, middleware, rf, tokens):
+        """Test public responses are shared by everyone, role ones per role."""
+        policies = [
+            {"path": "/api/config/", "scope": "public"},
+            {"path": "/api/reports/", "scope": "role"},
+        ]
+        with override_settings(API_CACHE_POLICIES=policies):
+            middleware(rf.get("/api/config/", HTTP_AUTHORIZATION="Token one"))
+            middleware(rf.get("/api/config/", HTTP_AUTHORIZATION="Token two"))
+            middleware(rf.get("/api/config/"))
+            assert len(middleware.calls) == 1
+            
+            middleware(rf.get("/api/reports/", HTTP_AUTHORIZATION="Token one"))
+            middleware(rf.get("/api/reports/", HTTP_AUTHORIZATION="Token two"))
+            assert len(middleware.calls) == 3
+    
+    def test_vary_headers_are_part_of_the_key(self, cache_service, rf):
+        """Test responses varying on Accept-Language are cached per language."""
+        def view(request):
+            response = HttpResponse(request.META.get("HTTP_ACCEPT_LANGUAGE", ""))
+            response["Vary"] = "Accept-Language, Cookie"
+            return response
+        
+        APICacheMiddleware._vary_local.clear()
+        middleware = APICacheMiddleware(view)
+        
+        middleware(rf.get("/api/config/", HTTP_ACCEPT_LANGUAGE="de"))
+        french = middleware(rf.get("/api/config/", HTTP_ACCEPT_LANGUAGE="fr"))
+        german = middleware(rf.get("/api/config/", HTTP_ACCEPT_LANGUAGE="de"))
+        
+        assert french.content == b"fr"
+        assert german.content == b"de"
+    
+    def test_vary_star_is_not_cached(self, cache_service, rf):
+        """Test Vary: * responses are never stored."""
+        calls = []
+        
+        def view(request):
+            calls.append(request)
+            response = HttpResponse("body")
+            response["Vary"] = "*"
+            return response
+        
+        APICacheMiddleware._vary_local.clear()
+        middleware = APICacheMiddleware(view)
+        middleware(rf.get("/api/config/"))
+        middleware(rf.get("/api/config/"))
+        
+        assert len(calls) == 2
+    
+    def test_cache_policy_has_stale_window(self, middleware):
+        """Test the policy table yields a soft TTL and a stale window."""
+        policy = middleware._get_cache_policy("/api/me/")
+        
+        assert (policy.ttl, policy.stale, policy.scope) == (60, 30, "user")
+        assert middleware._get_cache_timeout("/api/config/") == 3600
+    
+    def test_policy_headers_on_fresh_and_cached_responses(self, middleware, rf):
+        """Test public responses get CDN headers, also when served cached."""
+        fresh = middleware(rf.get("/api/config/"))
+        cached = middleware(rf.get("/api/config/"))
+        
+        for response in (fresh, cached):
+            assert response["Cache-Control"] == (
+                "public, max-age=300, s-maxage=3600, stale-while-revalidate=600"
+            )
+            assert response["Surrogate-Key"] == "config"
+        assert cached["Age"] == "0"
+        assert middleware(rf.get("/api/me/"))["Cache-Control"] == "private, max-age=0"
+    
+    def test_uncacheable_policy_bypasses_the_cache(self, middleware, rf):
+        """Test endpoints with a zero TTL always reach the view."""
+        middleware(rf.get("/api/auth/verify-email/a/b/"))
+        response = middleware(rf.get("/api/auth/verify-email/a/b/"))
+        
+        assert len(middleware.calls) == 2
+        assert not response.has_header("Cache-Control")
+    
+    def test_surrogate_keys_invalidate_server_copies(self, middleware, rf):
+        """Test viewset actions resolve surrogate keys usable as cache tags."""
+        response = middleware(rf.get("/api/users/5/"))
+        assert response["Surrogate-Key"] == "users user:5"
+        
+        middleware.cache_service.invalidate_tags(["user:5"])
+        middleware(rf.get("/api/users/5/"))
+        
+        assert len(middleware.calls) == 2
+
+
+class TestEdgeCache:
+    """Test nginx micro-cache marking and purging."""
+    
+    @pytest.fixture
+    def edge(self, cache_service, monkeypatch):
+        """Enabled edge cache hooks, refreshing URLs into a list."""
+        edge = EdgeCache()
+        edge.refreshed = []
+        monkeypatch.setattr(edge, "refresh", edge.refreshed.extend)
+        monkeypatch.setattr(edge, "_get_executor", lambda: ImmediateExecutor())
+        monkeypatch.setattr("apps.cache.services.edge_cache", edge)
+        APICacheMiddleware._vary_local.clear()
+        identity_resolver.local.clear()
+        with override_settings(EDGE_CACHE={"ENABLED": True, "TTL": 2}):
+            yield edge
+    
+    @pytest.fixture
+    def middleware(self):
+        return APICacheMiddleware(lambda request: HttpResponse("body"))
+    
+    def test_only_anonymous_responses_are_marked(self, edge, middleware, rf, monkeypatch):
+        """Test nginx may store anonymous responses for at most TTL seconds."""
+        monkeypatch.setattr(identity_resolver, "_authenticate", lambda header: Identity(1, "user"))
+        
+        assert middleware(rf.get("/api/config/"))["X-Accel-Expires"] == "2"
+        assert middleware(rf.get("/api/config/"))["X-Accel-Expires"] == "2"
+        assert not middleware(rf.get("/api/config/", HTTP_AUTHORIZATION="Token one")).has_header("X-Accel-Expires")
+    
+    def test_invalidation_purges_matching_urls(self, edge, middleware, rf):
+        """Test tag and pattern invalidations re-fetch the affected URLs."""
+        middleware(rf.get("/api/users/5/"))
+        middleware(rf.get("/api/config/", {"lang": "de"}))
+        
+        assert edge.matching_urls(patterns=["qs:*"]) == []
+        
+        middleware.cache_service.invalidate_tags(["user:5"])
+        assert edge.refreshed == ["/api/users/5/"]
+        assert edge.matching_urls(patterns=["api_cache:/api/config/*"]) == ["/api/config/?lang=de"]
+    
+    def test_disabled_edge_cache_leaves_responses_alone(self, edge, middleware, rf):
+        """Test nothing is marked or purged unless EDGE_CACHE is enabled."""
+        with override_settings(EDGE_CACHE={"ENABLED": False}):
+            response = middleware(rf.get("/api/users/5/"))
+            middleware.cache_service.invalidate_tags(["user:5"])
+        
+        assert not response.has_header("X-Accel-Expires")
+        assert edge.refreshed == []
+    
+    def test_marks_are_written_to_redis_in_batches(self, redis_service, rf):
+        """Test marked URLs are buffered and flushed with one pipelined ZADD."""
+        edge = EdgeCache()
+        recent_key = edge._recent_key()
+        with override_settings(EDGE_CACHE={"ENABLED": True, "FLUSH_INTERVAL": 60}):
+            for path in ["/api/config/", "/api/users/5/", "/api/config/"]:
+                edge.mark(rf.get(path), HttpResponse("body"), ttl=60, surrogate_keys=["user:5"])
+        
+            assert not redis_service.redis_client.exists(recent_key)
+            assert sorted(edge.matching_urls(tags=["user:5"])) == ["/api/config/", "/api/users/5/"]
+        
+        assert redis_service.redis_client.zcard(recent_key) == 2
+
+
+class TestCachePolicyTable:
+    """Test matching request paths to cache policies."""
+    
+    def test_actions_win_over_the_longest_path_prefix(self):
+        """Test viewset actions take precedence over path prefixes."""
+        table = CachePolicyTable([
+            {"path": "/api/", "ttl": 10},
+            {"path": "/api/users/", "ttl": 20},
+            {"action": "user.*", "ttl": 30},
+            {"action": "user.retrieve", "ttl": 40},
+        ])
+        
+        assert table.match("/api/unknown/")[0].ttl == 10
+        assert table.match("/api/users/")[0].ttl == 30
+        assert table.match("/api/users/7/") == (table.by_action["user.retrieve"], {"pk": "7"})
+        assert table.match("/elsewhere/")[0] == CachePolicy()
+    
+    def test_invalid_entries_are_rejected(self):
+        """Test misconfigured entries fail loudly."""
+        with pytest.raises(ImproperlyConfigured):
+            CachePolicyTable([{"ttl": 10}])
+        with pytest.raises(ImproperlyConfigured):
+            CachePolicyTable([{"path": "/api/", "scope": "everyone"}])
+        with pytest.raises(ImproperlyConfigured):
+            CachePolicyTable([{"path": "/api/", "tll": 10}])
+    
+    def test_surrogate_keys_skip_missing_kwargs(self):
+        """Test keys naming absent URL kwargs are left out."""
+        policy = CachePolicy(surrogate_keys=("users", "user:{pk}"))
+        
+        assert policy.resolve_surrogate_keys({"pk": 3}) == ["users", "user:3"]
+        assert policy.resolve_surrogate_keys() == ["users"]
+
+
+class TestCachedResponse:
+    """Test the compact cached response format."""
+    
+    def test_round_trip_keeps_status_whitelisted_headers_and_body(self):
+        """Test only whitelisted headers survive serialization."""
+        response = HttpResponse(b'{"ok": true}', status=200, content_type="application/json")
+        response["Vary"] = "Accept"
+        response["Set-Cookie"] = "session=secret"
+        
+        cached = serialize_response(response)
+        rebuilt = build_response(pickle.loads(pickle.dumps(cached)))
+        
+        assert rebuilt.status_code == 200
+        assert rebuilt.content == b'{"ok": true}'
+        assert rebuilt["Content-Type"] == "application/json"
+        assert rebuilt["Vary"] == "Accept"
+        assert not rebuilt.has_header("Set-Cookie")
+    
+    def test_unrendered_response_is_rendered(self):
+        """Test template responses are rendered before caching."""
+        response = SimpleTemplateResponse(engines["django"].from_string("hello"))
+        
+        cached = serialize_response(response)
+        
+        assert cached.body == b"hello"
+    
+    def test_streaming_response_is_not_cached(self):
+        """Test streaming responses have no cached form."""
+        assert serialize_response(StreamingHttpResponse(iter([b"a"]))) is None
+
+
+class TestNearCache:
+    """Test the per-process near cache."""
+    
+    def test_lru_evicts_least_recently_used(self):
+        """Test the bounded LRU evicts the coldest entry."""
+        lru = LRUCache(max_entries=2)
+        lru.set("a", 1, ttl=60)
+        lru.set("b", 2, ttl=60)
+        lru.get("a")
+        lru.set("c", 3, ttl=60)
+        
+        assert lru.get("b") is None
+        assert lru.get("a") == 1
+        assert lru.stats()["evictions"] == 1
+    
+    def test_lru_entries_expire(self):
+        """Test entries are dropped once their TTL elapsed."""
+        lru = LRUCache()
+        lru.set("a", 1, ttl=0)
+        time.sleep(0.01)
+        
+        assert lru.get("a") is None
+        assert lru.stats()["expirations"] == 1
+    
+    def test_reads_are_served_locally(self, cache_service):
+        """Test a second read does not hit the shared backend."""
+        near_cache = NearCache()
+        cache.set("near:key", "v1")
+        
+        assert near_cache.get("near:key") == "v1"
+        cache.set("near:key", "v2")
+        
+        assert near_cache.get("near:key") == "v1"
+        assert near_cache.stats()["hits"] == 1
+    
+    def test_invalidation_message_drops_local_copy(self, cache_service):
+        """Test messages from other processes drop the key, own ones are ignored."""
+        near_cache = NearCache()
+        cache.set("near:key", "v1")
+        near_cache.get("near:key")
+        cache.set("near:key", "v2")
+        local_key = cache.make_key("near:key")
+        
+        near_cache._handle_message({"data": f"{near_cache.node_id}:del:{local_key}".encode()})
+        assert near_cache.get("near:key") == "v1"
+        
+        near_cache._handle_message({"data": f"other:del:{local_key}".encode()})
+        assert near_cache.get("near:key") == "v2"
+    
+    def test_cache_service_writes_through(self):
+        """Test CacheService reads and writes go through the near cache."""
+        with override_settings(CACHES=LOCMEM_CACHES):
+            cache.clear()
+            service = CacheService(near_cache=True)
+            service.near_cache.local.clear()
+            
+            service.set("near:key", "value", timeout=60)
+            
+            assert cache.get("near:key") == "value"
+            assert service.get("near:key") == "value"
+            assert service.near_cache.local.stats()["hits"] >= 1
+            NearCache._instances.clear()
+{% else -%}
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.cache.services import CacheEntry, CacheService
+
+
+@override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cache-tests",
+    }
+})
+class TestSingleFlightGetOrSet(SimpleTestCase):
+    """Test lock-based single-flight recomputation."""
+    
+    def setUp(self):
+        cache.clear()
+        CacheService.reset_single_flight_stats()
+        self.cache_service = CacheService()
+    
+    def test_miss_computes_and_stores_entry(self):
+        """Test a cold miss computes once and stores a CacheEntry."""
+        value = self.cache_service.get_or_set(
+            "sf:key", lambda: "fresh", timeout=60, single_flight=True
+        )
+        
+        self.assertEqual(value, "fresh")
+        self.assertIsInstance(cache.get("sf:key"), CacheEntry)
+    
+    def test_waiter_serves_stale_value_while_locked(self):
+        """Test expired entries are served stale while another process holds the lock."""
+        cache.set("sf:key", CacheEntry("stale", 0.1, time.time() - 1), 60)
+        cache.add("lock:sf:key", "other-process", 10)
+        
+        value = self.cache_service.get_or_set(
+            "sf:key", lambda: "fresh", timeout=60, single_flight=True
+        )
+        
+        self.assertEqual(value, "stale")
+        self.assertEqual(CacheService.single_flight_stats()["stale_served"], 1)
+{%- endif %}
@@ -0,0 +1,181 @@
+"""Sampled tracking of the hottest API requests, used to re-warm the cache."""
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import List, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the TRAFFIC_TRACKER setting
+TRAFFIC_TRACKER_DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.1,
+    'FLUSH_INTERVAL': 10,
+    'MAX_KEYS': 10000,  # per day, least requested keys are trimmed
+    'RETENTION_DAYS': 7,
+}
+
+# Requests that are never worth warming
+EXCLUDED_PREFIXES = ('/api/health/', '/api/auth/')
+
+MAX_QUERY_LENGTH = 200
+
+TRAFFIC_KEY = 'traffic:top'
+
+
+class TrafficTracker:
+    """Top-K tracker of anonymous API GET requests.
+
+    A sample of successful anonymous GET requests is counted in-process
+    and flushed every few seconds with pipelined ZINCRBY into one Redis
+    sorted set per day. Each set is trimmed to MAX_KEYS entries, keeping
+    the hottest paths (with their query strings) at bounded memory.
+    """
+
+    def __init__(self, cache_alias: str = 'default'):
+        """Initialize the tracker.
+
+        Args:
+            cache_alias: Cache backend whose Redis server holds the sets
+        """
+        self.cache_alias = cache_alias
+        self._pending = Counter()
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._redis_client = None
+        self._redis_resolved = False
+
+    @property
+    def options(self):
+        return {**TRAFFIC_TRACKER_DEFAULTS, **getattr(settings, 'TRAFFIC_TRACKER', {})}
+
+    def record(self, request, response):
+        """Count a request if it is sampled and cacheable."""
+        options = self.options
+        if not options['ENABLED'] or random.random() >= options['SAMPLE_RATE']:
+            return
+        if request.method != 'GET' or getattr(response, 'status_code', None) != 200:
+            return
+        if request.path.startswith(EXCLUDED_PREFIXES):
+            return
+        # Per-user entries cannot be re-warmed from traffic alone
+        if hasattr(request, 'user') and request.user.is_authenticated:
+            return
+
+        query_string = request.META.get('QUERY_STRING', '')
+        if len(query_string) > MAX_QUERY_LENGTH:
+            return
+
+        member = f"{request.path}?{query_string}" if query_string else request.path
+        with self._lock:
+            self._pending[member] += 1
+
+        if time.monotonic() - self._last_flush >= options['FLUSH_INTERVAL']:
+            self.flush()
+
+    def flush(self):
+        """Add pending counts to today's sorted set."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return
+
+        options = self.options
+        day = timezone.now().date()
+        redis_client = self._get_redis_client()
+        if redis_client is None:
+            with self._lock:
+                self._totals.setdefault(day, Counter()).update(pending)
+            return
+
+        key = self._day_key(day)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for member, count in pending.items():
+                pipe.zincrby(key, count, member)
+            pipe.zremrangebyrank(key, 0, -options['MAX_KEYS'] - 1)
+            pipe.expire(key, options['RETENTION_DAYS'] * 86400)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to flush traffic counters: {str(e)}")
+
+    def top(self, limit: int = 50, days: int = 1) -> List[Tuple[str, int]]:
+        """Get the most requested paths.
+
+        Args:
+            limit: Number of paths to return
+            days: Number of days, up to today, to combine
+
+        Returns:
+            List of (path with query string, sampled count), hottest first
+        """
+        self.flush()
+        today = timezone.now().date()
+        dates = [today - timedelta(days=offset) for offset in range(days)]
+
+        redis_client = self._get_redis_client()
+        if redis_client is None:
+            combined = Counter()
+            with self._lock:
+                for day in dates:
+                    combined.update(self._totals.get(day, {}))
+            return combined.most_common(limit)
+
+        keys = [self._day_key(day) for day in dates]
+        if len(keys) == 1:
+            entries = redis_client.zrevrange(keys[0], 0, limit - 1, withscores=True)
+        else:
+            union_key = self._cache.make_key(f"{TRAFFIC_KEY}:union:{today}:{days}")
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zunionstore(union_key, keys)
+            pipe.zrevrange(union_key, 0, limit - 1, withscores=True)
+            pipe.delete(union_key)
+            entries = pipe.execute()[1]
+
+        return [
+            (member.decode() if isinstance(member, bytes) else member, int(score))
+            for member, score in entries
+        ]
+
+    def reset(self):
+        """Drop all counters."""
+        with self._lock:
+            self._pending.clear()
+            self._totals.clear()
+
+        redis_client = self._get_redis_client()
+        if redis_client is not None:
+            today = timezone.now().date()
+            redis_client.delete(*[
+                self._day_key(today - timedelta(days=offset))
+                for offset in range(self.options['RETENTION_DAYS'])
+            ])
+
+    @property
+    def _cache(self):
+        return caches[self.cache_alias]
+
+    def _day_key(self, day) -> str:
+        return self._cache.make_key(f"{TRAFFIC_KEY}:{day.isoformat()}")
+
+    def _get_redis_client(self):
+        if not self._redis_resolved:
+            from .services import CacheService
+
+            self._redis_client = CacheService(self.cache_alias).redis_client
+            self._redis_resolved = True
+        return self._redis_client
+
+
+# Process-wide tracker fed by apps.core.middleware.APIMetricsMiddleware
+traffic_tracker = TrafficTracker()
@@ -0,0 +1,277 @@
+"""Concurrent cache warming driven by a declarative warm plan."""
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.utils.module_loading import import_string
+{% if cookiecutter.api_authentication == 'jwt' -%}
+from rest_framework_simplejwt.tokens import RefreshToken
+{% elif cookiecutter.api_authentication == 'token' -%}
+from rest_framework.authtoken.models import Token
+{%- endif %}
+
+from .tasks import REFRESH_META_KEY
+
+logger = logging.getLogger(__name__)
+
+ITEM_KINDS = ('endpoint', 'queryset', 'function')
+
+
+class WarmItem(NamedTuple):
+    """One unit of warming work.
+
+    Attributes:
+        kind: 'endpoint', 'queryset' or 'function'
+        target: URL path, ``app_label.Model`` or dotted function path
+        priority: Higher priorities are warmed first, see CacheWarmingEngine
+        as_user: Email, username or pk of the user to warm as
+        token: Authorization header value to warm with
+        options: Kind specific options (query, filter, fields, args, ...)
+    """
+    kind: str
+    target: str
+    priority: int = 0
+    as_user: Optional[str] = None
+    token: Optional[str] = None
+    options: Dict[str, Any] = {}
+
+    @property
+    def label(self) -> str:
+        if self.as_user:
+            return f"{self.target} (as {self.as_user})"
+        if self.token:
+            return f"{self.target} (token)"
+        return self.target
+
+
+class WarmResult(NamedTuple):
+    """Outcome of a WarmItem.
+
+    Attributes:
+        item: The warmed item
+        ok: Whether warming succeeded
+        detail: Status code, row count or error message
+        elapsed: Seconds spent on the item
+    """
+    item: WarmItem
+    ok: bool
+    detail: str
+    elapsed: float
+
+
+def _expand(entry: Dict[str, Any], kind: str) -> List[WarmItem]:
+    """Expand a plan entry into one item per user and token."""
+    entry = dict(entry)
+    target = entry.pop(kind)
+    priority = entry.pop('priority', 0)
+    anonymous = entry.pop('anonymous', False)
+    users = entry.pop('as_users', [])
+    tokens = [
+        # "$NAME" reads the token from the environment
+        os.environ.get(token[1:], '') if token.startswith('$') else token
+        for token in entry.pop('tokens', [])
+    ]
+
+    items = [WarmItem(kind, target, priority, as_user=str(user), options=entry) for user in users]
+    items += [WarmItem(kind, target, priority, token=token, options=entry) for token in tokens]
+    if not items or anonymous:
+        items.append(WarmItem(kind, target, priority, options=entry))
+    return items
+
+
+def load_warm_plan(path: str) -> Dict[str, Any]:
+    """Load a JSON warm plan.
+
+    The plan is an object with an ``items`` list; every item names one
+    of ``endpoint``, ``queryset`` or ``function`` and may set
+    ``priority``, ``as_users``, ``tokens`` and kind specific options.
+    An optional ``concurrency`` sets the default worker count.
+
+    Args:
+        path: Path of the plan file
+
+    Returns:
+        Dictionary with the parsed ``items`` (WarmItem list) and
+        ``concurrency`` (or None)
+
+    Raises:
+        ValueError: If an entry names no known kind
+    """
+    with open(path) as plan_file:
+        plan = json.load(plan_file)
+
+    items = []
+    for entry in plan.get('items', []):
+        kind = next((kind for kind in ITEM_KINDS if kind in entry), None)
+        if kind is None:
+            raise ValueError(f"Warm plan entry needs one of {', '.join(ITEM_KINDS)}: {entry}")
+        items.extend(_expand(entry, kind))
+
+    return {'items': items, 'concurrency': plan.get('concurrency')}
+
+
+def endpoint_items(endpoints: Sequence[str], users: Sequence[str] = (), tokens: Sequence[str] = ()) -> List[WarmItem]:
+    """Build endpoint items, warmed anonymously and as each user/token."""
+    items = []
+    for endpoint in endpoints:
+        items.extend(_expand(
+            {'endpoint': endpoint, 'as_users': list(users), 'tokens': list(tokens), 'anonymous': True},
+            'endpoint',
+        ))
+    return items
+
+
+class CacheWarmingEngine:
+    """Warm cache items concurrently on a worker pool.
+
+    Items run in priority tiers: all items of the highest priority are
+    warmed concurrently before the next tier starts, so querysets or
+    functions that endpoints build on can be warmed first. Endpoint
+    requests are flagged as refreshes, so APICacheMiddleware re-renders
+    and stores them even if a cached copy exists.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        deadline: Optional[float] = None,
+        progress: Optional[Callable[[WarmResult, int, int], None]] = None,
+    ):
+        """Initialize the engine.
+
+        Args:
+            concurrency: Number of worker threads
+            deadline: Seconds after which items not yet started are skipped
+            progress: Called with (result, done, total) after every item
+        """
+        self.concurrency = max(1, concurrency)
+        self.deadline = deadline
+        self.progress = progress
+        self._users = {}
+
+    def run(self, items: Sequence[WarmItem]) -> List[WarmResult]:
+        """Warm all items.
+
+        Args:
+            items: Items to warm
+
+        Returns:
+            One WarmResult per item, in completion order
+        """
+        tiers = defaultdict(list)
+        for item in items:
+            tiers[item.priority].append(item)
+
+        started = time.monotonic()
+        results = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='cache-warm') as pool:
+            for priority in sorted(tiers, reverse=True):
+                futures = [
+                    pool.submit(self._warm_item, item, started) for item in tiers[priority]
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+                    if self.progress:
+                        self.progress(result, len(results), len(items))
+        return results
+
+    def _warm_item(self, item: WarmItem, started: float) -> WarmResult:
+        """Warm one item, never raising."""
+        if self.deadline is not None and time.monotonic() - started > self.deadline:
+            return WarmResult(item, False, 'skipped: deadline exceeded', 0.0)
+
+        item_started = time.monotonic()
+        try:
+            ok, detail = getattr(self, f'_warm_{item.kind}')(item)
+        except Exception as e:
+            logger.error(f"Error warming cache for {item.label}: {str(e)}")
+            ok, detail = False, str(e)
+        finally:
+            # Connections are per thread, don't leak them from the pool
+            connections.close_all()
+        return WarmResult(item, ok, detail, time.monotonic() - item_started)
+
+    def _warm_endpoint(self, item: WarmItem):
+        from django.test import Client
+
+        client = Client()
+        extra = {REFRESH_META_KEY: True}
+        if item.token:
+            extra['HTTP_AUTHORIZATION'] = item.token
+        elif item.as_user:
+            self._authenticate(client, self._get_user(item.as_user), extra)
+
+        response = client.get(item.target, item.options.get('query', {}), **extra)
+        return response.status_code == 200, str(response.status_code)
+
+    def _warm_queryset(self, item: WarmItem):
+        from .services import QuerySetCache
+
+        model = apps.get_model(item.target)
+        queryset = model.objects.filter(**item.options.get('filter', {}))
+        if item.options.get('order_by'):
+            queryset = queryset.order_by(*item.options['order_by'])
+        if item.options.get('limit'):
+            queryset = queryset[:item.options['limit']]
+
+        rows = QuerySetCache(model).get_or_set(
+            queryset,
+            key_suffix=item.options.get('key_suffix', ''),
+            timeout=item.options.get('timeout', 300),
+            fields=item.options.get('fields'),
+        )
+        return True, f"{len(rows or [])} rows"
+
+    def _warm_function(self, item: WarmItem):
+        func = import_string(item.target)
+        func(*item.options.get('args', []), **item.options.get('kwargs', {}))
+        return True, 'called'
+
+    def _get_user(self, identifier: str):
+        """Resolve a user by username field, email or pk."""
+        if identifier not in self._users:
+            User = get_user_model()
+            lookups = [{User.USERNAME_FIELD: identifier}, {'email': identifier}]
+            if identifier.isdigit():
+                lookups.append({'pk': int(identifier)})
+
+            for lookup in lookups:
+                user = User.objects.filter(**lookup).first()
+                if user is not None:
+                    break
+            else:
+                raise ValueError(f"Unknown user {identifier}")
+            self._users[identifier] = user
+        return self._users[identifier]
+
+    @staticmethod
+    def _authenticate(client, user, extra: Dict[str, Any]):
+        """Make the client's requests act as user."""
+        {%- if cookiecutter.api_authentication == 'jwt' %}
+        extra['HTTP_AUTHORIZATION'] = f"Bearer {RefreshToken.for_user(user).access_token}"
+        {%- elif cookiecutter.api_authentication == 'token' %}
+        token, _ = Token.objects.get_or_create(user=user)
+        extra['HTTP_AUTHORIZATION'] = f"Token {token.key}"
+        {%- else %}
+        client.force_login(user)
+        {%- endif %}
+
+
+def summarize_results(results: Sequence[WarmResult], slowest: int = 5) -> Dict[str, Any]:
+    """Aggregate warm results for reporting."""
+    failed = [result for result in results if not result.ok]
+    return {
+        'total': len(results),
+        'ok': len(results) - len(failed),
+        'failed': failed,
+        'busy_seconds': sum(result.elapsed for result in results),
+        'slowest': sorted(results, key=lambda result: result.elapsed, reverse=True)[:slowest],
+    }
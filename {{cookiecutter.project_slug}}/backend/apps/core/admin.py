@@ -0,0 +1,259 @@
+"""
+Admin changelists that stay fast on tables with millions of rows.
+
+The stock changelist runs COUNT(*) for its paginator and again for the
+"N total" link, pages with OFFSET (which reads and discards every row
+before the page) and searches with ``icontains`` (a sequential scan).
+``LargeTableAdminMixin`` replaces each of those once a table is large:
+
+- counts of the unfiltered table come from the planner statistics
+  (``pg_class.reltuples`` on PostgreSQL, ``information_schema`` on MySQL)
+  and filtered counts stop at a cap;
+- with the default ordering, pages are read with a keyset cursor on
+  ``cursor_pagination_field`` and the primary key;
+- search is limited to ``startswith`` lookups on indexed fields;
+- the ``date_hierarchy`` bar, which lists the distinct dates of the
+  whole table, is hidden;
+- foreign keys shown in ``list_display`` are fetched with select_related.
+"""
+import base64
+import json
+from typing import Optional
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'cursor'
+
+
+def estimated_count(model) -> Optional[int]:
+    """
+    Estimated number of rows of a model's table, from the planner statistics.
+
+    Returns None on databases without estimates (SQLite) and for tables
+    never analyzed.
+    """
+    using = router.db_for_read(model)
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [connection.ops.quote_name(table)],
+            )
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+
+    # reltuples is -1 until the table is first vacuumed or analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a large table exactly.
+
+    Args:
+        estimate: Row estimate of the whole table, used when the queryset
+            is unfiltered (None without planner statistics)
+        count_cap: Largest count worth computing (None for small tables:
+            counts are exact)
+    """
+
+    def __init__(self, *args, estimate=None, count_cap=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimate = estimate
+        self.count_cap = count_cap
+        self.count_exact = True
+        self.count_capped = False
+
+    @cached_property
+    def count(self):
+        if self.count_cap is None:
+            return super().count
+        if self.estimate is not None and not self.object_list.query.has_filters():
+            self.count_exact = False
+            return self.estimate
+        # SELECT COUNT(*) FROM (... LIMIT cap) stops reading at the cap
+        count = self.object_list[:self.count_cap].count()
+        self.count_capped = count >= self.count_cap
+        return count
+
+
+class CursorChangeList(ChangeList):
+    """
+    ChangeList paging with a keyset cursor instead of OFFSET.
+
+    Pages are ordered by ``cursor_pagination_field`` and the primary key,
+    newest first, and the next page starts after the last row of the
+    current one. Only next and first page links are offered.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filter, search and sort links start again from the first page
+        return super().get_query_string(new_params, [*(remove or []), CURSOR_VAR])
+
+    def get_results(self, request):
+        self.cursor_paging = (
+            self.model_admin.use_cursor_pagination(request)
+            and ORDER_VAR not in self.params
+            and not self.list_editable
+        )
+        if not self.cursor_paging:
+            return super().get_results(request)
+
+        field = self.model_admin.cursor_pagination_field
+        queryset = self.queryset.order_by(f'-{field}', '-pk')
+        cursor = self.params.get(CURSOR_VAR)
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            # The redundant "<= value" lets the (field, pk) index serve
+            # the OR as a range scan
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}),
+                **{f'{field}__lte': value},
+            )
+        rows = list(queryset[:self.list_per_page + 1])
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.paginator = paginator
+        self.result_count = paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = rows[:self.list_per_page]
+        self.can_show_all = False
+        self.multi_page = len(rows) > self.list_per_page or bool(cursor)
+        self.first_page_url = self.get_query_string() if cursor else None
+        self.next_page_url = None
+        if len(rows) > self.list_per_page:
+            self.next_page_url = self.get_query_string(
+                {CURSOR_VAR: self.encode_cursor(self.result_list[-1])}
+            )
+
+    def encode_cursor(self, obj) -> str:
+        field = self.opts.get_field(self.model_admin.cursor_pagination_field)
+        data = json.dumps([field.value_to_string(obj), str(obj.pk)])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor: str):
+        field = self.opts.get_field(self.model_admin.cursor_pagination_field)
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return field.to_python(value), self.opts.pk.to_python(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise IncorrectLookupParameters
+
+
+class LargeTableAdminMixin:
+    """
+    ModelAdmin mixin for changelists of large tables.
+
+    The "N total" count next to search results is always off. The rest
+    only changes once the table holds ``large_table_threshold`` rows
+    (estimated):
+
+    - unfiltered counts are estimated and filtered counts capped at the
+      threshold;
+    - with ``cursor_pagination_field`` set (a non-null, indexed field the
+      default ordering sorts newest first, e.g. ``created_at``) pages are
+      read with a keyset cursor;
+    - with ``prefix_search_fields`` set, search only runs ``startswith``
+      lookups on those (indexed) fields;
+    - ``date_hierarchy`` is not shown (its URL parameters still filter).
+
+    Usage:
+        class EmailLogAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+            cursor_pagination_field = 'created_at'
+            prefix_search_fields = ['to_email']
+    """
+
+    large_table_threshold = 100_000
+    cursor_pagination_field = None
+    prefix_search_fields = None
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/large_table_change_list.html'
+
+    def row_estimate(self, request) -> Optional[int]:
+        """Estimated rows of the table (None without statistics), once per request."""
+        return self._table_size(request)[0]
+
+    def is_large_table(self, request) -> bool:
+        return self._table_size(request)[1]
+
+    def use_cursor_pagination(self, request) -> bool:
+        return self.cursor_pagination_field is not None and self.is_large_table(request)
+
+    def _table_size(self, request):
+        sizes = request.__dict__.setdefault('_admin_table_sizes', {})
+        if self.model not in sizes:
+            estimate = estimated_count(self.model)
+            if estimate is None:
+                # No statistics (SQLite, new table): count up to the threshold
+                rows = self.model._default_manager.all()[:self.large_table_threshold].count()
+            else:
+                rows = estimate
+            sizes[self.model] = (estimate, rows >= self.large_table_threshold)
+        return sizes[self.model]
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        if changelist.date_hierarchy and self.is_large_table(request):
+            # The year links are a SELECT DISTINCT over the whole table
+            changelist.date_hierarchy = None
+        return changelist
+
+    def get_changelist(self, request, **kwargs):
+        if self.cursor_pagination_field is not None:
+            return CursorChangeList
+        return super().get_changelist(request, **kwargs)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset,
+            per_page,
+            orphans,
+            allow_empty_first_page,
+            estimate=self.row_estimate(request),
+            count_cap=self.large_table_threshold if self.is_large_table(request) else None,
+        )
+
+    def get_search_fields(self, request):
+        if self.prefix_search_fields is not None and self.is_large_table(request):
+            return [f'{name}__startswith' for name in self.prefix_search_fields]
+        return super().get_search_fields(request)
+
+    def get_list_select_related(self, request):
+        """Join the foreign keys shown in list_display, nullable ones included."""
+        if self.list_select_related is not False:
+            return self.list_select_related
+        related = []
+        for name in self.get_list_display(request):
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.many_to_one or field.one_to_one:
+                related.append(name)
+        return related or False
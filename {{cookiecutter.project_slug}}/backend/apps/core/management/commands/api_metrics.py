@@ -0,0 +1,90 @@
+"""Management command to report daily API request rollups."""
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.metrics import api_counters
+
+
+class Command(BaseCommand):
+    help = 'Report API requests and latency percentiles per day, status code and endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Number of days, up to today, to report',
+        )
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Report a single day (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Number of busiest endpoints listed per day',
+        )
+        parser.add_argument(
+            '--slow',
+            action='store_true',
+            help='List the sampled slow requests of each day',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the raw rollups as JSON',
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                rollups = [api_counters.rollup(date.fromisoformat(options['date']))]
+            except ValueError:
+                raise CommandError(f"Invalid date {options['date']}, expected YYYY-MM-DD")
+        else:
+            rollups = api_counters.rollups(options['days'])
+
+        if options['slow']:
+            for rollup in rollups:
+                rollup['slow'] = api_counters.slow_requests(date.fromisoformat(rollup['date']))
+
+        if options['json']:
+            self.stdout.write(json.dumps(rollups, indent=2))
+            return
+
+        for rollup in rollups:
+            statuses = ', '.join(f"{status}: {count}" for status, count in rollup['by_status'].items())
+            self.stdout.write(self.style.SUCCESS(
+                f"{rollup['date']}  {rollup['requests']} requests" + (f"  ({statuses})" if statuses else '')
+            ))
+
+            for endpoint, stats in list(rollup['by_endpoint'].items())[:options['top']]:
+                latency = stats.get('latency_ms', {})
+                self.stdout.write(
+                    f"  {stats['requests']:>10}  4xx {stats['client_errors']:>6}  "
+                    f"5xx {stats['server_errors']:>6}  "
+                    f"p50 {self.format_ms(latency.get('p50'))}  p95 {self.format_ms(latency.get('p95'))}  "
+                    f"p99 {self.format_ms(latency.get('p99'))}  {endpoint}"
+                )
+
+            if options['slow']:
+                slow = rollup['slow']
+                self.stdout.write(f"  {slow['seen']} slow requests, {len(slow['requests'])} sampled")
+                for sample in slow['requests']:
+                    self.stdout.write(
+                        f"    {sample['duration_ms']:>8.1f}ms  {sample['status']}  "
+                        f"{sample['queries']} queries ({sample['db_ms']}ms)  {sample['path']}  {sample['at']}"
+                    )
+
+    @staticmethod
+    def format_ms(value):
+        """Bucket bound of a percentile, e.g. '<=35ms'."""
+        if value is None:
+            return f"{'-':>8}"
+        if value == float('inf'):
+            return f"{'>10s':>8}"
+        return f"{'<=' + format(value, 'g') + 'ms':>8}"
@@ -0,0 +1,493 @@
+"""Buffered API request counters, latency histograms and slow samples.
+
+APIMetricsMiddleware only bumps in-process counters. A background thread
+flushes them every FLUSH_INTERVAL_MS with one pipeline of INCRBY and
+HINCRBY into per-day keys, so request threads never wait on Redis and
+concurrent workers never overwrite each other's increments.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the API_METRICS setting
+API_METRICS_DEFAULTS = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL_MS': 1000,
+    'RETENTION_DAYS': 30,
+    'MAX_ENDPOINTS': 500,  # per process; further endpoints are counted as "other"
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SAMPLES': 50,  # slow requests kept per day
+    'SCRAPE_TOKEN': '',
+    # Only meaningful when REMOTE_ADDR is the real client address (no proxy)
+    'ALLOWED_IPS': [],
+}
+
+METRICS_KEY = 'api_metrics'
+
+UNRESOLVED_ROUTE = '<unresolved>'
+
+# Upper bounds of the latency buckets, in milliseconds. They are fixed
+# and roughly logarithmic, so histograms of every process and every day
+# can be added up and a percentile is never off by more than one bucket.
+LATENCY_BUCKETS_MS = (
+    1, 2.5, 5, 7.5, 10, 15, 25, 35, 50, 75, 100, 150, 250, 350, 500, 750,
+    1000, 1500, 2500, 5000, 10000, float('inf'),
+)
+
+_NAMED_GROUP_RE = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+@lru_cache(maxsize=1024)
+def _clean_route(route: str) -> str:
+    """Readable form of a resolved route, also for DRF router regexes."""
+    route = _NAMED_GROUP_RE.sub(r'<\1>', route).replace('^', '').replace('$', '')
+    return '/' + route.lstrip('/')
+
+
+def route_template(request) -> str:
+    """The URL pattern a request resolved to, e.g. ``/api/users/<pk>/``.
+
+    Raw paths would give every object its own counter; route templates
+    keep the number of endpoints bounded.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.route:
+        return UNRESOLVED_ROUTE
+    return _clean_route(match.route)
+
+
+def histograms(latency: Dict[str, int]) -> Dict[str, Tuple[List[int], int]]:
+    """Split latency fields into (bucket counts, total µs) per endpoint."""
+    result = {}
+    for field, amount in latency.items():
+        endpoint, suffix = field.rsplit(' ', 1)
+        buckets, total_us = result.get(endpoint) or ([0] * len(LATENCY_BUCKETS_MS), 0)
+        if suffix == 'us':
+            total_us += amount
+        else:
+            buckets[int(suffix)] += amount
+        result[endpoint] = (buckets, total_us)
+    return result
+
+
+def percentile(buckets: List[int], quantile: float) -> Optional[float]:
+    """Upper bound, in milliseconds, of the bucket holding a quantile."""
+    count = sum(buckets)
+    if not count:
+        return None
+
+    seen = 0
+    for bound, amount in zip(LATENCY_BUCKETS_MS, buckets, strict=True):
+        seen += amount
+        if seen >= count * quantile:
+            return bound
+    return LATENCY_BUCKETS_MS[-1]
+
+
+class APICounters:
+    """Process-local request metrics per endpoint.
+
+    Each day is stored in Redis as:
+
+    * ``requests``: the total (INCRBY)
+    * ``counts``: ``"<status> <METHOD> <route>"`` fields (HINCRBY), from
+      which the per-endpoint and per-status rollups are derived
+    * ``latency``: ``"<METHOD> <route> <bucket>"`` histogram fields and a
+      ``"<METHOD> <route> us"`` duration sum (HINCRBY)
+    * ``slow`` and ``slow_seen``: a reservoir sample of the requests
+      slower than SLOW_REQUEST_MS, and how many there were
+    """
+
+    def __init__(self, cache_alias: str = 'default'):
+        """Initialize the counters.
+
+        Args:
+            cache_alias: Cache backend whose Redis server holds the totals
+        """
+        self.cache_alias = cache_alias
+        self._pending = Counter()
+        self._latency = Counter()
+        self._slow = []
+        self._slow_seen = 0
+        self._totals = defaultdict(Counter)
+        self._latency_totals = defaultdict(Counter)
+        self._slow_totals = {}
+        self._endpoints = set()
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self._redis_client = None
+        self._redis_resolved = False
+
+    @property
+    def options(self):
+        return {**API_METRICS_DEFAULTS, **getattr(settings, 'API_METRICS', {})}
+
+    def record(self, request, response, duration: float = 0.0, queries=None):
+        """Count a finished API request, without any I/O.
+
+        Args:
+            request: HttpRequest, after URL resolution
+            response: Its response
+            duration: Seconds spent producing the response
+            queries: QueryCounter of the request, if its queries were counted
+        """
+        options = self.options
+        if not options['ENABLED']:
+            return
+
+        endpoint = f"{request.method} {route_template(request)}"
+        status = getattr(response, 'status_code', 0)
+        elapsed_ms = duration * 1000
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            if endpoint not in self._endpoints:
+                if len(self._endpoints) >= options['MAX_ENDPOINTS']:
+                    endpoint = 'other'
+                else:
+                    self._endpoints.add(endpoint)
+            self._pending[f"{status} {endpoint}"] += 1
+            self._latency[f"{endpoint} {bucket}"] += 1
+            self._latency[f"{endpoint} us"] += int(duration * 1e6)
+
+            if elapsed_ms >= options['SLOW_REQUEST_MS']:
+                self._sample_slow({
+                    'at': timezone.now().isoformat(),
+                    'endpoint': endpoint,
+                    'path': request.path,
+                    'status': status,
+                    'duration_ms': round(elapsed_ms, 1),
+                    'queries': queries.count if queries is not None else None,
+                    'db_ms': round(queries.time * 1000, 1) if queries is not None else None,
+                }, options['SLOW_SAMPLES'])
+
+        self._ensure_flusher()
+
+    def _sample_slow(self, sample: Dict[str, Any], size: int):
+        """Keep a uniform sample of the pending slow requests (algorithm R)."""
+        self._slow_seen += 1
+        if len(self._slow) < size:
+            self._slow.append(sample)
+            return
+        index = random.randrange(self._slow_seen)
+        if index < size:
+            self._slow[index] = sample
+
+    def flush(self):
+        """Add pending counts to today's totals."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            latency, self._latency = self._latency, Counter()
+            slow, self._slow = self._slow, []
+            slow_seen, self._slow_seen = self._slow_seen, 0
+
+        if not pending:
+            return
+
+        options = self.options
+        day = timezone.now().date()
+        redis_client = self._get_redis_client()
+        if redis_client is None:
+            with self._lock:
+                self._totals[day].update(pending)
+                self._latency_totals[day].update(latency)
+                seen, samples = self._slow_totals.get(day, (0, []))
+                for index, sample in _reservoir_slots(len(samples), seen, slow_seen, slow, options['SLOW_SAMPLES']):
+                    if index < len(samples):
+                        samples[index] = sample
+                    else:
+                        samples.append(sample)
+                self._slow_totals[day] = (seen + slow_seen, samples)
+            return
+
+        ttl = options['RETENTION_DAYS'] * 86400
+        keys = self._day_keys(day)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.incrby(keys['requests'], sum(pending.values()))
+            for field, amount in pending.items():
+                pipe.hincrby(keys['counts'], field, amount)
+            for field, amount in latency.items():
+                pipe.hincrby(keys['latency'], field, amount)
+            pipe.incrby(keys['slow_seen'], slow_seen)
+            for key in keys.values():
+                pipe.expire(key, ttl)
+            slow_total = pipe.execute()[1 + len(pending) + len(latency)]
+
+            if slow:
+                self._flush_slow(redis_client, keys['slow'], slow_total - slow_seen, slow_seen, slow, options)
+        except Exception as e:
+            logger.warning(f"Failed to flush API metrics: {str(e)}")
+
+    def _flush_slow(self, redis_client, key: str, seen: int, slow_seen: int, slow, options):
+        """Merge pending slow samples into the day's reservoir list."""
+        size = options['SLOW_SAMPLES']
+        length = redis_client.llen(key)
+        pipe = redis_client.pipeline(transaction=False)
+        for index, sample in _reservoir_slots(length, seen, slow_seen, slow, size):
+            if index < length:
+                pipe.lset(key, index, json.dumps(sample))
+            else:
+                pipe.rpush(key, json.dumps(sample))
+        pipe.ltrim(key, 0, size - 1)
+        pipe.expire(key, options['RETENTION_DAYS'] * 86400)
+        pipe.execute()
+
+    def _read_day(self, day: date) -> Tuple[int, Counter, Counter]:
+        """Flush, then read the total, status counts and latency fields of a day."""
+        self.flush()
+
+        redis_client = self._get_redis_client()
+        if redis_client is None:
+            with self._lock:
+                counts = Counter(self._totals.get(day, {}))
+                latency = Counter(self._latency_totals.get(day, {}))
+            return sum(counts.values()), counts, latency
+
+        keys = self._day_keys(day)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(keys['requests'])
+        pipe.hgetall(keys['counts'])
+        pipe.hgetall(keys['latency'])
+        total, counts, latency = pipe.execute()
+        return int(total or 0), _decode_hash(counts), _decode_hash(latency)
+
+    def rollup(self, day: Optional[date] = None) -> Dict[str, Any]:
+        """Totals of one day.
+
+        Args:
+            day: The day, today if omitted
+
+        Returns:
+            Dictionary with ``date``, ``requests``, ``by_status`` and
+            ``by_endpoint`` (requests, 4xx/5xx errors, statuses and
+            latency percentiles of every endpoint, busiest first)
+        """
+        day = day or timezone.now().date()
+        requests, counts, latency = self._read_day(day)
+
+        by_status = Counter()
+        by_endpoint = defaultdict(lambda: {'requests': 0, 'client_errors': 0, 'server_errors': 0, 'status': {}})
+        for field, amount in counts.items():
+            status, endpoint = field.split(' ', 1)
+            by_status[status] += amount
+            stats = by_endpoint[endpoint]
+            stats['requests'] += amount
+            stats['status'][status] = stats['status'].get(status, 0) + amount
+            if status.startswith('4'):
+                stats['client_errors'] += amount
+            elif status.startswith('5'):
+                stats['server_errors'] += amount
+
+        for endpoint, (buckets, total_us) in histograms(latency).items():
+            count = sum(buckets)
+            by_endpoint[endpoint]['latency_ms'] = {
+                'count': count,
+                'avg': round(total_us / count / 1000, 1) if count else None,
+                'p50': percentile(buckets, 0.5),
+                'p95': percentile(buckets, 0.95),
+                'p99': percentile(buckets, 0.99),
+            }
+
+        return {
+            'date': day.isoformat(),
+            'requests': requests,
+            'by_status': dict(sorted(by_status.items())),
+            'by_endpoint': dict(sorted(by_endpoint.items(), key=lambda item: -item[1]['requests'])),
+        }
+
+    def rollups(self, days: int = 7) -> List[Dict[str, Any]]:
+        """Daily rollups of the last days, most recent first."""
+        today = timezone.now().date()
+        return [self.rollup(today - timedelta(days=offset)) for offset in range(days)]
+
+    def slow_requests(self, day: Optional[date] = None) -> Dict[str, Any]:
+        """Sampled slow requests of one day.
+
+        Args:
+            day: The day, today if omitted
+
+        Returns:
+            Dictionary with the number of slow requests ``seen`` and the
+            sampled ``requests``, slowest first
+        """
+        self.flush()
+        day = day or timezone.now().date()
+
+        redis_client = self._get_redis_client()
+        if redis_client is None:
+            with self._lock:
+                seen, samples = self._slow_totals.get(day, (0, []))
+                samples = list(samples)
+        else:
+            keys = self._day_keys(day)
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(keys['slow_seen'])
+            pipe.lrange(keys['slow'], 0, -1)
+            seen, payloads = pipe.execute()
+            seen, samples = int(seen or 0), [json.loads(payload) for payload in payloads]
+
+        return {
+            'seen': seen,
+            'requests': sorted(samples, key=lambda sample: -sample['duration_ms']),
+        }
+
+    def prometheus(self) -> str:
+        """Today's metrics in the Prometheus text exposition format.
+
+        Totals restart at midnight, which rate() and increase() treat
+        like a process restart.
+        """
+        _, counts, latency = self._read_day(timezone.now().date())
+
+        lines = [
+            '# HELP api_requests_total API requests by endpoint and status code, since midnight.',
+            '# TYPE api_requests_total counter',
+        ]
+        for field, amount in sorted(counts.items()):
+            status, endpoint = field.split(' ', 1)
+            lines.append(_sample('api_requests_total', f'{_labels(endpoint)},status="{status}"', amount))
+
+        lines += [
+            '# HELP api_request_duration_seconds API request latency by endpoint, since midnight.',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        for endpoint, (buckets, total_us) in sorted(histograms(latency).items()):
+            labels = _labels(endpoint)
+            cumulative = 0
+            for bound, amount in zip(LATENCY_BUCKETS_MS, buckets, strict=True):
+                cumulative += amount
+                le = '+Inf' if bound == float('inf') else f'{bound / 1000:g}'
+                lines.append(_sample('api_request_duration_seconds_bucket', f'{labels},le="{le}"', cumulative))
+            lines.append(_sample('api_request_duration_seconds_sum', labels, f'{total_us / 1e6:g}'))
+            lines.append(_sample('api_request_duration_seconds_count', labels, cumulative))
+
+        lines += [
+            '# HELP api_slow_requests_total API requests slower than SLOW_REQUEST_MS, since midnight.',
+            '# TYPE api_slow_requests_total counter',
+            f"api_slow_requests_total {self.slow_requests()['seen']}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Drop pending and stored counters."""
+        with self._lock:
+            self._pending.clear()
+            self._latency.clear()
+            self._slow.clear()
+            self._slow_seen = 0
+            self._totals.clear()
+            self._latency_totals.clear()
+            self._slow_totals.clear()
+            self._endpoints.clear()
+
+        redis_client = self._get_redis_client()
+        if redis_client is not None:
+            today = timezone.now().date()
+            keys = []
+            for offset in range(self.options['RETENTION_DAYS']):
+                keys.extend(self._day_keys(today - timedelta(days=offset)).values())
+            redis_client.delete(*keys)
+
+    def _day_keys(self, day: date) -> Dict[str, str]:
+        backend = caches[self.cache_alias]
+        return {
+            name: backend.make_key(f"{METRICS_KEY}:{day.isoformat()}:{name}")
+            for name in ('requests', 'counts', 'latency', 'slow', 'slow_seen')
+        }
+
+    def _ensure_flusher(self):
+        """Start the flush thread, once per process (also after a fork)."""
+        if self._flusher_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        threading.Thread(target=self._run_flusher, name='api-metrics-flush', daemon=True).start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.options['FLUSH_INTERVAL_MS'] / 1000)
+            self._safe_flush()
+
+    def _safe_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"API metrics flush failed: {str(e)}")
+
+    def _get_redis_client(self):
+        if not self._redis_resolved:
+            from apps.cache.services import CacheService
+
+            self._redis_client = CacheService(self.cache_alias).redis_client
+            self._redis_resolved = True
+        return self._redis_client
+
+
+def _reservoir_slots(length: int, seen: int, new: int, samples: List[Dict], size: int) -> List[Tuple[int, Dict]]:
+    """Merge a reservoir of ``new`` slow requests into one of ``seen``.
+
+    Both reservoirs are uniform samples, so the merged one takes as many
+    new samples as a uniform draw of ``size`` out of all requests would.
+    They replace random stored samples, or are appended while the stored
+    list (``length`` long) has room.
+
+    Returns:
+        (index, sample) pairs, appended indices last and in order
+    """
+    keep = min(size, seen + new)
+    taken = min(len(samples), sum(1 for position in random.sample(range(seen + new), keep) if position >= seen))
+    chosen = random.sample(samples, taken)
+    evicted = random.sample(range(length), max(0, min(length, length + taken - keep)))
+    replacing, appended = chosen[:len(evicted)], chosen[len(evicted):]
+    return list(zip(evicted, replacing, strict=True)) + [(length + offset, sample) for offset, sample in enumerate(appended)]
+
+
+def _decode_hash(values) -> Counter:
+    return Counter({
+        (field.decode() if isinstance(field, bytes) else field): int(amount)
+        for field, amount in values.items()
+    })
+
+
+def _labels(endpoint: str) -> str:
+    """Prometheus labels of an endpoint, ``other`` included."""
+    method, _, route = endpoint.partition(' ')
+    if not route:
+        method, route = '', method
+
+    def escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return f'method="{escape(method)}",route="{escape(route)}"'
+
+
+def _sample(name: str, labels: str, value) -> str:
+    """One sample line of the Prometheus text format."""
+    return name + '{' + labels + '} ' + str(value)
+
+
+# Process-wide counters fed by apps.core.middleware.APIMetricsMiddleware
+api_counters = APICounters()
+
+# Don't lose the last interval when a worker shuts down
+atexit.register(api_counters._safe_flush)
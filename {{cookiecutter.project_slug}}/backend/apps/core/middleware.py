@@ -3,8 +3,11 @@ Custom middleware for the application.
 """
 import time
 import logging
-from django.utils import timezone
-from django.core.cache import cache
+
+from apps.cache.traffic import traffic_tracker
+
+from .metrics import api_counters, route_template, UNRESOLVED_ROUTE
+from .queries import check_query_budget, query_budget_options, request_queries
 
 logger = logging.getLogger(__name__)
 
@@ -12,37 +15,75 @@ logger = logging.getLogger(__name__)
 class APIMetricsMiddleware:
     """
     Middleware to track API metrics like request count and response times.
+    
+    Requests are counted per endpoint and status, with a latency histogram
+    and samples of slow requests, in process-local buffers (see
+    apps.core.metrics), so the request thread does no cache or log I/O.
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
     
     def __call__(self, request):
-        # Track API calls
-        if request.path.startswith('/api/'):
-            # Increment daily API counter
-            today = timezone.now().date()
-            cache_key = f"api_calls_{today}"
-            
-            try:
-                current_count = cache.get(cache_key, 0)
-                cache.set(cache_key, current_count + 1, 86400)  # Expire after 24 hours
-            except Exception:
-                pass  # Fail silently if cache is not available
-            
-            # Track response time
-            start_time = time.time()
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
         
-        response = self.get_response(request)
+        # Time the request and count the SQL queries it runs
+        start_time = time.perf_counter()
+        with request_queries(request).track() as queries:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start_time
+        
+        logger.debug(
+            "API Request: %s %s Status: %s Duration: %.3fs",
+            request.method, request.path, response.status_code, duration,
+        )
+        
+        # Per endpoint counters, latency histograms and slow request samples,
+        # flushed in the background
+        api_counters.record(request, response, duration, queries)
+        
+        # Feed the hot path tracker used by cache_warm --from-traffic
+        try:
+            traffic_tracker.record(request, response)
+        except Exception:
+            pass  # Fail silently if cache is not available
+        
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Middleware to keep the SQL queries of each route within budget.
+    
+    Queries are counted on every connection, with their SQL shapes, and
+    compared with QUERY_BUDGET: too many queries, or one shape repeated
+    more than DUPLICATES times (an N+1), is logged or raised. With
+    SERVER_TIMING on, the DB time and query count are added as a
+    Server-Timing header for the browser's network panel.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        options = query_budget_options()
+        if not options['ENABLED']:
+            return self.get_response(request)
+        
+        start_time = time.perf_counter()
+        with request_queries(request).track() as queries:
+            response = self.get_response(request)
+        
+        if options['SERVER_TIMING']:
+            timing = queries.server_timing(time.perf_counter() - start_time)
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f"{existing}, {timing}" if existing else timing
         
-        # Log response time for API calls
-        if request.path.startswith('/api/'):
-            duration = time.time() - start_time
-            logger.info(
-                f"API Request: {request.method} {request.path} "
-                f"Status: {response.status_code} "
-                f"Duration: {duration:.3f}s"
-            )
+        # Static files, 404s and the like have no route to budget
+        route = route_template(request)
+        if route != UNRESOLVED_ROUTE:
+            check_query_budget(route, queries, request.method)
         
         return response
 
@@ -0,0 +1,199 @@
+"""Per-request SQL query accounting and query budgets.
+
+QueryCounter counts the queries, their time and their SQL shapes on every
+connection. QueryBudgetMiddleware and the GraphQL QueryBudgetExtension
+compare them with the QUERY_BUDGET of the route or operation, so an
+endpoint whose query count grows with its data (N+1) is reported.
+"""
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the QUERY_BUDGET setting
+QUERY_BUDGET_DEFAULTS = {
+    'ENABLED': True,
+    'QUERIES': 50,  # default budget of a route
+    'DUPLICATES': 5,  # times one SQL shape may run per request
+    'ROUTES': {},
+    'SERVER_TIMING': False,
+    'SAMPLE_RATE': 1.0,  # share of violations that are logged
+    'RAISE': False,
+}
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r'(?:%s|\?)(?:\s*,\s*(?:%s|\?))+')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised for budget violations when QUERY_BUDGET['RAISE'] is on."""
+
+
+@lru_cache(maxsize=2048)
+def sql_shape(sql: str) -> str:
+    """SQL with literals and placeholder lists collapsed.
+
+    Queries that differ only in their parameters, e.g. the per-row query
+    of an N+1, share a shape.
+    """
+    sql = _LITERAL_RE.sub('?', sql)
+    return _PLACEHOLDER_LIST_RE.sub('?, ...', sql)
+
+
+class QueryCounter:
+    """Count the queries, and their time, run on any database connection.
+
+    Install it around a unit of work with ``track()``; it is an
+    execute_wrapper, so DEBUG does not need to be on.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+        self._depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - started
+            self.statements[sql] += 1
+
+    @contextmanager
+    def track(self):
+        """Count queries of every connection of the current thread.
+
+        Nested ``track()`` calls of the same counter count queries once.
+        """
+        if self._depth:
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+            return
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            self._depth = 1
+            try:
+                yield self
+            finally:
+                self._depth = 0
+
+    def duplicates(self, threshold: int = 2) -> List[Tuple[str, int]]:
+        """SQL shapes run at least ``threshold`` times, most repeated first."""
+        shapes = Counter()
+        for sql, amount in self.statements.items():
+            shapes[sql_shape(sql)] += amount
+        return [(shape, amount) for shape, amount in shapes.most_common() if amount >= threshold]
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """``Server-Timing`` header value with the DB time and query count."""
+        value = f'db;dur={self.time * 1000:.1f};desc="{self.count} queries"'
+        if total is not None:
+            value += f', app;dur={max(total - self.time, 0) * 1000:.1f}'
+        return value
+
+
+def request_queries(request) -> QueryCounter:
+    """The QueryCounter shared by the middlewares handling a request."""
+    counter = getattr(request, '_query_counter', None)
+    if counter is None:
+        counter = request._query_counter = QueryCounter()
+    return counter
+
+
+class QueryBudget(NamedTuple):
+    """Query limits of a route or GraphQL operation."""
+
+    queries: int = 50
+    duplicates: int = 5
+
+
+class QueryBudgetViolation(NamedTuple):
+    """Budget overrun of one request."""
+
+    key: str
+    budget: QueryBudget
+    queries: int
+    db_ms: float
+    duplicates: List[Tuple[str, int]]
+
+    def describe(self) -> str:
+        message = (
+            f"Query budget exceeded for {self.key}: {self.queries} queries "
+            f"(budget {self.budget.queries}), {self.db_ms:.1f}ms in the database"
+        )
+        for shape, amount in self.duplicates[:3]:
+            message += f"\n  {amount}x {shape[:200]}"
+        return message
+
+
+def query_budget_options() -> Dict[str, Any]:
+    return {**QUERY_BUDGET_DEFAULTS, **getattr(settings, 'QUERY_BUDGET', {})}
+
+
+def _build_budget(value, default: QueryBudget) -> QueryBudget:
+    if isinstance(value, int):
+        return default._replace(queries=value)
+    if isinstance(value, dict):
+        try:
+            return default._replace(**{field.lower(): limit for field, limit in value.items()})
+        except ValueError as e:
+            raise ImproperlyConfigured(f"Invalid QUERY_BUDGET route entry {value!r}: {e}")
+    raise ImproperlyConfigured(f"QUERY_BUDGET routes take a query count or a dict, not {value!r}")
+
+
+def get_query_budget(key: str, method: Optional[str] = None) -> QueryBudget:
+    """Budget of a route template or ``graphql:<operation>``.
+
+    ROUTES entries are keyed by ``"<METHOD> <route>"`` or ``<route>``, and
+    take a query count or ``{'queries': ..., 'duplicates': ...}``.
+    """
+    options = query_budget_options()
+    default = QueryBudget(options['QUERIES'], options['DUPLICATES'])
+    routes = options['ROUTES']
+
+    for candidate in ([f"{method} {key}"] if method else []) + [key]:
+        if candidate in routes:
+            return _build_budget(routes[candidate], default)
+    return default
+
+
+def check_query_budget(key: str, counter: QueryCounter, method: Optional[str] = None) -> Optional[QueryBudgetViolation]:
+    """Compare a request's queries with its budget and report overruns.
+
+    Violations are logged as warnings (a SAMPLE_RATE share of them), or
+    raised as QueryBudgetExceeded when RAISE is on.
+
+    Returns:
+        The violation, or None within budget
+    """
+    budget = get_query_budget(key, method)
+    duplicates = counter.duplicates(budget.duplicates + 1)
+    if counter.count <= budget.queries and not duplicates:
+        return None
+
+    label = f"{method} {key}" if method else key
+    violation = QueryBudgetViolation(label, budget, counter.count, counter.time * 1000, duplicates)
+    options = query_budget_options()
+    if options['RAISE']:
+        raise QueryBudgetExceeded(violation.describe())
+    if random.random() < options['SAMPLE_RATE']:
+        logger.warning(violation.describe())
+    return violation
@@ -0,0 +1,190 @@
+"""
+Tests for the large table admin mixin.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+import pytest
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.utils import timezone
+
+from apps.core.admin import EstimatedCountPaginator, LargeTableAdminMixin
+
+
+@pytest.fixture
+def user_admin(django_user_model):
+    class UserAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+        list_display = ["username", "email"]
+        search_fields = ["username", "email", "first_name"]
+        ordering = ["-created_at"]
+        list_per_page = 3
+        large_table_threshold = 5
+        cursor_pagination_field = "created_at"
+        prefix_search_fields = ["email"]
+
+    return UserAdmin(django_user_model, admin.AdminSite())
+
+
+@pytest.fixture
+def users(django_user_model):
+    users = [
+        django_user_model.objects.create_user(
+            email=f"user{i}@example.com", username=f"user{i}", password="testpass123"
+        )
+        for i in range(8)
+    ]
+    # Rows sharing a timestamp must still be paged exactly once
+    now = timezone.now()
+    for i, user in enumerate(users):
+        django_user_model.objects.filter(pk=user.pk).update(created_at=now - timedelta(minutes=i // 2))
+    return users
+
+
+def changelist(user_admin, rf, admin_user, **params):
+    request = rf.get("/admin/users/user/", params)
+    request.user = admin_user
+    return user_admin.get_changelist_instance(request)
+
+
+@pytest.mark.django_db
+class TestLargeTableAdmin:
+    """Test changelists of large tables."""
+
+    def test_cursor_pages_walk_every_row_once(self, user_admin, users, rf, admin_user, django_user_model):
+        """Test following next page links lists every row once, newest first."""
+        seen = []
+        params = {}
+        while True:
+            cl = changelist(user_admin, rf, admin_user, **params)
+            assert cl.cursor_paging
+            seen.extend(user.pk for user in cl.result_list)
+            if not cl.next_page_url:
+                break
+            params = {key: values[0] for key, values in parse_qs(cl.next_page_url[1:]).items()}
+
+        expected = list(django_user_model.objects.order_by("-created_at", "-pk").values_list("pk", flat=True))
+        assert seen == expected
+
+    def test_cursor_page_counts_up_to_the_threshold(self, user_admin, users, rf, admin_user, django_assert_num_queries):
+        """Test a cursor page reads one page and never counts past the threshold."""
+        first = changelist(user_admin, rf, admin_user)
+        cursor = parse_qs(first.next_page_url[1:])["cursor"][0]
+
+        # Without planner statistics (SQLite): capped counts for the size
+        # check and the paginator, then the page
+        with django_assert_num_queries(3) as captured:
+            cl = changelist(user_admin, rf, admin_user, cursor=cursor)
+
+        assert all("COUNT" not in query["sql"] or "LIMIT 5" in query["sql"] for query in captured.captured_queries)
+        assert len(cl.result_list) == 3
+        assert (cl.result_count, cl.paginator.count_capped) == (5, True)
+        assert cl.first_page_url == "?"
+
+    def test_sorting_falls_back_to_offset_paging(self, user_admin, users, rf, admin_user):
+        """Test a column sort pages with page numbers."""
+        cl = changelist(user_admin, rf, admin_user, o="1")
+
+        assert not cl.cursor_paging
+        assert cl.multi_page
+
+    def test_invalid_cursor(self, user_admin, users, rf, admin_user):
+        """Test a garbled cursor is a bad lookup, not a server error."""
+        with pytest.raises(IncorrectLookupParameters):
+            changelist(user_admin, rf, admin_user, cursor="not-a-cursor")
+
+    def test_prefix_search_on_large_tables(self, user_admin, users, rf, admin_user):
+        """Test large tables only search the prefix fields."""
+        cl = changelist(user_admin, rf, admin_user, q="user1")
+
+        assert cl.search_fields == ["email__startswith"]
+        assert [user.email for user in cl.result_list] == ["user1@example.com"]
+
+    def test_date_hierarchy_hidden_on_large_tables(
+        self, user_admin, users, rf, admin_user, django_user_model, django_assert_num_queries
+    ):
+        """Test rendering a large changelist never lists the distinct dates of the table."""
+        user_admin.date_hierarchy = "created_at"
+        django_user_model.objects.filter(pk=users[0].pk).update(created_at=timezone.now() - timedelta(days=800))
+        request = rf.get("/admin/users/user/")
+        request.user = admin_user
+
+        # Capped size check, capped count and the page; no dates query
+        with django_assert_num_queries(3) as captured:
+            user_admin.changelist_view(request).render()
+
+        assert not any("DISTINCT" in query["sql"] for query in captured.captured_queries)
+
+    def test_small_tables_unchanged(self, user_admin, rf, admin_user):
+        """Test small tables keep exact counts, offset paging and full search."""
+        cl = changelist(user_admin, rf, admin_user)
+
+        assert not cl.cursor_paging
+        assert cl.result_count == 1
+        assert cl.search_fields == ["username", "email", "first_name"]
+
+
+@pytest.mark.django_db
+class TestEstimatedCountPaginator:
+    """Test counts of the estimated count paginator."""
+
+    def test_unfiltered_count_is_estimate(self, django_user_model, django_assert_num_queries):
+        """Test the estimate replaces COUNT(*) of the whole table."""
+        paginator = EstimatedCountPaginator(django_user_model.objects.all(), 10, estimate=5_000_000, count_cap=100)
+
+        with django_assert_num_queries(0):
+            assert paginator.count == 5_000_000
+        assert not paginator.count_exact
+
+    def test_filtered_count_is_capped(self, django_user_model, users):
+        """Test filtered counts stop at the cap."""
+        queryset = django_user_model.objects.filter(email__endswith="@example.com")
+
+        paginator = EstimatedCountPaginator(queryset, 10, estimate=5_000_000, count_cap=5)
+        assert (paginator.count, paginator.count_capped) == (5, True)
+
+        paginator = EstimatedCountPaginator(queryset, 10, estimate=5_000_000, count_cap=100)
+        assert (paginator.count, paginator.count_capped) == (8, False)
+{% else -%}
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+
+from apps.core.admin import EstimatedCountPaginator, LargeTableAdminMixin
+
+User = get_user_model()
+
+
+class UserAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ["username", "email"]
+    ordering = ["-created_at"]
+    list_per_page = 3
+    large_table_threshold = 5
+    cursor_pagination_field = "created_at"
+
+
+class TestLargeTableAdmin(TestCase):
+    """Test changelists of large tables."""
+
+    def test_cursor_paging(self):
+        """Test a large table pages with a cursor."""
+        admin_user = User.objects.create_superuser(email="admin@example.com", username="admin", password="pass12345")
+        for i in range(6):
+            User.objects.create_user(email=f"user{i}@example.com", username=f"user{i}", password="testpass123")
+        request = RequestFactory().get("/admin/users/user/")
+        request.user = admin_user
+
+        cl = UserAdmin(User, admin.AdminSite()).get_changelist_instance(request)
+
+        self.assertTrue(cl.cursor_paging)
+        self.assertEqual(len(cl.result_list), 3)
+        self.assertIn("cursor=", cl.next_page_url)
+
+    def test_unfiltered_count_is_estimate(self):
+        """Test the estimate replaces COUNT(*) of the whole table."""
+        paginator = EstimatedCountPaginator(User.objects.all(), 10, estimate=5_000_000, count_cap=100)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 5_000_000)
+{%- endif %}
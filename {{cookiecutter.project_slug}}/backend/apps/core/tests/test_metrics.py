@@ -0,0 +1,209 @@
+"""
+Tests for API request metrics.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+import threading
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.urls import resolve
+
+from apps.core.metrics import APICounters, api_counters, route_template
+from apps.core.queries import QueryCounter
+
+
+def resolved(rf, path, method="get"):
+    """Request factory request as seen after URL resolution."""
+    request = getattr(rf, method)(path)
+    request.resolver_match = resolve(path)
+    return request
+
+
+class TestRouteTemplate:
+    """Test endpoint names used as metric labels."""
+
+    def test_router_regexes_become_readable_routes(self, rf):
+        """Test DRF router patterns are reported with their kwargs names."""
+        assert route_template(resolved(rf, "/api/users/5/")) == "/api/users/<pk>/"
+        assert route_template(resolved(rf, "/api/health/")) == "/api/health/"
+
+    def test_unresolved_requests_share_one_label(self, rf):
+        """Test 404s don't create a label per path."""
+        assert route_template(rf.get("/api/missing/")) == "<unresolved>"
+
+
+class TestAPICounters:
+    """Test buffered request counters."""
+
+    @pytest.fixture
+    def counters(self):
+        return APICounters()
+
+    def test_rollup_by_endpoint_and_status(self, counters, rf):
+        """Test counts are rolled up per endpoint and status code."""
+        for status in (200, 200, 404, 500):
+            counters.record(resolved(rf, "/api/users/5/"), HttpResponse(status=status))
+        counters.record(resolved(rf, "/api/health/"), HttpResponse())
+
+        rollup = counters.rollup()
+
+        assert rollup["requests"] == 5
+        assert rollup["by_status"] == {"200": 3, "404": 1, "500": 1}
+        users = rollup["by_endpoint"]["GET /api/users/<pk>/"]
+        assert (users["requests"], users["client_errors"], users["server_errors"]) == (4, 1, 1)
+        assert next(iter(rollup["by_endpoint"])) == "GET /api/users/<pk>/"
+
+    def test_concurrent_requests_are_all_counted(self, counters, rf):
+        """Test no increment is lost across threads."""
+        request, response = resolved(rf, "/api/health/"), HttpResponse()
+
+        def record_many():
+            for _ in range(200):
+                counters.record(request, response)
+
+        threads = [threading.Thread(target=record_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counters.rollup()["requests"] == 1600
+
+    def test_api_metrics_command(self, rf):
+        """Test the command prints the daily rollup."""
+        api_counters.reset()
+        api_counters.record(resolved(rf, "/api/health/"), HttpResponse())
+        out = StringIO()
+
+        call_command("api_metrics", "--days", "1", stdout=out)
+
+        assert "1 requests (200: 1)" in out.getvalue().replace("  ", " ")
+        assert "GET /api/health/" in out.getvalue()
+        api_counters.reset()
+
+
+class TestLatency:
+    """Test latency histograms, slow request samples and the Prometheus endpoint."""
+
+    @pytest.fixture
+    def counters(self):
+        return APICounters()
+
+    def test_percentiles_per_endpoint(self, counters, rf):
+        """Test p50/p95/p99 are the upper bounds of the matching buckets."""
+        request = resolved(rf, "/api/users/5/")
+        for _ in range(90):
+            counters.record(request, HttpResponse(), 0.004)
+        for _ in range(9):
+            counters.record(request, HttpResponse(), 0.120)
+        counters.record(request, HttpResponse(), 2.0)
+
+        latency = counters.rollup()["by_endpoint"]["GET /api/users/<pk>/"]["latency_ms"]
+
+        assert latency["count"] == 100
+        assert (latency["p50"], latency["p95"], latency["p99"]) == (5, 150, 150)
+        assert latency["avg"] == round((90 * 4 + 9 * 120 + 2000) / 100, 1)
+
+    def test_slow_requests_are_sampled_with_query_counts(self, counters, rf, settings):
+        """Test slow requests keep a bounded sample with their SQL counts."""
+        settings.API_METRICS = {"SLOW_REQUEST_MS": 100, "SLOW_SAMPLES": 3}
+        queries = QueryCounter()
+        queries.count, queries.time = 12, 0.05
+        for duration in (0.01, 0.2, 0.3, 0.4, 0.5, 0.6):
+            counters.record(resolved(rf, "/api/users/5/"), HttpResponse(), duration, queries)
+
+        slow = counters.slow_requests()
+
+        assert slow["seen"] == 5
+        assert len(slow["requests"]) == 3
+        sample = slow["requests"][0]
+        assert (sample["path"], sample["queries"], sample["db_ms"]) == ("/api/users/5/", 12, 50.0)
+        assert sample["duration_ms"] >= 200
+
+    def test_middleware_counts_queries(self, rf, settings, django_user_model, db):
+        """Test the middleware passes the request's query count along."""
+        from apps.core.middleware import APIMetricsMiddleware
+
+        settings.API_METRICS = {"SLOW_REQUEST_MS": 0}
+        api_counters.reset()
+
+        def view(request):
+            list(django_user_model.objects.all())
+            list(django_user_model.objects.all())
+            return HttpResponse()
+
+        APIMetricsMiddleware(view)(resolved(rf, "/api/health/"))
+
+        assert api_counters.slow_requests()["requests"][0]["queries"] == 2
+        api_counters.reset()
+
+    def test_prometheus_format(self, counters, rf):
+        """Test counters and histograms are exposed in Prometheus text format."""
+        counters.record(resolved(rf, "/api/users/5/"), HttpResponse(status=404), 0.004)
+
+        text = counters.prometheus()
+
+        assert 'api_requests_total{method="GET",route="/api/users/<pk>/",status="404"} 1' in text
+        assert 'api_request_duration_seconds_bucket{method="GET",route="/api/users/<pk>/",le="0.0025"} 0' in text
+        assert 'api_request_duration_seconds_bucket{method="GET",route="/api/users/<pk>/",le="0.005"} 1' in text
+        assert 'api_request_duration_seconds_bucket{method="GET",route="/api/users/<pk>/",le="+Inf"} 1' in text
+        assert 'api_request_duration_seconds_count{method="GET",route="/api/users/<pk>/"} 1' in text
+
+    def test_metrics_endpoint_access(self, rf, settings):
+        """Test the endpoint requires the scrape token or an allowed IP."""
+        from django.contrib.auth.models import AnonymousUser
+
+        from apps.core.views.health import PrometheusMetricsView
+
+        settings.API_METRICS = {"SCRAPE_TOKEN": "secret", "ALLOWED_IPS": []}
+        view = PrometheusMetricsView.as_view()
+
+        def scrape(**headers):
+            request = rf.get("/api/health/metrics/", **headers)
+            request.user = AnonymousUser()
+            return view(request)
+
+        assert scrape().status_code == 403
+        assert scrape(HTTP_AUTHORIZATION="Bearer wrong").status_code == 403
+
+        response = scrape(HTTP_AUTHORIZATION="Bearer secret")
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE api_request_duration_seconds histogram" in response.content.decode()
+
+    def test_metrics_endpoint_rejects_loopback_by_default(self, rf):
+        """Test a proxied request (REMOTE_ADDR 127.0.0.1) without a token is refused."""
+        from django.contrib.auth.models import AnonymousUser
+
+        from apps.core.views.health import PrometheusMetricsView
+
+        request = rf.get("/api/health/metrics/", REMOTE_ADDR="127.0.0.1")
+        request.user = AnonymousUser()
+
+        assert PrometheusMetricsView.as_view()(request).status_code == 403
+{% else -%}
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import resolve
+
+from apps.core.metrics import APICounters
+
+
+class TestAPICounters(SimpleTestCase):
+    """Test buffered request counters."""
+
+    def test_rollup_by_endpoint_and_status(self):
+        """Test counts are rolled up per endpoint and status code."""
+        counters = APICounters()
+        request = RequestFactory().get("/api/users/5/")
+        request.resolver_match = resolve("/api/users/5/")
+
+        counters.record(request, HttpResponse())
+        counters.record(request, HttpResponse(status=404))
+
+        rollup = counters.rollup()
+        self.assertEqual(rollup["requests"], 2)
+        self.assertEqual(rollup["by_status"], {"200": 1, "404": 1})
+{%- endif %}
@@ -0,0 +1,125 @@
+"""
+Tests for SQL query counting and query budgets.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+import pytest
+from django.http import HttpResponse
+from django.urls import resolve
+
+from apps.core.middleware import QueryBudgetMiddleware
+from apps.core.queries import (
+    QueryBudget,
+    QueryBudgetExceeded,
+    QueryCounter,
+    check_query_budget,
+    get_query_budget,
+    sql_shape,
+)
+
+
+class TestQueryCounter:
+    """Test query counting and N+1 detection."""
+
+    def test_shapes_ignore_literals_and_in_lists(self):
+        """Test queries differing only in parameters share a shape."""
+        assert sql_shape("SELECT * FROM t WHERE id = 5") == sql_shape("SELECT * FROM t WHERE id = 12")
+        assert sql_shape("WHERE id IN (%s, %s, %s)") == sql_shape("WHERE id IN (%s, %s)")
+        assert sql_shape("WHERE name = 'a'") == "WHERE name = ?"
+
+    @pytest.mark.django_db
+    def test_repeated_queries_are_reported(self, django_user_model):
+        """Test a query per row shows up as a duplicate shape."""
+        with QueryCounter().track() as queries:
+            for pk in range(4):
+                django_user_model.objects.filter(pk=pk).first()
+            django_user_model.objects.count()
+
+        assert queries.count == 5
+        (shape, amount), = queries.duplicates()
+        assert amount == 4
+        assert "LIMIT" in shape
+
+    @pytest.mark.django_db
+    def test_nested_tracking_counts_once(self, django_user_model):
+        """Test middlewares sharing a counter don't double count."""
+        queries = QueryCounter()
+        with queries.track(), queries.track():
+            django_user_model.objects.count()
+
+        assert queries.count == 1
+
+
+class TestQueryBudget:
+    """Test per-route budgets and their enforcement."""
+
+    def test_route_budgets(self, settings):
+        """Test method-specific entries win over route entries and the default."""
+        settings.QUERY_BUDGET = {
+            "QUERIES": 30,
+            "DUPLICATES": 5,
+            "ROUTES": {"GET /api/users/": 5, "/api/users/": {"queries": 8, "duplicates": 1}},
+        }
+
+        assert get_query_budget("/api/users/", "GET") == QueryBudget(5, 5)
+        assert get_query_budget("/api/users/", "POST") == QueryBudget(8, 1)
+        assert get_query_budget("/api/other/", "GET") == QueryBudget(30, 5)
+
+    def test_violations_raise_or_log(self, settings, caplog):
+        """Test violations are raised with RAISE and logged otherwise."""
+        queries = QueryCounter()
+        queries.count = 6
+        queries.statements["SELECT 1"] = 6
+
+        settings.QUERY_BUDGET = {"ROUTES": {"/api/users/": 5}, "RAISE": True}
+        with pytest.raises(QueryBudgetExceeded):
+            check_query_budget("/api/users/", queries, "GET")
+
+        settings.QUERY_BUDGET = {"ROUTES": {"/api/users/": 5}, "RAISE": False, "DUPLICATES": 10}
+        violation = check_query_budget("/api/users/", queries, "GET")
+        assert violation.queries == 6
+        assert "Query budget exceeded for GET /api/users/" in caplog.text
+
+        settings.QUERY_BUDGET = {"ROUTES": {"/api/users/": 10}, "DUPLICATES": 10}
+        assert check_query_budget("/api/users/", queries, "GET") is None
+
+    @pytest.mark.django_db
+    def test_middleware_server_timing_and_budget(self, rf, settings, django_user_model):
+        """Test the middleware adds Server-Timing and enforces the route budget."""
+        settings.QUERY_BUDGET = {"ROUTES": {"/api/health/": 1}, "SERVER_TIMING": True, "RAISE": True}
+
+        def view(request, queries):
+            for _ in range(queries):
+                django_user_model.objects.count()
+            return HttpResponse()
+
+        def call(queries):
+            request = rf.get("/api/health/")
+            request.resolver_match = resolve("/api/health/")
+            return QueryBudgetMiddleware(lambda request: view(request, queries))(request)
+
+        response = call(1)
+        assert response["Server-Timing"].startswith("db;dur=")
+        assert 'desc="1 queries"' in response["Server-Timing"]
+
+        with pytest.raises(QueryBudgetExceeded):
+            call(2)
+{% else -%}
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.core.queries import QueryCounter
+
+
+class TestQueryCounter(TestCase):
+    """Test query counting and N+1 detection."""
+
+    def test_repeated_queries_are_reported(self):
+        """Test a query per row shows up as a duplicate shape."""
+        User = get_user_model()
+        with QueryCounter().track() as queries:
+            for pk in range(4):
+                User.objects.filter(pk=pk).first()
+
+        self.assertEqual(queries.count, 4)
+        self.assertEqual(queries.duplicates()[0][1], 4)
+{%- endif %}
@@ -5,6 +5,8 @@ from django.urls import path
 from .views.health import (
     HealthCheckView,
     DetailedHealthCheckView,
+    CacheStatsView,
+    PrometheusMetricsView,
     LivenessProbeView,
     ReadinessProbeView,
 )
@@ -15,6 +17,8 @@ urlpatterns = [
     # Health check endpoints
     path('health/', HealthCheckView.as_view(), name='health'),
     path('health/detailed/', DetailedHealthCheckView.as_view(), name='health-detailed'),
+    path('health/cache/', CacheStatsView.as_view(), name='health-cache'),
+    path('health/metrics/', PrometheusMetricsView.as_view(), name='health-metrics'),
     path('health/live/', LivenessProbeView.as_view(), name='health-liveness'),
     path('health/ready/', ReadinessProbeView.as_view(), name='health-readiness'),
 ]
\ No newline at end of file
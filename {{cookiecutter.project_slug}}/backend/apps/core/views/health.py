@@ -1,11 +1,14 @@
 """
 Health check views for monitoring.
 """
+import hmac
 import time
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views import View
 from django.db import connection
 from django.core.cache import cache
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
 {% if cookiecutter.use_redis == 'y' -%}
 import redis
 from django.conf import settings
@@ -155,6 +158,55 @@ class DetailedHealthCheckView(View):
         return JsonResponse(health_status, status=status_code)
 
 
+@method_decorator(never_cache, name='dispatch')
+class CacheStatsView(View):
+    """
+    Cache hit ratio, set sizes and latencies per key namespace.
+    Staff only; totals cover every process when the cache is Redis.
+    """
+    
+    def get(self, request):
+        if not (request.user.is_authenticated and request.user.is_staff):
+            return JsonResponse({'detail': 'Staff access required'}, status=403)
+        
+        from apps.cache.services import CacheService
+        
+        return JsonResponse({
+            'timestamp': int(time.time()),
+            'namespaces': CacheService().metrics_snapshot(),
+        })
+
+
+@method_decorator(never_cache, name='dispatch')
+class PrometheusMetricsView(View):
+    """
+    API request counters and latency histograms in Prometheus text format.
+    Internal: scrapers authenticate with API_METRICS['SCRAPE_TOKEN'] as a
+    bearer token or come from API_METRICS['ALLOWED_IPS'] (empty by default:
+    behind a proxy REMOTE_ADDR is the proxy's); staff may also read it.
+    """
+    
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+    
+    def get(self, request):
+        from apps.core.metrics import api_counters
+        
+        if not self.has_access(request, api_counters.options):
+            return JsonResponse({'detail': 'Metrics access denied'}, status=403)
+        
+        return HttpResponse(api_counters.prometheus(), content_type=self.content_type)
+    
+    def has_access(self, request, options):
+        token = options['SCRAPE_TOKEN']
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and authorization.startswith('Bearer '):
+            return hmac.compare_digest(authorization[len('Bearer '):], token)
+        if request.META.get('REMOTE_ADDR') in options['ALLOWED_IPS']:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_authenticated and user.is_staff)
+
+
 class LivenessProbeView(View):
     """
     Kubernetes liveness probe endpoint.
@@ -4,6 +4,8 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
+from apps.core.admin import LargeTableAdminMixin
+
 from .models import EmailTemplate, EmailLog
 
 
@@ -79,18 +81,25 @@ class EmailTemplateAdmin(admin.ModelAdmin):
 
 
 @admin.register(EmailLog)
-class EmailLogAdmin(admin.ModelAdmin):
+class EmailLogAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['to_email', 'subject', 'template_link', 'status', 'sent_at', 'created_at']
     list_filter = ['status', 'created_at', 'template']
     search_fields = ['to_email', 'subject', 'error_message']
+    # On large tables: keyset paging on the (created_at, id) indexes and
+    # recipient prefix search on emails_log_to_email_like_idx
+    cursor_pagination_field = 'created_at'
+    prefix_search_fields = ['to_email']
     readonly_fields = ['to_email', 'from_email', 'subject', 'template', 'status', 
                       'sent_at', 'error_message', 'user', 'context_data', 'created_at']
+    # Hidden on large tables by LargeTableAdminMixin
     date_hierarchy = 'created_at'
+    # template_link reads the template of every row
+    list_select_related = ['template']
     
     def template_link(self, obj):
         """Link to the email template."""
-        if obj.template:
-            url = reverse('admin:emails_emailtemplate_change', args=[obj.template.pk])
+        if obj.template_id:
+            url = reverse('admin:emails_emailtemplate_change', args=[obj.template_id])
             return format_html('<a href="{}">{}</a>', url, obj.template.name)
         return '-'
     
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class EmailsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.emails'
-    verbose_name = 'Email Templates'
\ No newline at end of file
+    verbose_name = 'Email Templates'
+    
+    def ready(self):
+        """Import signals when app is ready."""
+        import apps.emails.signals  # noqa
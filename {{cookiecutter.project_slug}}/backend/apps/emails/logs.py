@@ -0,0 +1,145 @@
+"""Write path of EmailLog.
+
+Every email sent writes an EmailLog row. Two things keep that cheap on a
+large table:
+
+- ``serialize_context`` stores a bounded, JSON safe copy of the context:
+  model instances are reduced to their primary key, values that cannot be
+  serialized are dropped, EMAIL_LOG['CONTEXT_KEYS'] optionally whitelists
+  the keys kept, and keys past CONTEXT_MAX_BYTES are left out.
+- ``buffered_email_logs()`` collects the rows written in a block (by
+  ``write_email_log``, which EmailService uses) and inserts them with
+  ``bulk_create``, instead of one INSERT per email.
+"""
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+# Defaults for the EMAIL_LOG setting
+EMAIL_LOG_DEFAULTS = {
+    'BUFFER_SIZE': 500,
+    'CONTEXT_MAX_BYTES': 4096,
+    'CONTEXT_KEYS': None,  # keys of the context kept in the log; None keeps all
+    'RETENTION_DAYS': 90,
+    'DELETE_CHUNK_SIZE': 5000,
+}
+
+_SKIP = object()
+_local = threading.local()
+
+
+def email_log_options() -> Dict[str, Any]:
+    return {**EMAIL_LOG_DEFAULTS, **getattr(settings, 'EMAIL_LOG', {})}
+
+
+def serialize_context(context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reduce an email context to what is worth keeping in EmailLog.
+
+    Keys left out because they could not be serialized or did not fit in
+    CONTEXT_MAX_BYTES are listed under ``_dropped``.
+    """
+    options = email_log_options()
+    keys = options['CONTEXT_KEYS']
+    budget = options['CONTEXT_MAX_BYTES']
+
+    data = {}
+    dropped = []
+    for key, value in (context or {}).items():
+        if keys is not None and key not in keys:
+            continue
+        value = _loggable(value)
+        if value is _SKIP:
+            dropped.append(key)
+            continue
+        size = len(json.dumps({key: value}).encode())
+        if size > budget:
+            dropped.append(key)
+            continue
+        data[key] = value
+        budget -= size
+
+    if dropped:
+        data['_dropped'] = dropped
+    return data
+
+
+def _loggable(value):
+    """A JSON value for a context value, or _SKIP."""
+    if isinstance(value, models.Model):
+        value = value.pk
+    try:
+        # Dates, decimals and UUIDs become strings
+        return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+    except (TypeError, ValueError):
+        return _SKIP
+
+
+class EmailLogBuffer:
+    """Collect unsaved EmailLog rows and insert them in bulk."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or email_log_options()['BUFFER_SIZE']
+        self.logs: List[Any] = []
+        self.written = 0
+
+    def add(self, log):
+        self.logs.append(log)
+        if len(self.logs) >= self.size:
+            self.flush()
+
+    def flush(self):
+        from .models import EmailLog
+
+        if self.logs:
+            EmailLog.objects.bulk_create(self.logs, batch_size=self.size)
+            self.written += len(self.logs)
+            self.logs = []
+
+
+@contextmanager
+def buffered_email_logs(size: Optional[int] = None):
+    """
+    Buffer the EmailLog rows written in the block and insert them in bulk.
+
+    Rows are flushed every ``size`` emails (EMAIL_LOG['BUFFER_SIZE'] by
+    default) and when the block exits, even with an exception, since the
+    emails they record were sent. Rows of a buffered block have no pk.
+
+    Usage:
+        with buffered_email_logs():
+            for user in users:
+                EmailService.send_templated_email('digest', user.email, {...})
+    """
+    buffer = EmailLogBuffer(size)
+    previous = getattr(_local, 'buffer', None)
+    _local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _local.buffer = previous
+        buffer.flush()
+
+
+def write_email_log(**fields):
+    """
+    Record an email in EmailLog, through the active buffer if any.
+
+    The context_data field is passed through serialize_context.
+    """
+    from .models import EmailLog
+
+    fields['context_data'] = serialize_context(fields.get('context_data'))
+    log = EmailLog(**fields)
+
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        log.save()
+    else:
+        buffer.add(log)
+    return log
@@ -0,0 +1,53 @@
+"""Management command to send the emails queued in the transactional outbox."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.emails.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Send due emails of the transactional outbox, once or in a loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep dispatching until interrupted',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds between polls of an empty outbox in --loop mode',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help="Emails claimed per batch (defaults to EMAIL_OUTBOX['BATCH_SIZE'])",
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(options['batch_size'])
+
+        if not options['loop']:
+            self.report(dispatcher.drain())
+            return
+
+        self.stdout.write(f"Dispatching the email outbox every {options['interval']}s, Ctrl+C to stop")
+        try:
+            while True:
+                close_old_connections()
+                result = dispatcher.drain()
+                if any(result.values()):
+                    self.report(result)
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            dispatcher.close()
+
+    def report(self, result):
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {result['sent']}, retrying {result['retried']}, failed {result['failed']}"
+        ))
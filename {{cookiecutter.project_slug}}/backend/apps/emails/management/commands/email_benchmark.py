@@ -0,0 +1,93 @@
+"""Management command to benchmark email template rendering."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.emails.models import EmailTemplate
+from apps.emails.template_cache import email_template_cache
+
+SAMPLE_HTML = """
+<html>
+<body>
+    <h1>{% raw %}{{ site_name }}{% endraw %} newsletter</h1>
+    <p>Hi {% raw %}{{ name|default:"there" }}{% endraw %},</p>
+    {% raw %}{% for item in items %}{% endraw %}
+    <div class="item">
+        <h2>{% raw %}{{ item.title|title }}{% endraw %}</h2>
+        <p>{% raw %}{{ item.summary|truncatewords:20 }}{% endraw %}</p>
+        <a href="{% raw %}{{ site_url }}{% endraw %}/items/{% raw %}{{ item.id }}{% endraw %}/">Read more</a>
+    </div>
+    {% raw %}{% endfor %}{% endraw %}
+    {% raw %}{% if unsubscribe_url %}{% endraw %}<a href="{% raw %}{{ unsubscribe_url }}{% endraw %}">Unsubscribe</a>{% raw %}{% endif %}{% endraw %}
+    <p>Questions? Write to {% raw %}{{ support_email }}{% endraw %}.</p>
+</body>
+</html>
+"""
+
+SAMPLE_TEXT = """Hi {% raw %}{{ name|default:"there" }}{% endraw %},
+{% raw %}{% for item in items %}{% endraw %}
+* {% raw %}{{ item.title|title }}{% endraw %}: {% raw %}{{ site_url }}{% endraw %}/items/{% raw %}{{ item.id }}{% endraw %}/
+{% raw %}{% endfor %}{% endraw %}
+"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark email renders per second with and without the compiled template cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Renders per measurement',
+        )
+        parser.add_argument(
+            '--template',
+            type=str,
+            help='Benchmark a stored template instead of the built-in sample',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        context = {
+            'name': 'Jane',
+            'unsubscribe_url': 'https://example.com/unsubscribe/abc',
+            'items': [
+                {'id': i, 'title': f'story number {i}', 'summary': 'Lorem ipsum dolor sit amet ' * 8}
+                for i in range(5)
+            ],
+        }
+
+        if options['template']:
+            template = EmailTemplate.objects.get(name=options['template'])
+        else:
+            # Unsaved, but with the identity the cache keys on
+            template = EmailTemplate(
+                pk=0,
+                name='benchmark',
+                subject='{% raw %}{{ site_name }}{% endraw %} news for {% raw %}{{ name }}{% endraw %}',
+                html_content=SAMPLE_HTML,
+                text_content=SAMPLE_TEXT,
+                updated_at=timezone.now(),
+            )
+
+        email_template_cache.invalidate(template)
+        self.stdout.write(f'Template {template.name!r}, {iterations} renders per measurement')
+
+        uncached = self._renders_per_second(
+            lambda: template.render(context, compiled=template.compile()), iterations,
+        )
+        cached = self._renders_per_second(lambda: template.render(context), iterations)
+        email_template_cache.invalidate(template)
+
+        self.stdout.write(f'  compile every render {uncached:>10.0f} renders/s')
+        self.stdout.write(f'  compiled cache       {cached:>10.0f} renders/s')
+        self.stdout.write(self.style.SUCCESS(f'Compiled template cache renders {cached / uncached:.1f}x faster'))
+
+    def _renders_per_second(self, render, iterations: int) -> float:
+        render()  # warm up
+        started = time.perf_counter()
+        for _ in range(iterations):
+            render()
+        return iterations / (time.perf_counter() - started)
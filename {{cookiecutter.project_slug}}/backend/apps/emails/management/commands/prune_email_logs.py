@@ -0,0 +1,102 @@
+"""Management command to delete (and optionally archive) old email logs."""
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from apps.emails.logs import email_log_options
+from apps.emails.models import EmailLog
+
+
+class Command(BaseCommand):
+    help = 'Delete email logs older than the retention period, in chunks'
+
+    def add_arguments(self, parser):
+        options = email_log_options()
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=options['RETENTION_DAYS'],
+            help="Keep logs of the last DAYS days (defaults to EMAIL_LOG['RETENTION_DAYS'])",
+        )
+        parser.add_argument(
+            '--status',
+            nargs='+',
+            default=['sent', 'failed', 'bounced'],
+            help='Statuses to delete (pending outbox emails are kept by default)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=options['DELETE_CHUNK_SIZE'],
+            help='Rows deleted per statement',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between chunks, to spare replicas and vacuum',
+        )
+        parser.add_argument(
+            '--archive',
+            type=str,
+            help='Append the deleted rows as JSON lines to this file (gzipped if it ends in .gz)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the rows that would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        queryset = EmailLog.objects.filter(created_at__lt=cutoff, status__in=options['status'])
+
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count()} email logs older than {cutoff:%Y-%m-%d %H:%M} would be deleted")
+            return
+
+        archive = self.open_archive(options['archive'])
+        deleted = 0
+        last_id = 0
+        try:
+            while True:
+                # Keyset pagination: every chunk starts where the last one
+                # ended, instead of rescanning the rows already deleted
+                chunk = queryset.filter(id__gt=last_id).order_by('id')[:options['chunk_size']]
+                if archive:
+                    rows = list(chunk.values())
+                    ids = [row['id'] for row in rows]
+                    for row in rows:
+                        archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    archive.flush()
+                else:
+                    ids = list(chunk.values_list('id', flat=True))
+                if not ids:
+                    break
+
+                EmailLog.objects.filter(id__in=ids).delete()
+                deleted += len(ids)
+                last_id = ids[-1]
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"  deleted {deleted} email logs")
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+        finally:
+            if archive:
+                archive.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} email logs older than {cutoff:%Y-%m-%d %H:%M}"
+        ))
+
+    def open_archive(self, path):
+        if not path:
+            return None
+        if path.endswith('.gz'):
+            return gzip.open(path, 'at', encoding='utf-8')
+        return open(path, 'a', encoding='utf-8')
@@ -0,0 +1,59 @@
+import django.db.models.deletion
+from django.conf import settings
+{% if cookiecutter.database == 'postgresql' -%}
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+{% endif -%}
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+{% if cookiecutter.database == 'postgresql' %}
+    # Build the indexes concurrently: a plain CREATE INDEX blocks writes to
+    # emails_emaillog (every email sent or queued) for the whole build
+    atomic = False
+{% endif %}
+    dependencies = [
+        ('emails', '0002_emaillog_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='emaillog',
+            options={'ordering': ['-created_at']},
+        ),
+        # Create the new indexes before dropping the ones they replace
+        {% if cookiecutter.database == 'postgresql' %}AddIndexConcurrently{% else %}migrations.AddIndex{% endif %}(
+            model_name='emaillog',
+            index=models.Index(fields=['-created_at', '-id'], name='emails_log_created_idx'),
+        ),
+        {% if cookiecutter.database == 'postgresql' %}AddIndexConcurrently{% else %}migrations.AddIndex{% endif %}(
+            model_name='emaillog',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='emails_log_status_created_idx'),
+        ),
+        {% if cookiecutter.database == 'postgresql' %}RemoveIndexConcurrently{% else %}migrations.RemoveIndex{% endif %}(
+            model_name='emaillog',
+            name='emails_emai_status_3b8e3f_idx',
+        ),
+        # Single column indexes covered by the composite ones
+        migrations.AlterField(
+            model_name='emaillog',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='emaillog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('bounced', 'Bounced')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='emaillog',
+            name='to_email',
+            field=models.EmailField(max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='emaillog',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='email_logs', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
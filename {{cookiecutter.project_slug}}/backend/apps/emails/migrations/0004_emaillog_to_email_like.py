@@ -0,0 +1,22 @@
+{% if cookiecutter.database == 'postgresql' -%}
+from django.contrib.postgres.operations import AddIndexConcurrently
+{% endif -%}
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+{% if cookiecutter.database == 'postgresql' %}
+    # Build the index concurrently: a plain CREATE INDEX blocks writes to
+    # emails_emaillog for the whole build
+    atomic = False
+{% endif %}
+    dependencies = [
+        ('emails', '0003_emaillog_indexes'),
+    ]
+
+    operations = [
+        {% if cookiecutter.database == 'postgresql' %}AddIndexConcurrently{% else %}migrations.AddIndex{% endif %}(
+            model_name='emaillog',
+            index=models.Index(fields=['to_email'], name='emails_log_to_email_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.template import Context, Template
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 
+from .template_cache import email_template_cache
+
 
 class EmailTemplate(models.Model):
     """Database-stored email templates."""
@@ -48,8 +50,22 @@ class EmailTemplate(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_template_type_display()})"
     
-    def render(self, context_data=None):
-        """Render the email template with given context."""
+    def compile(self):
+        """Compile the subject, HTML and text templates for repeated rendering."""
+        return {
+            'subject': Template(self.subject),
+            'html_content': Template(self.html_content),
+            'text_content': Template(self.text_content),
+        }
+    
+    def render(self, context_data=None, compiled=None):
+        """Render the email template with given context.
+        
+        Args:
+            context_data: Context for this email
+            compiled: Templates from compile(); the process-wide compiled
+                template cache is used by default
+        """
         context = self.default_context.copy()
         if context_data:
             context.update(context_data)
@@ -62,16 +78,13 @@ class EmailTemplate(models.Model):
         })
         
         # Render templates
-        html_template = Template(self.html_content)
-        text_template = Template(self.text_content)
-        subject_template = Template(self.subject)
-        
+        compiled = compiled or email_template_cache.compiled_for(self)
         context_obj = Context(context)
         
         return {
-            'subject': subject_template.render(context_obj),
-            'html_content': html_template.render(context_obj),
-            'text_content': text_template.render(context_obj),
+            'subject': compiled['subject'].render(context_obj),
+            'html_content': compiled['html_content'].render(context_obj),
+            'text_content': compiled['text_content'].render(context_obj),
         }
     
     def send(self, to_email, context_data=None, from_email=None, attachments=None):
@@ -119,10 +132,16 @@ class EmailLog(models.Model):
     from_email = models.EmailField()
     subject = models.CharField(max_length=200)
     
+    # Rendered bodies of emails queued in the outbox (apps.emails.outbox)
+    text_body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    
     # Status tracking
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     sent_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     
     # Optional user tracking
     user = models.ForeignKey(
@@ -139,9 +158,16 @@ class EmailLog(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # The admin changelist orders by -created_at, -id: these indexes
+        # serve it, with and without a status filter, without sorting
         indexes = [
-            models.Index(fields=['to_email', 'status']),
-            models.Index(fields=['-created_at']),
+            models.Index(fields=['-created_at', '-id'], name='emails_log_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='emails_log_status_created_idx'),
+            models.Index(fields=['to_email', 'created_at'], name='emails_emai_to_emai_c6d3a3_idx'),
+            # Prefix search of the admin (LIKE 'abc%', PostgreSQL needs the opclass)
+            models.Index(fields=['to_email'], name='emails_log_to_email_like_idx', opclasses=['varchar_pattern_ops']),
+            # Due emails of the outbox
+            models.Index(fields=['status', 'next_attempt_at'], name='emails_log_outbox_idx'),
         ]
     
     def __str__(self):
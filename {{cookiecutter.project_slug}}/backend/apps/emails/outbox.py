@@ -0,0 +1,277 @@
+"""Transactional email outbox.
+
+Transactional emails are rendered in the request and written to EmailLog
+as ``pending`` rows, inside the request's transaction: an email exists
+if and only if the registration (or reset, ...) that caused it was
+committed, and no SMTP server is contacted by the request thread.
+
+A dispatcher drains the outbox in batches. It claims due rows in a short
+transaction (``SELECT ... FOR UPDATE SKIP LOCKED``, then a lease: their
+``next_attempt_at`` is pushed LEASE_SECONDS ahead), commits, and only
+then sends them over one SMTP connection, so no transaction or row lock
+is held while waiting on the SMTP server. Several dispatchers never send
+the same email, and rows of a dispatcher that died come due again when
+the lease runs out. Failed sends are retried with exponential backoff
+until MAX_ATTEMPTS.
+
+Dispatchers run as the ``dispatch_email_outbox`` Celery task (queued on
+commit and from beat), as ``manage.py dispatch_emails --loop``, or,
+without Celery, in a background thread of the process that queued them.
+"""
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .tasks import celery_enabled, dispatch_email_outbox
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the EMAIL_OUTBOX setting
+EMAIL_OUTBOX_DEFAULTS = {
+    'ENABLED': True,
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,  # doubled after every failed attempt
+    'MAX_BACKOFF_SECONDS': 3600,
+    # How long claimed emails are reserved for the dispatcher sending them
+    'LEASE_SECONDS': 300,
+    # Without Celery, drain the outbox in a background thread after commit
+    'DISPATCH_ON_COMMIT': True,
+}
+
+
+def outbox_options() -> Dict[str, Any]:
+    return {**EMAIL_OUTBOX_DEFAULTS, **getattr(settings, 'EMAIL_OUTBOX', {})}
+
+
+def outbox_enabled() -> bool:
+    """Whether transactional emails go through the outbox."""
+    return apps.is_installed('apps.emails') and outbox_options()['ENABLED']
+
+
+def enqueue_email(
+    to_email: str,
+    subject: str,
+    text_body: str,
+    html_body: str = '',
+    from_email: Optional[str] = None,
+    template=None,
+    user=None,
+    context_data: Optional[Dict[str, Any]] = None,
+):
+    """
+    Queue a rendered email in the outbox.
+
+    Call it inside the transaction that makes the email necessary; the
+    dispatcher is only notified once that transaction commits.
+
+    Args:
+        to_email: Recipient email
+        subject: Rendered subject
+        text_body: Rendered plain text body
+        html_body: Rendered HTML body, if any
+        from_email: Sender email (defaults to DEFAULT_FROM_EMAIL)
+        template: EmailTemplate the email was rendered from, if any
+        user: User the email is about, if any
+        context_data: Context the email was rendered with, kept for debugging
+            (through apps.emails.logs.serialize_context)
+
+    Returns:
+        The pending EmailLog
+    """
+    from .logs import serialize_context
+    from .models import EmailLog
+
+    log = EmailLog.objects.create(
+        template=template,
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject[:200],
+        text_body=text_body,
+        html_body=html_body or '',
+        status='pending',
+        next_attempt_at=timezone.now(),
+        user=user,
+        context_data=serialize_context(context_data),
+    )
+    transaction.on_commit(notify_dispatcher)
+    return log
+
+
+def notify_dispatcher():
+    """Have a dispatcher drain the outbox soon, without waiting for it."""
+    if celery_enabled():
+        try:
+            dispatch_email_outbox.delay()
+            return
+        except Exception as e:
+            logger.error(f"Failed to queue email dispatch, dispatching in-process: {str(e)}")
+
+    if outbox_options()['DISPATCH_ON_COMMIT']:
+        _get_executor().submit(_safe_dispatch)
+
+
+class OutboxDispatcher:
+    """Send due outbox emails in batches over one SMTP connection.
+
+    The connection stays open while there is work, so a burst of emails
+    (or a loop of batches) pays for the SMTP handshake once.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None):
+        options = outbox_options()
+        self.batch_size = batch_size or options['BATCH_SIZE']
+        self.max_attempts = options['MAX_ATTEMPTS']
+        self.backoff = options['BACKOFF_SECONDS']
+        self.max_backoff = options['MAX_BACKOFF_SECONDS']
+        self.lease = timedelta(seconds=options['LEASE_SECONDS'])
+        self.connection = None
+
+    def drain(self, max_batches: Optional[int] = None) -> Dict[str, int]:
+        """Dispatch batches until the outbox has no due emails.
+
+        Returns:
+            Dictionary with the number of emails sent, retried and failed
+        """
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                result = self.dispatch_batch()
+                for key in totals:
+                    totals[key] += result[key]
+                batches += 1
+                if sum(result.values()) < self.batch_size:
+                    break
+        finally:
+            self.close()
+        return totals
+
+    def dispatch_batch(self) -> Dict[str, int]:
+        """Claim, send and update one batch of due emails."""
+        from .models import EmailLog
+
+        result = {'sent': 0, 'retried': 0, 'failed': 0}
+        logs, lease_expires = self._claim()
+        if not logs:
+            return result
+
+        done = []
+        for log in logs:
+            # Past the lease another dispatcher may claim the rest again
+            if timezone.now() >= lease_expires:
+                break
+            error = self._send(log)
+            log.attempts += 1
+            if error is None:
+                log.status = 'sent'
+                log.sent_at = timezone.now()
+                log.error_message = ''
+                result['sent'] += 1
+            elif log.attempts >= self.max_attempts:
+                log.status = 'failed'
+                log.error_message = error
+                result['failed'] += 1
+            else:
+                log.next_attempt_at = timezone.now() + self._backoff(log.attempts)
+                log.error_message = error
+                result['retried'] += 1
+            done.append(log)
+
+        EmailLog.objects.bulk_update(
+            done, ['status', 'sent_at', 'attempts', 'next_attempt_at', 'error_message'],
+        )
+        return result
+
+    def _claim(self):
+        """Lease a batch of due emails to this dispatcher, in a short transaction."""
+        from .models import EmailLog
+
+        now = timezone.now()
+        lease_expires = now + self.lease
+        with transaction.atomic():
+            # Rows locked by another dispatcher are skipped, not waited for
+            logs = list(
+                EmailLog.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:self.batch_size]
+            )
+            if logs:
+                EmailLog.objects.filter(pk__in=[log.pk for log in logs]).update(
+                    next_attempt_at=lease_expires,
+                )
+        return logs, lease_expires
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def _send(self, log) -> Optional[str]:
+        """Send one email, returning the error message if it failed."""
+        msg = EmailMultiAlternatives(
+            subject=log.subject,
+            body=log.text_body,
+            from_email=log.from_email,
+            to=[log.to_email],
+        )
+        if log.html_body:
+            msg.attach_alternative(log.html_body, "text/html")
+
+        try:
+            if self.connection is None:
+                self.connection = get_connection()
+                self.connection.open()
+            if not self.connection.send_messages([msg]):
+                return 'Not accepted by the email backend'
+        except Exception as e:
+            # The connection may be broken; reopen it for the next email
+            self.close()
+            return str(e) or e.__class__.__name__
+        return None
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def dispatch_outbox(batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> Dict[str, int]:
+    """Drain the due emails of the outbox."""
+    return OutboxDispatcher(batch_size).drain(max_batches)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One worker: later notifications queue behind a running drain
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+        return _executor
+
+
+def _safe_dispatch():
+    from django.db import connection
+
+    try:
+        dispatch_outbox()
+    except Exception as e:
+        logger.error(f"Email outbox dispatch failed: {str(e)}")
+    finally:
+        # The worker thread has its own database connection
+        connection.close()
@@ -1,12 +1,17 @@
 """Email service for sending templated emails."""
 import logging
-from typing import Dict, List, Optional, Any
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template, render_to_string
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
+from .logs import serialize_context, write_email_log
 from .models import EmailTemplate, EmailLog
+from .outbox import enqueue_email, outbox_enabled
+from .tasks import celery_enabled, send_email_batch
+from .template_cache import email_template_cache
 
 logger = logging.getLogger(__name__)
 
@@ -48,15 +53,14 @@ class EmailService:
                 to_email = [to_email]
             
             if use_db_template:
-                # Try to get template from database
-                try:
-                    template = EmailTemplate.objects.get(name=template_name, is_active=True)
+                # Try to get template from database, through the template cache
+                template = email_template_cache.get_active(template_name)
+                if template is not None:
                     rendered = template.render(context)
                     subject = rendered['subject']
                     html_content = rendered['html_content']
                     text_content = rendered['text_content']
-                    
-                except EmailTemplate.DoesNotExist:
+                else:
                     logger.warning(f"Database template '{template_name}' not found, falling back to file template")
                     use_db_template = False
             
@@ -86,7 +90,7 @@ class EmailService:
             
             # Log email if requested
             if log_email:
-                EmailLog.objects.create(
+                write_email_log(
                     template=template if use_db_template and 'template' in locals() else None,
                     to_email=', '.join(to_email),
                     from_email=from_email,
@@ -103,7 +107,7 @@ class EmailService:
             
             # Log failed email
             if log_email:
-                EmailLog.objects.create(
+                write_email_log(
                     to_email=', '.join(to_email) if isinstance(to_email, list) else to_email,
                     from_email=from_email or settings.DEFAULT_FROM_EMAIL,
                     subject=template_name,
@@ -114,56 +118,269 @@ class EmailService:
             
             return False
     
+    @staticmethod
+    def queue_templated_email(
+        template_name: str,
+        to_email: str,
+        context: Optional[Dict[str, Any]] = None,
+        from_email: Optional[str] = None,
+        user=None,
+        use_db_template: bool = True,
+    ) -> Optional[EmailLog]:
+        """
+        Render a templated email now and queue it in the outbox.
+        
+        The email is written in the current transaction and sent by the
+        outbox dispatcher once it commits (see apps.emails.outbox).
+        
+        Args:
+            template_name: Name of the template to use
+            to_email: Recipient email
+            context: Context data for template rendering
+            from_email: Sender email (defaults to DEFAULT_FROM_EMAIL)
+            user: User the email is about, if any
+            use_db_template: Whether to use database template or file template
+        
+        Returns:
+            The pending EmailLog, or None if the template could not be rendered
+        """
+        context = context or {}
+        try:
+            template, render = EmailService._load_renderer(template_name, use_db_template)
+            rendered = render(context)
+        except Exception as e:
+            logger.error(f"Error rendering email '{template_name}': {str(e)}")
+            return None
+        
+        return enqueue_email(
+            to_email=to_email,
+            subject=rendered['subject'],
+            text_body=rendered['text_content'],
+            html_body=rendered['html_content'],
+            from_email=from_email,
+            template=template,
+            user=user,
+            context_data=context,
+        )
+    
     @staticmethod
     def send_bulk_emails(
         template_name: str,
         recipients: List[Dict[str, Any]],
         from_email: Optional[str] = None,
         batch_size: int = 50,
+        use_db_template: bool = True,
     ) -> Dict[str, Any]:
         """
         Send bulk emails to multiple recipients.
         
+        Batches are fanned out to Celery workers when Celery is enabled,
+        so recipient contexts must be JSON serializable. Otherwise they
+        are sent here, one after the other. Either way, each batch is
+        rendered from compiled templates, sent over one SMTP connection
+        and logged with a single bulk insert.
+        
         Args:
             template_name: Name of the template to use
-            recipients: List of dicts with 'email' and 'context' keys
+            recipients: List of dicts with 'email', 'context' and optional 'user_id' keys
             from_email: Sender email
             batch_size: Number of emails to send in each batch
+            use_db_template: Whether to use database template or file template
         
         Returns:
-            Dictionary with success count and failed emails
+            Dictionary with success count and failed emails, and the
+            number of batches handed to Celery (whose results are only
+            in the EmailLog)
         """
+        batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+        queued = 0
+        
+        if celery_enabled():
+            try:
+                for batch in batches:
+                    send_email_batch.delay(template_name, batch, from_email, use_db_template)
+                    queued += 1
+            except Exception as e:
+                logger.error(f"Failed to queue bulk email batches, sending the rest here: {str(e)}")
+        
         success_count = 0
         failed_emails = []
         
-        for i in range(0, len(recipients), batch_size):
-            batch = recipients[i:i + batch_size]
-            
-            for recipient in batch:
-                email = recipient.get('email')
-                context = recipient.get('context', {})
-                
-                if EmailService.send_templated_email(
-                    template_name=template_name,
-                    to_email=email,
-                    context=context,
-                    from_email=from_email,
-                    log_email=True,
-                ):
-                    success_count += 1
-                else:
-                    failed_emails.append(email)
+        if queued < len(batches):
+            # Fetch and compile the template once for all remaining batches
+            template, render = EmailService._load_renderer(template_name, use_db_template)
+            for batch in batches[queued:]:
+                result = EmailService._deliver_batch(template, render, batch, from_email)
+                success_count += result['success_count']
+                failed_emails.extend(result['failed_emails'])
         
         return {
             'success_count': success_count,
             'failed_emails': failed_emails,
             'total': len(recipients),
+            'queued_batches': queued,
+        }
+    
+    @staticmethod
+    def send_batch(
+        template_name: str,
+        recipients: List[Dict[str, Any]],
+        from_email: Optional[str] = None,
+        use_db_template: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Send one batch of a bulk email over a single SMTP connection.
+        
+        Args:
+            template_name: Name of the template to use
+            recipients: List of dicts with 'email', 'context' and optional 'user_id' keys
+            from_email: Sender email
+            use_db_template: Whether to use database template or file template
+        
+        Returns:
+            Dictionary with success count and failed emails
+        """
+        template, render = EmailService._load_renderer(template_name, use_db_template)
+        return EmailService._deliver_batch(template, render, recipients, from_email)
+    
+    @staticmethod
+    def _load_renderer(
+        template_name: str,
+        use_db_template: bool = True,
+    ) -> Tuple[Optional[EmailTemplate], Callable[[Dict[str, Any]], Dict[str, str]]]:
+        """
+        Fetch and compile a template once (or take both from the
+        template cache), for rendering many emails.
+        
+        Returns:
+            The database template (None for file templates) and a function
+            rendering a context to subject, html_content and text_content
+        """
+        if use_db_template:
+            template = email_template_cache.get_active(template_name)
+            if template is not None:
+                compiled = email_template_cache.compiled_for(template)
+                return template, lambda context: template.render(context, compiled=compiled)
+            logger.warning(f"Database template '{template_name}' not found, falling back to file template")
+        
+        subject_template = get_template(f'emails/{template_name}_subject.txt')
+        html_template = get_template(f'emails/{template_name}.html')
+        text_template = get_template(f'emails/{template_name}.txt')
+        
+        def render(context):
+            return {
+                'subject': subject_template.render(context).strip(),
+                'html_content': html_template.render(context),
+                'text_content': text_template.render(context),
+            }
+        
+        return None, render
+    
+    @staticmethod
+    def _deliver_batch(
+        template: Optional[EmailTemplate],
+        render: Callable[[Dict[str, Any]], Dict[str, str]],
+        recipients: List[Dict[str, Any]],
+        from_email: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Render, send and log one batch.
+        
+        Messages go out over one connection, one send_messages() call
+        each, so a rejected recipient fails alone instead of the batch.
+        """
+        from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        logs = []
+        messages = []
+        
+        for recipient in recipients:
+            email = recipient.get('email')
+            context = recipient.get('context', {})
+            log = EmailLog(
+                template=template,
+                to_email=email,
+                from_email=from_email,
+                subject=template.name if template else '',
+                status='failed',
+                user_id=recipient.get('user_id'),
+                context_data=serialize_context(context),
+            )
+            logs.append(log)
+            try:
+                rendered = render(context)
+            except Exception as e:
+                log.error_message = f"Rendering failed: {str(e)}"
+                continue
+            
+            log.subject = rendered['subject'][:200]
+            msg = EmailMultiAlternatives(
+                subject=rendered['subject'],
+                body=rendered['text_content'],
+                from_email=from_email,
+                to=[email],
+            )
+            msg.attach_alternative(rendered['html_content'], "text/html")
+            messages.append((log, msg))
+        
+        try:
+            with get_connection() as connection:
+                for log, msg in messages:
+                    try:
+                        sent = connection.send_messages([msg])
+                    except Exception as e:
+                        log.error_message = str(e)
+                        continue
+                    if sent:
+                        log.status = 'sent'
+                        log.sent_at = timezone.now()
+        except Exception as e:
+            # The connection could not be opened: nothing was sent
+            logger.error(f"Error opening email connection: {str(e)}")
+            for log, _ in messages:
+                if log.status != 'sent':
+                    log.error_message = log.error_message or str(e)
+        
+        EmailLog.objects.bulk_create(logs, batch_size=500)
+        
+        failed_emails = [log.to_email for log in logs if log.status != 'sent']
+        return {
+            'success_count': len(logs) - len(failed_emails),
+            'failed_emails': failed_emails,
         }
 
 
+def _queue_or_send(template_name: str, user, context: Dict[str, Any]):
+    """
+    Queue an email about a user in the outbox, or send it.
+    
+    Without the outbox, an email asked for inside a transaction is sent
+    once it commits: never for a rolled back change, and without holding
+    the transaction open over SMTP.
+    """
+    if outbox_enabled():
+        return EmailService.queue_templated_email(
+            template_name=template_name,
+            to_email=user.email,
+            context=context,
+            user=user,
+        )
+    
+    def send():
+        return EmailService.send_templated_email(
+            template_name=template_name,
+            to_email=user.email,
+            context=context,
+        )
+    
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(send)
+        return None
+    return send()
+
+
 # Convenience functions for common emails
 def send_welcome_email(user, **kwargs):
-    """Send welcome email to new user."""
+    """Send welcome email to new user (queued in the outbox when enabled)."""
     context = {
         'user': user,
         'username': user.username,
@@ -171,15 +388,11 @@ def send_welcome_email(user, **kwargs):
         **kwargs
     }
     
-    return EmailService.send_templated_email(
-        template_name='welcome',
-        to_email=user.email,
-        context=context,
-    )
+    return _queue_or_send('welcome', user, context)
 
 
 def send_password_reset_email(user, reset_url, **kwargs):
-    """Send password reset email."""
+    """Send password reset email (queued in the outbox when enabled)."""
     context = {
         'user': user,
         'reset_url': reset_url,
@@ -187,23 +400,15 @@ def send_password_reset_email(user, reset_url, **kwargs):
         **kwargs
     }
     
-    return EmailService.send_templated_email(
-        template_name='password_reset',
-        to_email=user.email,
-        context=context,
-    )
+    return _queue_or_send('password_reset', user, context)
 
 
 def send_email_verification(user, verification_url, **kwargs):
-    """Send email verification link."""
+    """Send email verification link (queued in the outbox when enabled)."""
     context = {
         'user': user,
         'verification_url': verification_url,
         **kwargs
     }
     
-    return EmailService.send_templated_email(
-        template_name='email_verification',
-        to_email=user.email,
-        context=context,
-    )
\ No newline at end of file
+    return _queue_or_send('email_verification', user, context)
\ No newline at end of file
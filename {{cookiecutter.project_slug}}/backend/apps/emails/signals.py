@@ -0,0 +1,12 @@
+"""Signals for the emails app."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import EmailTemplate
+from .template_cache import email_template_cache
+
+
+@receiver([post_save, post_delete], sender=EmailTemplate)
+def invalidate_email_template_cache(sender, instance, **kwargs):
+    """Drop the cached lookup and compiled copy of a changed template."""
+    email_template_cache.invalidate(instance)
@@ -0,0 +1,95 @@
+"""
+Async tasks for the emails app.
+Gracefully handles both Celery and synchronous execution.
+"""
+import logging
+
+from django.conf import settings
+
+{% if cookiecutter.use_celery == 'y' -%}
+try:
+    from celery import shared_task
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+{% else -%}
+CELERY_AVAILABLE = False
+{%- endif %}
+
+logger = logging.getLogger(__name__)
+
+
+def task_decorator(func):
+    """
+    Decorator that makes a function a Celery task if available,
+    otherwise returns the function as-is for synchronous execution.
+    """
+    {% if cookiecutter.use_celery == 'y' -%}
+    if CELERY_AVAILABLE:
+        # No automatic retries: a retried batch would mail its
+        # delivered recipients again
+        return shared_task(ignore_result=True)(func)
+    {%- endif %}
+    return func
+
+
+def celery_enabled() -> bool:
+    """
+    Check whether work should be queued on Celery instead of run in-process.
+    """
+    return (
+        CELERY_AVAILABLE
+        and getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False) is False
+        and getattr(settings, "USE_CELERY", True)
+    )
+
+
+@task_decorator
+def send_email_batch(
+    template_name: str,
+    recipients: list,
+    from_email: str = None,
+    use_db_template: bool = True,
+) -> dict:
+    """
+    Send one batch of a bulk email over a single SMTP connection.
+
+    Args:
+        template_name: Name of the template to use
+        recipients: List of dicts with 'email', 'context' and optional 'user_id'
+        from_email: Sender email
+        use_db_template: Whether to use database template or file template
+
+    Returns:
+        dict: Success count and failed emails of the batch
+    """
+    from .services import EmailService
+
+    result = EmailService.send_batch(
+        template_name, recipients, from_email=from_email, use_db_template=use_db_template,
+    )
+    if result['failed_emails']:
+        logger.warning(
+            f"Bulk email '{template_name}': {len(result['failed_emails'])} of "
+            f"{len(recipients)} recipients failed"
+        )
+    return result
+
+
+@task_decorator
+def dispatch_email_outbox(batch_size: int = None) -> dict:
+    """
+    Send the due emails of the transactional outbox.
+
+    Queued after every commit that adds an email, and scheduled by beat
+    to pick up retries.
+
+    Args:
+        batch_size: Emails claimed per batch (defaults to EMAIL_OUTBOX['BATCH_SIZE'])
+
+    Returns:
+        dict: Numbers of emails sent, retried and failed
+    """
+    from .outbox import dispatch_outbox
+
+    return dispatch_outbox(batch_size)
@@ -0,0 +1,83 @@
+"""Process-wide caches of compiled email templates and template lookups.
+
+Parsing the subject, HTML and text of an EmailTemplate costs more than
+rendering them, so compiled templates are kept in a bounded LRU, keyed
+by template id and only valid for the ``updated_at`` they were compiled
+from. Active templates are also cached by name for LOOKUP_TTL seconds,
+so sending an email does not query the template every time.
+"""
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from apps.cache.near_cache import LRUCache
+
+# Defaults for the EMAIL_TEMPLATE_CACHE setting
+EMAIL_TEMPLATE_CACHE_DEFAULTS = {
+    'MAX_TEMPLATES': 256,
+    # Seconds another process may keep using a template edited elsewhere
+    'LOOKUP_TTL': 60,
+}
+
+# Compiled templates never go stale, updated_at is checked on every hit
+COMPILED_TTL = 86400
+
+_MISSING = object()
+
+
+class EmailTemplateCache:
+    """Compiled templates by id and active templates by name.
+
+    Saves and deletes of an EmailTemplate drop its entries in the saving
+    process (see apps.emails.signals). Other processes notice a new
+    ``updated_at`` once their name lookup expires.
+    """
+
+    def __init__(self):
+        options = {**EMAIL_TEMPLATE_CACHE_DEFAULTS, **getattr(settings, 'EMAIL_TEMPLATE_CACHE', {})}
+        self.lookup_ttl = options['LOOKUP_TTL']
+        self.compiled = LRUCache(options['MAX_TEMPLATES'])
+        self.lookups = LRUCache(options['MAX_TEMPLATES'])
+
+    def compiled_for(self, template) -> Dict[str, Any]:
+        """Compiled subject, html_content and text_content of a template."""
+        if template.pk is None:
+            return template.compile()
+
+        cached = self.compiled.get(template.pk)
+        if cached is not None and cached[0] == template.updated_at:
+            return cached[1]
+
+        compiled = template.compile()
+        self.compiled.set(template.pk, (template.updated_at, compiled), COMPILED_TTL)
+        return compiled
+
+    def get_active(self, name: str):
+        """The active EmailTemplate with a name, or None.
+
+        Missing templates are cached too, as callers then fall back to
+        file templates on every send.
+        """
+        template = self.lookups.get(name, _MISSING)
+        if template is _MISSING:
+            from .models import EmailTemplate
+
+            template = EmailTemplate.objects.filter(name=name, is_active=True).first()
+            self.lookups.set(name, template, self.lookup_ttl)
+        return template
+
+    def invalidate(self, template=None):
+        """Drop the entries of a template, or of every template."""
+        # A rename or deactivation changes which name resolves to what
+        self.lookups.clear()
+        if template is None:
+            self.compiled.clear()
+        elif template.pk is not None:
+            self.compiled.delete(template.pk)
+
+    def stats(self) -> Dict[str, Optional[Dict[str, int]]]:
+        return {'compiled': self.compiled.stats(), 'lookups': self.lookups.stats()}
+
+
+# Process-wide cache used by EmailTemplate.render and EmailService
+email_template_cache = EmailTemplateCache()
@@ -0,0 +1,181 @@
+"""
+Tests for the EmailLog write path and retention.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+import gzip
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from apps.emails.logs import buffered_email_logs, serialize_context, write_email_log
+from apps.emails.models import EmailLog, EmailTemplate
+from apps.emails.services import EmailService
+
+User = get_user_model()
+
+
+def create_logs(count, days_old=0, status="sent"):
+    EmailLog.objects.bulk_create(
+        EmailLog(to_email=f"user{i}@example.com", from_email="noreply@example.com", subject="Hi", status=status)
+        for i in range(count)
+    )
+    # created_at is auto_now_add: age the rows afterwards
+    ids = EmailLog.objects.order_by("-id").values_list("id", flat=True)[:count]
+    EmailLog.objects.filter(id__in=list(ids)).update(created_at=timezone.now() - timedelta(days=days_old))
+
+
+@pytest.mark.django_db
+class TestSerializeContext:
+    """Test the context kept with an email log."""
+
+    def test_models_become_primary_keys(self):
+        """Test model instances are stored as their pk, other values as JSON."""
+        user = User.objects.create_user(email="jane@example.com", username="jane", password="testpass123")
+
+        data = serialize_context({"user": user, "price": Decimal("9.50"), "tags": ["a", "b"], "n": 3})
+
+        assert data == {"user": user.pk, "price": "9.50", "tags": ["a", "b"], "n": 3}
+
+    def test_unserializable_values_dropped(self):
+        """Test values without a JSON form are dropped and listed."""
+        data = serialize_context({"name": "Jane", "callback": object()})
+
+        assert data == {"name": "Jane", "_dropped": ["callback"]}
+
+    def test_whitelist(self, settings):
+        """Test only whitelisted keys are kept."""
+        settings.EMAIL_LOG = {"CONTEXT_KEYS": ["name"]}
+
+        assert serialize_context({"name": "Jane", "token": "secret"}) == {"name": "Jane"}
+
+    def test_size_cap(self, settings):
+        """Test keys past the size cap are dropped."""
+        settings.EMAIL_LOG = {"CONTEXT_MAX_BYTES": 100}
+
+        data = serialize_context({"name": "Jane", "body": "x" * 500, "id": 7})
+
+        assert data == {"name": "Jane", "id": 7, "_dropped": ["body"]}
+        assert len(json.dumps(data)) < 200
+
+
+@pytest.mark.django_db
+class TestBufferedLogs:
+    """Test buffering EmailLog inserts."""
+
+    def test_logs_written_in_bulk(self, django_assert_num_queries):
+        """Test logs written in a buffered block cost one insert per buffer."""
+        with django_assert_num_queries(2), buffered_email_logs(size=10) as buffer:
+            for i in range(15):
+                write_email_log(to_email=f"user{i}@example.com", from_email="noreply@example.com", status="sent")
+
+        assert buffer.written == 15
+        assert EmailLog.objects.count() == 15
+
+    def test_templated_emails_use_active_buffer(self, django_assert_num_queries):
+        """Test send_templated_email logs through the active buffer."""
+        EmailTemplate.objects.create(
+            name="digest",
+            subject="Digest",
+            html_content="<p>Hi {% raw %}{{ name }}{% endraw %}</p>",
+            text_content="Hi {% raw %}{{ name }}{% endraw %}",
+        )
+        EmailService.send_templated_email("digest", "warmup@example.com", {"name": "Warm"})
+
+        with django_assert_num_queries(1), buffered_email_logs():
+            for i in range(20):
+                EmailService.send_templated_email("digest", f"user{i}@example.com", {"name": f"User {i}"})
+
+        assert EmailLog.objects.filter(status="sent").count() == 21
+
+    def test_buffer_flushed_on_error(self):
+        """Test logs of a failing block are still written."""
+        with pytest.raises(RuntimeError), buffered_email_logs():
+            write_email_log(to_email="jane@example.com", from_email="noreply@example.com", status="sent")
+            raise RuntimeError("boom")
+
+        assert EmailLog.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestPruneEmailLogs:
+    """Test the prune_email_logs command."""
+
+    def test_deletes_old_logs_in_chunks(self, django_assert_num_queries):
+        """Test old logs go in keyset chunks and recent or pending logs stay."""
+        create_logs(5, days_old=100)
+        create_logs(2, days_old=1)
+        create_logs(1, days_old=100, status="pending")
+
+        # 3 chunks of 2 (select + delete) and the empty select
+        with django_assert_num_queries(3 * 2 + 1):
+            call_command("prune_email_logs", days=90, chunk_size=2)
+
+        assert EmailLog.objects.count() == 3
+        assert EmailLog.objects.filter(status="pending").count() == 1
+
+    def test_dry_run(self):
+        """Test a dry run deletes nothing."""
+        create_logs(3, days_old=100)
+
+        call_command("prune_email_logs", days=90, dry_run=True)
+
+        assert EmailLog.objects.count() == 3
+
+    def test_archive(self, tmp_path):
+        """Test deleted rows are archived as JSON lines."""
+        create_logs(3, days_old=100)
+        path = tmp_path / "email_logs.jsonl.gz"
+
+        call_command("prune_email_logs", days=90, archive=str(path))
+
+        with gzip.open(path, "rt") as archive:
+            rows = [json.loads(line) for line in archive]
+        assert sorted(row["to_email"] for row in rows) == [
+            "user0@example.com", "user1@example.com", "user2@example.com",
+        ]
+        assert EmailLog.objects.count() == 0
+{% else -%}
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.emails.logs import buffered_email_logs, serialize_context, write_email_log
+from apps.emails.models import EmailLog
+
+
+class TestEmailLogs(TestCase):
+    """Test the EmailLog write path and retention."""
+
+    def test_unserializable_values_dropped(self):
+        """Test values without a JSON form are dropped and listed."""
+        data = serialize_context({"name": "Jane", "callback": object()})
+
+        self.assertEqual(data, {"name": "Jane", "_dropped": ["callback"]})
+
+    def test_logs_written_in_bulk(self):
+        """Test logs written in a buffered block cost one insert per buffer."""
+        with self.assertNumQueries(2), buffered_email_logs(size=10):
+            for i in range(15):
+                write_email_log(to_email=f"user{i}@example.com", from_email="noreply@example.com", status="sent")
+
+        self.assertEqual(EmailLog.objects.count(), 15)
+
+    def test_prune_old_logs(self):
+        """Test logs older than the retention period are deleted."""
+        for i in range(3):
+            write_email_log(to_email=f"user{i}@example.com", from_email="noreply@example.com", status="sent")
+        EmailLog.objects.filter(to_email="user0@example.com").update(
+            created_at=timezone.now() - timedelta(days=100)
+        )
+
+        call_command("prune_email_logs", days=90, chunk_size=1)
+
+        self.assertEqual(EmailLog.objects.count(), 2)
+{%- endif %}
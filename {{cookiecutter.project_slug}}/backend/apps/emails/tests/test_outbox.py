@@ -0,0 +1,263 @@
+"""
+Tests for the transactional email outbox.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.utils import timezone
+
+from apps.emails import outbox
+from apps.emails.models import EmailLog, EmailTemplate
+from apps.emails.outbox import OutboxDispatcher, dispatch_outbox, enqueue_email
+from apps.emails.services import send_welcome_email
+from apps.emails.template_cache import email_template_cache
+from apps.users.tasks import queue_user_email
+
+User = get_user_model()
+
+
+def create_user(username="jane", email="jane@example.com"):
+    return User.objects.create_user(email=email, username=username, password="testpass123")
+
+
+def queue(count):
+    return [
+        enqueue_email(f"user{i}@example.com", f"Subject {i}", f"Body {i}", f"<p>Body {i}</p>")
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+class TestEnqueue:
+    """Test queueing emails in the outbox."""
+
+    def test_enqueue_writes_pending_row(self):
+        """Test a queued email is stored rendered, due now and unsent."""
+        mail.outbox = []
+
+        log = enqueue_email("jane@example.com", "Hello", "Hi Jane", "<p>Hi Jane</p>")
+
+        log.refresh_from_db()
+        assert (log.status, log.attempts) == ("pending", 0)
+        assert (log.text_body, log.html_body) == ("Hi Jane", "<p>Hi Jane</p>")
+        assert log.next_attempt_at <= timezone.now()
+        assert mail.outbox == []
+
+    def test_dispatcher_notified_on_commit(self, monkeypatch, django_capture_on_commit_callbacks):
+        """Test the dispatcher only hears about an email once its transaction commits."""
+        notified = []
+        monkeypatch.setattr(outbox, "notify_dispatcher", lambda: notified.append(True))
+
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            enqueue_email("jane@example.com", "Hello", "Hi Jane")
+            assert notified == []
+
+        for callback in callbacks:
+            callback()
+        assert notified == [True]
+
+    def test_queue_user_email_renders_now(self):
+        """Test user emails are rendered in the request and queued, not sent."""
+        user = create_user()
+        mail.outbox = []
+
+        assert queue_user_email(user, "verification", verification_url="https://example.com/verify/abc")
+
+        log = EmailLog.objects.get(user=user)
+        assert log.status == "pending"
+        assert log.subject == "Verify your email address"
+        assert "https://example.com/verify/abc" in log.text_body
+        assert log.context_data == {"email_type": "verification"}
+        assert mail.outbox == []
+
+    def test_convenience_function_serializes_context(self):
+        """Test the queued context keeps the user as its primary key."""
+        EmailTemplate.objects.create(
+            name="welcome",
+            subject="Welcome {% raw %}{{ username }}{% endraw %}",
+            html_content="<p>Hi {% raw %}{{ user.email }}{% endraw %}</p>",
+            text_content="Hi {% raw %}{{ user.email }}{% endraw %}",
+        )
+        user = create_user()
+
+        log = send_welcome_email(user)
+
+        log.refresh_from_db()
+        assert log.subject == "Welcome jane"
+        assert log.text_body == "Hi jane@example.com"
+        assert log.context_data == {"user": user.pk, "username": "jane", "email": "jane@example.com"}
+
+    def test_convenience_function_without_outbox_sends_on_commit(self, settings, django_capture_on_commit_callbacks):
+        """Test templated emails asked for in a transaction are sent once it commits."""
+        settings.EMAIL_OUTBOX = {"ENABLED": False}
+        email_template_cache.invalidate()
+        EmailTemplate.objects.create(name="welcome", subject="Welcome", html_content="<p>Hi</p>", text_content="Hi")
+        user = create_user()
+        mail.outbox = []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            send_welcome_email(user)
+            assert mail.outbox == []
+
+        assert [message.to for message in mail.outbox] == [["jane@example.com"]]
+
+    def test_disabled_outbox_sends_on_commit(self, settings, django_capture_on_commit_callbacks):
+        """Test user emails are sent directly, once committed, when the outbox is off."""
+        settings.EMAIL_OUTBOX = {"ENABLED": False}
+        user = create_user()
+        mail.outbox = []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert queue_user_email(user, "welcome")
+            assert mail.outbox == []
+
+        assert len(mail.outbox) == 1
+        assert not EmailLog.objects.filter(status="pending").exists()
+
+
+@pytest.mark.django_db
+class TestDispatcher:
+    """Test draining the outbox."""
+
+    def test_dispatch_sends_and_marks_sent(self):
+        """Test due emails are sent once and marked sent."""
+        queue(3)
+        mail.outbox = []
+
+        result = dispatch_outbox()
+
+        assert result == {"sent": 3, "retried": 0, "failed": 0}
+        assert sorted(message.to[0] for message in mail.outbox) == [
+            "user0@example.com", "user1@example.com", "user2@example.com",
+        ]
+        assert mail.outbox[0].alternatives[0][1] == "text/html"
+        assert EmailLog.objects.filter(status="sent", attempts=1, sent_at__isnull=False).count() == 3
+
+        assert dispatch_outbox() == {"sent": 0, "retried": 0, "failed": 0}
+        assert len(mail.outbox) == 3
+
+    def test_sends_outside_the_claim_transaction(self, monkeypatch):
+        """Test emails are claimed and committed before the SMTP server is contacted."""
+        depth = len(connection.savepoint_ids)
+        original_send = EmailBackend.send_messages
+        seen = []
+
+        def send_messages(self, messages):
+            due = EmailLog.objects.filter(status="pending", next_attempt_at__lte=timezone.now()).count()
+            seen.append((len(connection.savepoint_ids), due))
+            return original_send(self, messages)
+
+        monkeypatch.setattr(EmailBackend, "send_messages", send_messages)
+        queue(2)
+
+        assert dispatch_outbox()["sent"] == 2
+        # No open claim transaction, and the claimed rows are leased
+        assert seen == [(depth, 0), (depth, 0)]
+
+    def test_expired_lease_stops_the_batch(self, settings):
+        """Test a dispatcher past its lease leaves the rest of its batch alone."""
+        settings.EMAIL_OUTBOX = {"LEASE_SECONDS": 0}
+        queue(2)
+        mail.outbox = []
+
+        assert dispatch_outbox() == {"sent": 0, "retried": 0, "failed": 0}
+        assert mail.outbox == []
+        assert EmailLog.objects.filter(status="pending", attempts=0).count() == 2
+
+    def test_emails_not_due_are_skipped(self):
+        """Test emails waiting for a retry are left alone."""
+        log = enqueue_email("jane@example.com", "Hello", "Hi Jane")
+        EmailLog.objects.filter(pk=log.pk).update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        mail.outbox = []
+
+        assert dispatch_outbox()["sent"] == 0
+        assert mail.outbox == []
+
+    def test_one_connection_for_all_batches(self, monkeypatch):
+        """Test a drain opens one SMTP connection, however many batches it sends."""
+        opened = []
+        original_open = EmailBackend.open
+
+        def track_open(self):
+            opened.append(self)
+            return original_open(self)
+
+        monkeypatch.setattr(EmailBackend, "open", track_open)
+        queue(25)
+
+        result = OutboxDispatcher(batch_size=10).drain()
+
+        assert result["sent"] == 25
+        assert len(opened) == 1
+
+    def test_failed_send_retried_with_backoff(self, monkeypatch, settings):
+        """Test a failed email is pushed back with a growing delay."""
+        settings.EMAIL_OUTBOX = {"BACKOFF_SECONDS": 60}
+        original_send = EmailBackend.send_messages
+
+        def send_messages(self, messages):
+            if messages[0].to == ["user1@example.com"]:
+                raise ConnectionError("Connection refused")
+            return original_send(self, messages)
+
+        monkeypatch.setattr(EmailBackend, "send_messages", send_messages)
+        queue(3)
+
+        result = dispatch_outbox()
+
+        assert result == {"sent": 2, "retried": 1, "failed": 0}
+        log = EmailLog.objects.get(to_email="user1@example.com")
+        assert (log.status, log.attempts, log.error_message) == ("pending", 1, "Connection refused")
+        delay = (log.next_attempt_at - timezone.now()).total_seconds()
+        assert 40 < delay < 80
+
+        EmailLog.objects.filter(pk=log.pk).update(next_attempt_at=timezone.now())
+        dispatch_outbox()
+        log.refresh_from_db()
+        delay = (log.next_attempt_at - timezone.now()).total_seconds()
+        assert log.attempts == 2
+        assert 90 < delay < 150
+
+    def test_gives_up_after_max_attempts(self, monkeypatch, settings):
+        """Test an email that keeps failing is marked failed."""
+        settings.EMAIL_OUTBOX = {"MAX_ATTEMPTS": 2}
+
+        def send_messages(self, messages):
+            raise ConnectionError("Connection refused")
+
+        monkeypatch.setattr(EmailBackend, "send_messages", send_messages)
+        log = enqueue_email("jane@example.com", "Hello", "Hi Jane")
+
+        assert dispatch_outbox()["retried"] == 1
+        EmailLog.objects.filter(pk=log.pk).update(next_attempt_at=timezone.now())
+        assert dispatch_outbox()["failed"] == 1
+
+        log.refresh_from_db()
+        assert (log.status, log.attempts) == ("failed", 2)
+{% else -%}
+from django.core import mail
+from django.test import TestCase
+
+from apps.emails.models import EmailLog
+from apps.emails.outbox import dispatch_outbox, enqueue_email
+
+
+class TestOutbox(TestCase):
+    """Test the transactional email outbox."""
+
+    def test_queued_email_sent_by_dispatcher(self):
+        """Test a queued email waits in the outbox until dispatched."""
+        enqueue_email("jane@example.com", "Hello", "Hi Jane", "<p>Hi Jane</p>")
+        self.assertEqual(len(mail.outbox), 0)
+
+        result = dispatch_outbox()
+
+        self.assertEqual(result, {"sent": 1, "retried": 0, "failed": 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(EmailLog.objects.get().status, "sent")
+{%- endif %}
@@ -0,0 +1,128 @@
+"""
+Tests for the email service.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+
+from apps.emails import services
+from apps.emails.models import EmailLog, EmailTemplate
+from apps.emails.services import EmailService
+
+
+@pytest.fixture
+def newsletter(db):
+    return EmailTemplate.objects.create(
+        name="newsletter",
+        template_type="newsletter",
+        subject="News for {% raw %}{{ name }}{% endraw %}",
+        html_content="<p>Hi {% raw %}{{ name }}{% endraw %}</p>",
+        text_content="Hi {% raw %}{{ name }}{% endraw %}",
+    )
+
+
+def recipients(count):
+    return [{"email": f"user{i}@example.com", "context": {"name": f"User {i}"}} for i in range(count)]
+
+
+@pytest.mark.django_db
+class TestBulkEmails:
+    """Test the bulk email pipeline."""
+
+    def test_sends_and_logs_every_recipient(self, newsletter):
+        """Test each recipient gets a personalized email and a log row."""
+        mail.outbox = []
+
+        result = EmailService.send_bulk_emails("newsletter", recipients(120), batch_size=50)
+
+        assert result["success_count"] == 120
+        assert result["failed_emails"] == []
+        assert len(mail.outbox) == 120
+        assert mail.outbox[7].subject == "News for User 7"
+        assert EmailLog.objects.filter(status="sent", template=newsletter).count() == 120
+
+    def test_template_fetched_once_and_logs_bulk_inserted(self, newsletter, django_assert_num_queries):
+        """Test one template query, then one insert per batch."""
+        with django_assert_num_queries(1 + 3):
+            EmailService.send_bulk_emails("newsletter", recipients(120), batch_size=50)
+
+    def test_one_connection_per_batch(self, newsletter, monkeypatch):
+        """Test batches reuse one connection for all their messages."""
+        opened = []
+        original_open = EmailBackend.open
+
+        def track_open(self):
+            opened.append(self)
+            return original_open(self)
+
+        monkeypatch.setattr(EmailBackend, "open", track_open)
+
+        EmailService.send_bulk_emails("newsletter", recipients(120), batch_size=50)
+
+        assert len(opened) == 3
+
+    def test_rejected_recipient_fails_alone(self, newsletter, monkeypatch):
+        """Test a refused message doesn't fail the rest of its batch."""
+        original_send = EmailBackend.send_messages
+
+        def send_messages(self, messages):
+            if messages[0].to == ["user3@example.com"]:
+                raise ValueError("Recipient refused")
+            return original_send(self, messages)
+
+        monkeypatch.setattr(EmailBackend, "send_messages", send_messages)
+
+        result = EmailService.send_bulk_emails("newsletter", recipients(10))
+
+        assert result["success_count"] == 9
+        assert result["failed_emails"] == ["user3@example.com"]
+        log = EmailLog.objects.get(to_email="user3@example.com")
+        assert (log.status, log.error_message) == ("failed", "Recipient refused")
+
+    def test_batches_fan_out_to_celery(self, newsletter, monkeypatch):
+        """Test batches are queued instead of sent when Celery is enabled."""
+        queued = []
+
+        class Task:
+            @staticmethod
+            def delay(*args):
+                queued.append(args)
+
+        monkeypatch.setattr(services, "celery_enabled", lambda: True)
+        monkeypatch.setattr(services, "send_email_batch", Task)
+        mail.outbox = []
+
+        result = EmailService.send_bulk_emails("newsletter", recipients(120), batch_size=50)
+
+        assert result["queued_batches"] == 3
+        assert [len(args[1]) for args in queued] == [50, 50, 20]
+        assert mail.outbox == []
+{% else -%}
+from django.core import mail
+from django.test import TestCase
+
+from apps.emails.models import EmailLog, EmailTemplate
+from apps.emails.services import EmailService
+
+
+class TestBulkEmails(TestCase):
+    """Test the bulk email pipeline."""
+
+    def test_sends_and_logs_every_recipient(self):
+        """Test each recipient gets a personalized email and a log row."""
+        EmailTemplate.objects.create(
+            name="newsletter",
+            subject="News for {% raw %}{{ name }}{% endraw %}",
+            html_content="<p>Hi {% raw %}{{ name }}{% endraw %}</p>",
+            text_content="Hi {% raw %}{{ name }}{% endraw %}",
+        )
+        recipients = [{"email": f"user{i}@example.com", "context": {"name": f"User {i}"}} for i in range(60)]
+
+        with self.assertNumQueries(1 + 2):
+            result = EmailService.send_bulk_emails("newsletter", recipients, batch_size=50)
+
+        self.assertEqual(result["success_count"], 60)
+        self.assertEqual(len(mail.outbox), 60)
+        self.assertEqual(EmailLog.objects.filter(status="sent").count(), 60)
+{%- endif %}
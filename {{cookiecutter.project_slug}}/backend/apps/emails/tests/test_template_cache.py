@@ -0,0 +1,95 @@
+"""
+Tests for the compiled email template cache.
+"""
+{% if cookiecutter.use_pytest == 'y' -%}
+import pytest
+from django.core import mail
+
+from apps.emails.models import EmailTemplate
+from apps.emails.services import EmailService
+from apps.emails.template_cache import email_template_cache
+
+
+@pytest.fixture
+def welcome(db):
+    email_template_cache.invalidate()
+    return EmailTemplate.objects.create(
+        name="welcome",
+        subject="Welcome {% raw %}{{ name }}{% endraw %}",
+        html_content="<p>Hi {% raw %}{{ name }}{% endraw %}</p>",
+        text_content="Hi {% raw %}{{ name }}{% endraw %}",
+    )
+
+
+@pytest.mark.django_db
+class TestEmailTemplateCache:
+    """Test compiled templates and lookups are cached and invalidated."""
+
+    def test_templates_compiled_once(self, welcome, monkeypatch):
+        """Test repeated renders reuse the compiled templates."""
+        compiles = []
+        original_compile = EmailTemplate.compile
+        monkeypatch.setattr(EmailTemplate, "compile", lambda self: compiles.append(self.pk) or original_compile(self))
+
+        for name in ("Ann", "Bob", "Cy"):
+            assert welcome.render({"name": name})["subject"] == f"Welcome {name}"
+
+        assert compiles == [welcome.pk]
+
+    def test_save_invalidates_compiled_template(self, welcome):
+        """Test an edited template renders its new content."""
+        welcome.render({"name": "Ann"})
+
+        welcome.subject = "Hello {% raw %}{{ name }}{% endraw %}"
+        welcome.save()
+
+        assert welcome.render({"name": "Ann"})["subject"] == "Hello Ann"
+
+    def test_lookups_cached_until_saved(self, welcome, django_assert_num_queries):
+        """Test sending doesn't query the template again, until it changes."""
+        EmailService.send_templated_email("welcome", "a@example.com", {"name": "Ann"}, log_email=False)
+
+        with django_assert_num_queries(0):
+            EmailService.send_templated_email("welcome", "b@example.com", {"name": "Bob"}, log_email=False)
+
+        welcome.subject = "Hello {% raw %}{{ name }}{% endraw %}"
+        welcome.save()
+        mail.outbox = []
+        EmailService.send_templated_email("welcome", "c@example.com", {"name": "Cy"}, log_email=False)
+
+        assert mail.outbox[0].subject == "Hello Cy"
+
+    def test_deactivated_template_is_not_used(self, welcome):
+        """Test a deactivated template stops resolving by name."""
+        assert email_template_cache.get_active("welcome") == welcome
+
+        welcome.is_active = False
+        welcome.save()
+
+        assert email_template_cache.get_active("welcome") is None
+{% else -%}
+from django.test import TestCase
+
+from apps.emails.models import EmailTemplate
+from apps.emails.template_cache import email_template_cache
+
+
+class TestEmailTemplateCache(TestCase):
+    """Test compiled templates and lookups are cached and invalidated."""
+
+    def test_save_invalidates_compiled_template(self):
+        """Test an edited template renders its new content."""
+        email_template_cache.invalidate()
+        template = EmailTemplate.objects.create(
+            name="welcome",
+            subject="Welcome {% raw %}{{ name }}{% endraw %}",
+            html_content="<p>Hi</p>",
+            text_content="Hi",
+        )
+        self.assertEqual(template.render({"name": "Ann"})["subject"], "Welcome Ann")
+
+        template.subject = "Hello {% raw %}{{ name }}{% endraw %}"
+        template.save()
+
+        self.assertEqual(template.render({"name": "Ann"})["subject"], "Hello Ann")
+{%- endif %}
@@ -6,6 +6,7 @@ from typing import Optional, List
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
 from strawberry.types import Info
@@ -94,22 +95,23 @@ class AuthMutations:
         if len(input.password) < 8:
             raise Exception("Password must be at least 8 characters")
         
-        # Create user
-        user = User.objects.create_user(
-            email=input.email,
-            username=input.username,
-            password=input.password,
-            first_name=input.first_name or '',
-            last_name=input.last_name or ''
-        )
-        
-        # Send welcome email if configured
-        if getattr(settings, 'SEND_WELCOME_EMAIL', True):
-            try:
-                from apps.emails.services import send_welcome_email
-                send_welcome_email(user)
-            except ImportError:
-                pass
+        # Create user, committed together with its queued welcome email
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email=input.email,
+                username=input.username,
+                password=input.password,
+                first_name=input.first_name or '',
+                last_name=input.last_name or ''
+            )
+            
+            # Send welcome email if configured
+            if getattr(settings, 'SEND_WELCOME_EMAIL', True):
+                try:
+                    from apps.emails.services import send_welcome_email
+                    send_welcome_email(user)
+                except ImportError:
+                    pass
         
         return AuthPayload(
             user=user,
@@ -0,0 +1,65 @@
+"""Strawberry schema extensions."""
+from typing import Any, Dict
+
+from strawberry.extensions import SchemaExtension
+
+from apps.core.queries import QueryCounter, check_query_budget, query_budget_options
+
+
+class QueryBudgetExtension(SchemaExtension):
+    """Keep the SQL queries of each GraphQL operation within budget.
+
+    One HTTP route serves every operation, so budgets are looked up per
+    operation as ``graphql:<root fields>``, e.g. ``graphql:users`` or
+    ``graphql:me,userCount``. With SERVER_TIMING on, the counts are also
+    returned under ``extensions.queries`` of the response.
+
+    Only queries run on the executing thread are counted, which covers
+    the sync GraphQL views used here.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = None
+
+    def on_operation(self):
+        options = query_budget_options()
+        if not options['ENABLED']:
+            yield
+            return
+
+        self.queries = QueryCounter()
+        with self.queries.track():
+            yield
+
+        check_query_budget(f"graphql:{self.operation_key()}", self.queries)
+
+    def operation_key(self) -> str:
+        """Root fields of the executed operation, or its name."""
+        document = self.execution_context.graphql_document
+        if document is not None:
+            for definition in document.definitions:
+                selection_set = getattr(definition, 'selection_set', None)
+                if selection_set is None:
+                    continue
+                fields = sorted(
+                    selection.name.value
+                    for selection in selection_set.selections
+                    if hasattr(selection, 'name') and not selection.name.value.startswith('__')
+                )
+                if fields:
+                    return ','.join(fields)
+        return self.execution_context.operation_name or 'anonymous'
+
+    def get_results(self) -> Dict[str, Any]:
+        if self.queries is None or not query_budget_options()['SERVER_TIMING']:
+            return {}
+        return {
+            'queries': {
+                'count': self.queries.count,
+                'db_ms': round(self.queries.time * 1000, 1),
+                'duplicates': [
+                    {'sql': shape, 'count': amount} for shape, amount in self.queries.duplicates()
+                ],
+            },
+        }
@@ -6,6 +6,7 @@ from django.contrib.auth import get_user_model
 from django.db.models import Q
 from strawberry.types import Info
 
+from apps.graphql.extensions import QueryBudgetExtension
 from apps.graphql.types import UserType, UserInput, MutationResult
 from apps.graphql.auth import AuthMutations, login_required
 
@@ -158,6 +159,6 @@ schema = strawberry.Schema(
     query=Query,
     mutation=Mutation,
     extensions=[
-        # Add any Strawberry extensions here
+        QueryBudgetExtension,
     ]
 )
\ No newline at end of file
@@ -3,11 +3,13 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 
+from apps.core.admin import LargeTableAdminMixin
+
 from .models import User
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
     """Enhanced admin interface for User model."""
     
     list_display = [
@@ -30,6 +32,9 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ["username", "email", "first_name", "last_name", "phone_number"]
     ordering = ["-created_at"]
     date_hierarchy = "created_at"
+    # On large tables: keyset paging and prefix search on the unique indexes
+    cursor_pagination_field = "created_at"
+    prefix_search_fields = ["email", "username"]
     
     fieldsets = (
         (None, {"fields": ("username", "password")}),
@@ -88,11 +93,6 @@ class UserAdmin(BaseUserAdmin):
         )
     is_verified_badge.short_description = _("Verified")
     
-    def get_queryset(self, request):
-        """Optimize queryset with prefetch_related for ManyToMany fields."""
-        qs = super().get_queryset(request)
-        return qs.prefetch_related("groups", "user_permissions")
-    
     actions = ["verify_users", "unverify_users"]
     
     def verify_users(self, request, queryset):
@@ -4,7 +4,7 @@ Gracefully handles both Celery and synchronous execution.
 """
 import logging
 import os
-from typing import Optional
+from typing import Optional, Tuple
 
 from django.conf import settings
 from django.core.mail import send_mail
@@ -41,6 +41,123 @@ def task_decorator(func):
     return func
 
 
+def build_welcome_email(user) -> Tuple[str, str, Optional[str]]:
+    """
+    Render the welcome email of a user.
+    
+    Returns:
+        tuple: Subject, plain text message and HTML message (or None)
+    """
+    context = {
+        "user": user,
+        "project_name": "{{ cookiecutter.project_name }}",
+        "domain": getattr(settings, "DOMAIN_NAME", "{{ cookiecutter.domain_name }}"),
+        "protocol": "https" if not settings.DEBUG else "http",
+    }
+    
+    subject = f"Welcome to {{ cookiecutter.project_name }}, {user.get_short_name()}!"
+    
+    # Try to use HTML template if it exists
+    try:
+        html_message = render_to_string("emails/users/welcome.html", context)
+        plain_message = strip_tags(html_message)
+    except Exception:
+        # Fallback to plain text
+        plain_message = f"""
+        Hi {user.get_short_name()},
+        
+        Welcome to {{ cookiecutter.project_name }}! We're excited to have you on board.
+        
+        Your account has been successfully created with the email: {user.email}
+        
+        Please log in to start exploring our features.
+        
+        If you have any questions, feel free to reach out to our support team.
+        
+        Best regards,
+        The {{ cookiecutter.project_name }} Team
+        """
+        html_message = None
+    
+    return subject, plain_message, html_message
+
+
+def build_verification_email(user, verification_url: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Render the email verification email of a user.
+    
+    Returns:
+        tuple: Subject, plain text message and HTML message (or None)
+    """
+    context = {
+        "user": user,
+        "verification_url": verification_url,
+        "project_name": "{{ cookiecutter.project_name }}",
+    }
+    
+    subject = "Verify your email address"
+    
+    try:
+        html_message = render_to_string("emails/users/verify_email.html", context)
+        plain_message = strip_tags(html_message)
+    except Exception:
+        plain_message = f"""
+        Hi {user.get_short_name()},
+        
+        Please verify your email address by clicking the link below:
+        
+        {verification_url}
+        
+        This link will expire in 24 hours.
+        
+        If you didn't create an account, please ignore this email.
+        
+        Best regards,
+        The {{ cookiecutter.project_name }} Team
+        """
+        html_message = None
+    
+    return subject, plain_message, html_message
+
+
+def build_password_reset_email(user, reset_url: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Render the password reset email of a user.
+    
+    Returns:
+        tuple: Subject, plain text message and HTML message (or None)
+    """
+    context = {
+        "user": user,
+        "reset_url": reset_url,
+        "project_name": "{{ cookiecutter.project_name }}",
+    }
+    
+    subject = "Reset your password"
+    
+    try:
+        html_message = render_to_string("emails/users/password_reset.html", context)
+        plain_message = strip_tags(html_message)
+    except Exception:
+        plain_message = f"""
+        Hi {user.get_short_name()},
+        
+        We received a request to reset your password. Click the link below to set a new password:
+        
+        {reset_url}
+        
+        This link will expire in 1 hour.
+        
+        If you didn't request a password reset, please ignore this email.
+        
+        Best regards,
+        The {{ cookiecutter.project_name }} Team
+        """
+        html_message = None
+    
+    return subject, plain_message, html_message
+
+
 @task_decorator
 def send_welcome_email(self=None, user_id: int = None) -> bool:
     """
@@ -62,38 +179,7 @@ def send_welcome_email(self=None, user_id: int = None) -> bool:
     try:
         user = User.objects.get(id=user_id)
         
-        # Prepare email context
-        context = {
-            "user": user,
-            "project_name": "{{ cookiecutter.project_name }}",
-            "domain": getattr(settings, "DOMAIN_NAME", "{{ cookiecutter.domain_name }}"),
-            "protocol": "https" if not settings.DEBUG else "http",
-        }
-        
-        # Render email templates (we'll create these next)
-        subject = f"Welcome to {{ cookiecutter.project_name }}, {user.get_short_name()}!"
-        
-        # Try to use HTML template if it exists
-        try:
-            html_message = render_to_string("emails/users/welcome.html", context)
-            plain_message = strip_tags(html_message)
-        except Exception:
-            # Fallback to plain text
-            plain_message = f"""
-            Hi {user.get_short_name()},
-            
-            Welcome to {{ cookiecutter.project_name }}! We're excited to have you on board.
-            
-            Your account has been successfully created with the email: {user.email}
-            
-            Please log in to start exploring our features.
-            
-            If you have any questions, feel free to reach out to our support team.
-            
-            Best regards,
-            The {{ cookiecutter.project_name }} Team
-            """
-            html_message = None
+        subject, plain_message, html_message = build_welcome_email(user)
         
         # Send email
         send_mail(
@@ -143,33 +229,7 @@ def send_verification_email(self=None, user_id: int = None, verification_url: st
             logger.info(f"User {user.email} is already verified")
             return True
         
-        context = {
-            "user": user,
-            "verification_url": verification_url,
-            "project_name": "{{ cookiecutter.project_name }}",
-        }
-        
-        subject = "Verify your email address"
-        
-        try:
-            html_message = render_to_string("emails/users/verify_email.html", context)
-            plain_message = strip_tags(html_message)
-        except Exception:
-            plain_message = f"""
-            Hi {user.get_short_name()},
-            
-            Please verify your email address by clicking the link below:
-            
-            {verification_url}
-            
-            This link will expire in 24 hours.
-            
-            If you didn't create an account, please ignore this email.
-            
-            Best regards,
-            The {{ cookiecutter.project_name }} Team
-            """
-            html_message = None
+        subject, plain_message, html_message = build_verification_email(user, verification_url)
         
         send_mail(
             subject=subject,
@@ -213,33 +273,7 @@ def send_password_reset_email(self=None, user_id: int = None, reset_url: str = N
     try:
         user = User.objects.get(id=user_id)
         
-        context = {
-            "user": user,
-            "reset_url": reset_url,
-            "project_name": "{{ cookiecutter.project_name }}",
-        }
-        
-        subject = "Reset your password"
-        
-        try:
-            html_message = render_to_string("emails/users/password_reset.html", context)
-            plain_message = strip_tags(html_message)
-        except Exception:
-            plain_message = f"""
-            Hi {user.get_short_name()},
-            
-            We received a request to reset your password. Click the link below to set a new password:
-            
-            {reset_url}
-            
-            This link will expire in 1 hour.
-            
-            If you didn't request a password reset, please ignore this email.
-            
-            Best regards,
-            The {{ cookiecutter.project_name }} Team
-            """
-            html_message = None
+        subject, plain_message, html_message = build_password_reset_email(user, reset_url)
         
         send_mail(
             subject=subject,
@@ -326,4 +360,58 @@ def send_email_task(user_id: int, email_type: str = "welcome", **kwargs) -> bool
     {% else -%}
     # Execute synchronously (Celery not configured)
     return email_func(user_id=user_id, **kwargs)
-    {%- endif %}
\ No newline at end of file
+    {%- endif %}
+
+
+def queue_user_email(user, email_type: str = "welcome", **kwargs) -> bool:
+    """
+    Queue an email to a user in the transactional outbox.
+    
+    The email is rendered now and written in the current transaction, so it
+    is only sent once that transaction commits, and the request never waits
+    for the SMTP server. Without the outbox (apps.emails not installed or
+    EMAIL_OUTBOX['ENABLED'] off) this falls back to send_email_task, run
+    once the current transaction commits: a Celery worker must not look
+    up a user that is not committed yet.
+    
+    Args:
+        user: User to send email to
+        email_type: Type of email to send ('welcome', 'verification', 'password_reset')
+        **kwargs: Additional arguments for specific email types
+        
+    Returns:
+        bool: True if email was queued successfully (or, outside a
+        transaction, sent or handed to Celery)
+    """
+    from django.db import transaction
+    from apps.emails.outbox import enqueue_email, outbox_enabled
+    
+    if not outbox_enabled():
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(
+                lambda: send_email_task(user_id=user.id, email_type=email_type, **kwargs)
+            )
+            return True
+        return bool(send_email_task(user_id=user.id, email_type=email_type, **kwargs))
+    
+    email_builders = {
+        "welcome": build_welcome_email,
+        "verification": build_verification_email,
+        "password_reset": build_password_reset_email,
+    }
+    
+    if email_type not in email_builders:
+        logger.error(f"Unknown email type: {email_type}")
+        return False
+    
+    subject, plain_message, html_message = email_builders[email_type](user, **kwargs)
+    enqueue_email(
+        to_email=user.email,
+        subject=subject,
+        text_body=plain_message,
+        html_body=html_message or "",
+        user=user,
+        context_data={"email_type": email_type},
+    )
+    logger.info(f"Queued {email_type} email for {user.email}")
+    return True
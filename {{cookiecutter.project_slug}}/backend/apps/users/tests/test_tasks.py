@@ -3,10 +3,12 @@ Tests for user tasks.
 """
 {% if cookiecutter.use_pytest == 'y' -%}
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 from django.core import mail
 from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory
 
+from apps.api.views.auth import RegisterView
 from apps.users.tasks import (
     send_welcome_email,
     send_verification_email,
@@ -171,11 +173,38 @@ class TestEmailTasks:
         
         result = send_welcome_email(user_id=user.id)
         assert result is False
+    
+    @patch('apps.users.tasks.send_email_task')
+    def test_registration_email_waits_for_commit(self, mock_send_email_task, settings, django_capture_on_commit_callbacks):
+        """Test the verification email of a new user is only handed off once the user is committed."""
+        settings.EMAIL_OUTBOX = {"ENABLED": False}
+        request = APIRequestFactory().post("/api/auth/register/", {
+            "username": "newuser",
+            "email": "new@example.com",
+            "password": "Str0ng-pass-123",
+            "password2": "Str0ng-pass-123",
+        }, format="json")
+        
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            response = RegisterView.as_view()(request)
+            assert response.status_code == 201
+            mock_send_email_task.assert_not_called()
+        
+        for callback in callbacks:
+            callback()
+        user = User.objects.get(email="new@example.com")
+        mock_send_email_task.assert_called_once_with(
+            user_id=user.id, email_type="verification", verification_url=ANY
+        )
 {% else -%}
-from django.test import TestCase
+from unittest.mock import ANY, patch
+
+from django.test import TestCase, override_settings
 from django.core import mail
 from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory
 
+from apps.api.views.auth import RegisterView
 from apps.users.tasks import (
     send_welcome_email,
     send_email_task,
@@ -220,4 +249,27 @@ class TestEmailTasks(TestCase):
         
         self.assertTrue(result)
         self.assertEqual(len(mail.outbox), 1)
+    
+    @override_settings(EMAIL_OUTBOX={"ENABLED": False})
+    @patch('apps.users.tasks.send_email_task')
+    def test_registration_email_waits_for_commit(self, mock_send_email_task):
+        """Test the verification email of a new user is only handed off once the user is committed."""
+        request = APIRequestFactory().post("/api/auth/register/", {
+            "username": "newuser",
+            "email": "new@example.com",
+            "password": "Str0ng-pass-123",
+            "password2": "Str0ng-pass-123",
+        }, format="json")
+        
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = RegisterView.as_view()(request)
+            self.assertEqual(response.status_code, 201)
+            mock_send_email_task.assert_not_called()
+        
+        for callback in callbacks:
+            callback()
+        user = User.objects.get(email="new@example.com")
+        mock_send_email_task.assert_called_once_with(
+            user_id=user.id, email_type="verification", verification_url=ANY
+        )
 {%- endif %}
\ No newline at end of file
@@ -83,7 +83,7 @@ def send_verification_email_to_user(user: User, request=None) -> bool:
     Returns:
         bool: True if email was queued/sent successfully
     """
-    from .tasks import send_email_task
+    from .tasks import queue_user_email
     
     if user.is_verified:
         return True
@@ -105,11 +105,9 @@ def send_verification_email_to_user(user: User, request=None) -> bool:
     # Point to the frontend route for email verification
     verification_url = f"{frontend_url}/auth/verify-email-done/{uid}/{token}"
     
-    # Send email (will use Celery if available)
-    result = send_email_task(
-        user_id=user.id,
+    # Queue in the email outbox (falls back to sending via Celery if available)
+    return queue_user_email(
+        user,
         email_type="verification",
         verification_url=verification_url
-    )
-    
-    return bool(result)
\ No newline at end of file
+    )
\ No newline at end of file
@@ -120,6 +120,7 @@ MIDDLEWARE = [
     {%- endif %}
     # Custom middleware
     'apps.core.middleware.APIMetricsMiddleware',
+    'apps.core.middleware.QueryBudgetMiddleware',
     'apps.core.middleware.HealthCheckMiddleware',
 ]
 
@@ -313,6 +314,141 @@ CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 600  # 10 minutes
 CACHE_MIDDLEWARE_KEY_PREFIX = '{{ cookiecutter.project_slug }}_cache'
 
+# Models whose saves/deletes invalidate QuerySetCache entries (apps.cache.registry)
+# e.g. ['users.User']
+CACHE_INVALIDATION_MODELS = []
+
+# Per-namespace hit/miss/latency metrics of CacheService (apps.cache.metrics),
+# flushed to Redis every FLUSH_INTERVAL seconds; see /api/health/cache/
+CACHE_METRICS = {
+    'ENABLED': config('CACHE_METRICS_ENABLED', default=True, cast=bool),
+    'FLUSH_INTERVAL': 10,
+    # Fraction of sets whose value is pickled again to measure its size
+    'SIZE_SAMPLE_RATE': 0.01,
+}
+
+# Sampled top-K of anonymous API GETs (apps.cache.traffic), fed by
+# APIMetricsMiddleware and replayed by cache_warm --from-traffic
+TRAFFIC_TRACKER = {
+    'ENABLED': config('TRAFFIC_TRACKER_ENABLED', default=True, cast=bool),
+    'SAMPLE_RATE': 0.1,
+    'FLUSH_INTERVAL': 10,
+    'MAX_KEYS': 10000,
+    'RETENTION_DAYS': 7,
+}
+
+# Per-process LRU in front of the shared cache (apps.cache.near_cache),
+# kept coherent across processes through Redis pub/sub
+NEAR_CACHE = {
+    'ENABLED': config('NEAR_CACHE_ENABLED', default=False, cast=bool),
+    'MAX_ENTRIES': 1024,
+    'TTL': 30,  # seconds a local copy may be served without revalidation
+    'CHANNEL': 'near-cache:invalidate',
+}
+
+# Per endpoint and status request counters and latency histograms of
+# APIMetricsMiddleware (apps.core.metrics), flushed to Redis in the background;
+# see api_metrics and the Prometheus endpoint /api/health/metrics/
+API_METRICS = {
+    'ENABLED': config('API_METRICS_ENABLED', default=True, cast=bool),
+    'FLUSH_INTERVAL_MS': 1000,
+    'RETENTION_DAYS': 30,
+    # Requests at least this slow are sampled, with their SQL query counts
+    'SLOW_REQUEST_MS': config('API_SLOW_REQUEST_MS', default=500, cast=int),
+    'SLOW_SAMPLES': 50,
+    # Access to the Prometheus endpoint, /api/health/metrics/. Behind a
+    # reverse proxy every request comes from the proxy's address, so only
+    # list IPs when clients reach the app directly
+    'SCRAPE_TOKEN': config('API_METRICS_SCRAPE_TOKEN', default=''),
+    'ALLOWED_IPS': config('API_METRICS_ALLOWED_IPS', default='', cast=Csv()),
+}
+
+# EmailLog write path and retention (apps.emails.logs): contexts are stored as
+# JSON reduced to CONTEXT_KEYS (None keeps all) and CONTEXT_MAX_BYTES;
+# prune_email_logs deletes rows older than RETENTION_DAYS in chunks
+EMAIL_LOG = {
+    'BUFFER_SIZE': 500,
+    'CONTEXT_MAX_BYTES': 4096,
+    'CONTEXT_KEYS': None,
+    'RETENTION_DAYS': config('EMAIL_LOG_RETENTION_DAYS', default=90, cast=int),
+    'DELETE_CHUNK_SIZE': 5000,
+}
+
+# Transactional email outbox (apps.emails.outbox): emails are written to EmailLog
+# as pending in the request transaction and sent by a dispatcher with retries
+EMAIL_OUTBOX = {
+    'ENABLED': config('EMAIL_OUTBOX_ENABLED', default=True, cast=bool),
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,
+    'MAX_BACKOFF_SECONDS': 3600,
+    'LEASE_SECONDS': 300,
+    'DISPATCH_ON_COMMIT': True,
+}
+
+# Process-wide LRU of compiled EmailTemplates and of template lookups by name
+# (apps.emails.template_cache); LOOKUP_TTL bounds how long other processes keep
+# sending a template edited elsewhere
+EMAIL_TEMPLATE_CACHE = {
+    'MAX_TEMPLATES': 256,
+    'LOOKUP_TTL': 60,
+}
+
+# SQL query budgets of QueryBudgetMiddleware and the GraphQL QueryBudgetExtension
+# (apps.core.queries). ROUTES are keyed by route template, optionally prefixed
+# with the method, or by 'graphql:<operation name>', and take a query count or
+# {'queries': ..., 'duplicates': ...}. DUPLICATES is how often one SQL shape may
+# run per request before it is reported as an N+1.
+QUERY_BUDGET = {
+    'ENABLED': config('QUERY_BUDGET_ENABLED', default=True, cast=bool),
+    'QUERIES': 30,
+    'DUPLICATES': 5,
+    'ROUTES': {
+        'GET /api/users/': 5,
+        'GET /api/users/<pk>/': 4,
+        '/api/me/': 4,
+        'graphql:users': 3,
+        '/admin/emails/emaillog/': 12,
+    },
+    'SERVER_TIMING': False,
+    'SAMPLE_RATE': config('QUERY_BUDGET_SAMPLE_RATE', default=1.0, cast=float),
+    'RAISE': False,
+}
+
+# HTTP cache policy per API path prefix or viewset action ('<basename>.<action>'),
+# applied by apps.cache.services.APICacheMiddleware: ttl is the server side and
+# s-maxage TTL, stale the stale-while-revalidate window and scope who shares a
+# response (public, role or user); see apps.cache.policies
+API_CACHE_POLICIES = [
+    {'path': '/api/', 'ttl': 60, 'stale': 30},
+    {'path': '/api/auth/', 'ttl': 0},
+    {'path': '/api/health/', 'ttl': 0},
+    {
+        'path': '/api/config/',
+        'ttl': 3600,
+        'stale': 600,
+        'scope': 'public',
+        'max_age': 300,
+        'surrogate_keys': ['config'],
+    },
+    {'path': '/api/products/', 'ttl': 300, 'stale': 120, 'surrogate_keys': ['products']},
+    {'path': '/api/me/', 'ttl': 60, 'stale': 30},
+    {'action': 'user.list', 'ttl': 60, 'stale': 30, 'surrogate_keys': ['users']},
+    {'action': 'user.retrieve', 'ttl': 300, 'stale': 60, 'surrogate_keys': ['users', 'user:{pk}']},
+]
+
+# nginx micro-cache for anonymous API GETs (apps.cache.edge): marked responses
+# are stored by nginx for TTL seconds and re-fetched through PURGE_URL when
+# their cache keys or surrogate keys are invalidated
+EDGE_CACHE = {
+    'ENABLED': config('EDGE_CACHE_ENABLED', default={% if cookiecutter.use_nginx_microcache == 'y' %}True{% else %}False{% endif %}, cast=bool),
+    'TTL': 2,
+    'WINDOW': 30,  # proxy_cache_path inactive time in docker/nginx/nginx.prod.conf
+    'FLUSH_INTERVAL': 1,  # seconds marked URLs are buffered per process
+    'PURGE_URL': config('EDGE_CACHE_PURGE_URL', default='http://frontend:8080'),
+    'PURGE_HOST': '{{ cookiecutter.domain_name }}',
+}
+
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -385,6 +521,15 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+{% if cookiecutter.use_redis == 'y' -%}
+CELERY_BEAT_SCHEDULE = {
+    # Retries of the transactional email outbox (apps.emails.outbox)
+    'dispatch-email-outbox': {
+        'task': 'apps.emails.tasks.dispatch_email_outbox',
+        'schedule': 30.0,
+    },
+}
+{%- endif %}
 {%- endif %}
 
 {% if cookiecutter.use_redis == 'y' -%}
@@ -65,6 +65,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Logging
 LOGGING['loggers']['django']['level'] = 'DEBUG'
 
+# Query counts and DB time of every response in the browser's network panel
+QUERY_BUDGET['SERVER_TIMING'] = True
+
 # Simple cache configuration for development
 # Override the base settings if Redis is not available
 CACHES = {
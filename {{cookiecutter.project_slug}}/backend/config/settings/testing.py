@@ -30,6 +30,9 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
 ]
 
+# Fail tests whose requests exceed their query budget
+QUERY_BUDGET['RAISE'] = True
+
 # Email backend
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 